@@ -0,0 +1,373 @@
+"""
+Resumable bulk reward distribution from a CSV or JSONL file
+Streams (address, asa_id, amount) rows, checks opt-in status in bulk,
+packs transfers into atomic groups and pipelines submissions while
+recording progress in an append-only checkpoint file
+"""
+
+import os
+import sys
+import csv
+import json
+import base64
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from algosdk import account, encoding, mnemonic
+from algosdk.v2client import indexer
+from algosdk.transaction import AssetTransferTxn, assign_group_id, wait_for_confirmation
+
+from contracts.deploy import MAX_GROUP_SIZE, chunked
+from contracts.fees import FeePolicy
+from contracts.rate_limit import shared_client
+
+
+# Algorand TestNet configuration (AlgoNode public API)
+TESTNET_ALGOD_ADDRESS = "https://testnet-api.algonode.cloud"
+TESTNET_ALGOD_TOKEN = ""
+TESTNET_INDEXER_ADDRESS = "https://testnet-idx.algonode.cloud"
+TESTNET_INDEXER_TOKEN = ""
+
+# Groups submitted but not yet confirmed at any one time
+DEFAULT_MAX_IN_FLIGHT = 8
+
+# Parallel account lookups when checking opt-in status
+OPT_IN_LOOKUP_WORKERS = 16
+
+# Short validity so in-doubt groups from a crashed run expire quickly
+VALIDITY_WINDOW = 100
+
+
+def get_algod_client():
+    """Return the shared rate-limited Algod client for TestNet"""
+    return shared_client(TESTNET_ALGOD_TOKEN, TESTNET_ALGOD_ADDRESS)
+
+
+def get_indexer_client():
+    """Create and return Indexer client for TestNet"""
+    return indexer.IndexerClient(
+        indexer_token=TESTNET_INDEXER_TOKEN,
+        indexer_address=TESTNET_INDEXER_ADDRESS
+    )
+
+
+def read_rows(path):
+    """
+    Stream distribution rows from a CSV (with header) or JSONL file
+
+    Yields:
+        dict: {'row': int, 'address': str, 'asa_id': int, 'amount': int}
+    """
+    with open(path, "r", newline="") as f:
+        if path.endswith(".jsonl"):
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = csv.DictReader(f)
+
+        for index, record in enumerate(records):
+            yield {
+                'row': index,
+                'address': record['address'].strip(),
+                'asa_id': int(record['asa_id']),
+                'amount': int(record['amount'])
+            }
+
+
+class Checkpoint:
+    """
+    Append-only JSONL log of distribution progress
+
+    Events:
+        submitted: group signed and about to be sent (rows, tx_id, signed txns)
+        confirmed: group confirmed on-chain (rows, tx_id)
+        skipped: row not sent (row, reason)
+        expired: submitted group never landed, rows may be retried (tx_id)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done_rows = set()
+        self.in_doubt = {}
+
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        self._apply(json.loads(line))
+
+        self._file = open(path, "a")
+
+    def _apply(self, event):
+        kind = event['event']
+        if kind == 'submitted':
+            self.in_doubt[event['tx_id']] = event
+        elif kind == 'confirmed':
+            self.in_doubt.pop(event['tx_id'], None)
+            self.done_rows.update(event['rows'])
+        elif kind == 'expired':
+            self.in_doubt.pop(event['tx_id'], None)
+        elif kind == 'skipped':
+            self.done_rows.add(event['row'])
+
+    def record(self, event):
+        """Durably append an event before acting on it"""
+        self._file.write(json.dumps(event) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._apply(event)
+
+    def close(self):
+        self._file.close()
+
+
+def fetch_opted_in_assets(client, addresses):
+    """
+    Look up ASA holdings for many accounts concurrently
+
+    Returns:
+        dict: {address: set of asset ids, or None if the lookup failed}
+    """
+    def lookup(address):
+        try:
+            info = client.account_info(address)
+            return address, {asset['asset-id'] for asset in info.get('assets', [])}
+        except Exception:
+            return address, None
+
+    with ThreadPoolExecutor(max_workers=OPT_IN_LOOKUP_WORKERS) as pool:
+        return dict(pool.map(lookup, addresses))
+
+
+def submit_raw_group(client, signed_txns):
+    """Send a group of base64 msgpack signed transactions exactly as recorded"""
+    raw_group = b"".join(base64.b64decode(stxn) for stxn in signed_txns)
+    client.send_raw_transaction(base64.b64encode(raw_group).decode())
+
+
+def resolve_in_doubt(client, idx_client, checkpoint):
+    """
+    Settle groups that were submitted by a previous run but never recorded
+    as confirmed, without ever sending a row twice.
+
+    The exact signed bytes are resent first, and awaited only until the
+    group's last_valid round: algod rejects them if they already landed and
+    they can no longer land once past last_valid. Only when the indexer has
+    caught up past last_valid and has no record of the txn are the rows
+    released for a fresh attempt; an indexer error or lag leaves the group
+    in doubt and raises, so the next run retries.
+    """
+    for tx_id, event in list(checkpoint.in_doubt.items()):
+        try:
+            info = client.pending_transaction_info(tx_id)
+            if info.get('confirmed-round', 0) > 0:
+                checkpoint.record({'event': 'confirmed', 'tx_id': tx_id, 'rows': event['rows']})
+                continue
+        except Exception:
+            pass
+
+        # A group past last_valid can no longer land: skip straight to the
+        # indexer check instead of resending and waiting
+        rounds_left = event['last_valid'] - client.status()['last-round']
+        if rounds_left >= 0:
+            try:
+                submit_raw_group(client, event['signed'])
+            except Exception as e:
+                if 'already in ledger' in str(e):
+                    checkpoint.record({'event': 'confirmed', 'tx_id': tx_id, 'rows': event['rows']})
+                    continue
+
+            try:
+                # Wait only until the group expires (one round past last_valid)
+                wait_for_confirmation(client, tx_id, rounds_left + 1)
+                checkpoint.record({'event': 'confirmed', 'tx_id': tx_id, 'rows': event['rows']})
+                continue
+            except Exception:
+                pass
+
+        # Only trust absence once the group can no longer be committed
+        if client.status()['last-round'] <= event['last_valid']:
+            raise RuntimeError(f"Group {tx_id} is still within its validity window; retry later")
+
+        # A txid search answers "absent" with an empty list plus the round
+        # the indexer has reached, rather than with an error
+        response = idx_client.search_transactions(txid=tx_id)
+        if response.get('transactions'):
+            checkpoint.record({'event': 'confirmed', 'tx_id': tx_id, 'rows': event['rows']})
+        elif response['current-round'] < event['last_valid']:
+            raise RuntimeError(
+                f"Indexer is at round {response['current-round']}, behind group {tx_id}'s "
+                f"last_valid {event['last_valid']}; retry later"
+            )
+        else:
+            checkpoint.record({'event': 'expired', 'tx_id': tx_id})
+
+
+def distribute_rewards(
+    rows_path,
+    checkpoint_path,
+    sender_mnemonic,
+    max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+    client=None,
+    idx_client=None
+):
+    """
+    Distribute ASA rewards listed in a file, resuming from a checkpoint
+
+    Args:
+        rows_path: CSV (address,asa_id,amount header) or .jsonl file
+        checkpoint_path: Checkpoint file (created if missing)
+        sender_mnemonic: 25-word mnemonic of the account holding the rewards
+        max_in_flight: Groups submitted ahead of confirmation
+        client: Optional Algod client (defaults to TestNet)
+        idx_client: Optional Indexer client (defaults to TestNet)
+
+    Returns:
+        dict: {
+            'success': bool,
+            'sent': int,
+            'skipped_not_opted_in': [{'row': int, 'address': str, 'asa_id': int}],
+            'failed': [{'rows': [int], 'error': str}],
+            'fees': {operation: {'count': int, 'total_fee': int, 'average_fee': int}},
+            'error': str (if failed)
+        }
+    """
+    client = client or get_algod_client()
+    idx_client = idx_client or get_indexer_client()
+    checkpoint = Checkpoint(checkpoint_path)
+
+    sender_private_key = mnemonic.to_private_key(sender_mnemonic)
+    sender_address = account.address_from_private_key(sender_private_key)
+    fee_policy = FeePolicy(client)
+
+    sent = 0
+    skipped = []
+    failed = []
+    in_flight = deque()
+
+    def drain(limit):
+        nonlocal sent
+        while len(in_flight) > limit:
+            tx_id, rows = in_flight.popleft()
+            try:
+                wait_for_confirmation(client, tx_id, VALIDITY_WINDOW)
+                checkpoint.record({'event': 'confirmed', 'tx_id': tx_id, 'rows': rows})
+                sent += len(rows)
+            except Exception as e:
+                # Left in doubt on purpose; the next run resolves it safely
+                failed.append({'rows': rows, 'error': str(e)})
+
+    try:
+        resolve_in_doubt(client, idx_client, checkpoint)
+
+        batch_size = MAX_GROUP_SIZE * max_in_flight
+        batch = []
+        rows_iter = read_rows(rows_path)
+
+        while True:
+            for row in rows_iter:
+                if row['row'] not in checkpoint.done_rows:
+                    batch.append(row)
+                    if len(batch) >= batch_size:
+                        break
+            if not batch:
+                break
+
+            holdings = fetch_opted_in_assets(client, {row['address'] for row in batch})
+            ready = []
+            for row in batch:
+                assets = holdings[row['address']]
+                if assets is None:
+                    # Not checkpointed, so the next run looks this row up again
+                    failed.append({'rows': [row['row']], 'error': 'account lookup failed'})
+                elif row['asa_id'] in assets:
+                    ready.append(row)
+                else:
+                    checkpoint.record({'event': 'skipped', 'row': row['row'], 'reason': 'not_opted_in'})
+                    skipped.append({'row': row['row'], 'address': row['address'], 'asa_id': row['asa_id']})
+
+            params = client.suggested_params()
+            params.last = params.first + VALIDITY_WINDOW
+
+            for group in chunked(ready):
+                txns = [
+                    AssetTransferTxn(
+                        sender=sender_address,
+                        sp=params,
+                        receiver=row['address'],
+                        amt=row['amount'],
+                        index=row['asa_id']
+                    )
+                    for row in group
+                ]
+                fee_policy.apply(txns, priority='background', params=params, operation='airdrop')
+                if len(txns) > 1:
+                    assign_group_id(txns)
+
+                signed = [encoding.msgpack_encode(txn.sign(sender_private_key)) for txn in txns]
+                tx_id = txns[0].get_txid()
+                rows = [row['row'] for row in group]
+
+                checkpoint.record({
+                    'event': 'submitted',
+                    'tx_id': tx_id,
+                    'rows': rows,
+                    'last_valid': params.last,
+                    'signed': signed
+                })
+                try:
+                    submit_raw_group(client, signed)
+                except Exception as e:
+                    failed.append({'rows': rows, 'error': str(e)})
+                    continue
+
+                in_flight.append((tx_id, rows))
+                drain(max_in_flight)
+
+            batch = []
+            print(f"Progress: {sent} sent, {len(skipped)} skipped, {len(failed)} failed")
+
+        drain(0)
+
+        return {
+            'success': not failed,
+            'sent': sent,
+            'skipped_not_opted_in': skipped,
+            'failed': failed,
+            'fees': fee_policy.report()
+        }
+    except Exception as e:
+        return {
+            'success': False,
+            'sent': sent,
+            'skipped_not_opted_in': skipped,
+            'failed': failed,
+            'error': f'Distribution aborted: {str(e)}'
+        }
+    finally:
+        checkpoint.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk ASA reward distribution")
+    parser.add_argument("rows", help="CSV or JSONL file of address,asa_id,amount rows")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <rows>.checkpoint)")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT)
+    args = parser.parse_args()
+
+    sender_mnemonic = os.getenv('ALGORAND_DEPLOYER_MNEMONIC')
+    if not sender_mnemonic:
+        print(json.dumps({
+            'success': False,
+            'error': 'ALGORAND_DEPLOYER_MNEMONIC not set'
+        }))
+        sys.exit(1)
+
+    result = distribute_rewards(
+        rows_path=args.rows,
+        checkpoint_path=args.checkpoint or args.rows + ".checkpoint",
+        sender_mnemonic=sender_mnemonic,
+        max_in_flight=args.max_in_flight
+    )
+
+    print(json.dumps(result))
+    sys.exit(0 if result['success'] else 1)
@@ -0,0 +1,756 @@
+"""
+asyncio counterparts of the contracts package operations
+Lets one event loop drive thousands of concurrent deposits, confirmations,
+state reads and reward transfers with bounded concurrency and cancellation
+"""
+
+import os
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from algosdk import account, encoding, mnemonic
+from algosdk.transaction import (
+    ApplicationCreateTxn,
+    AssetConfigTxn,
+    AssetTransferTxn,
+    PaymentTxn,
+    OnComplete
+)
+from algosdk.logic import get_application_address
+
+from contracts.create_claim_transaction import sign_reward_transfer
+from contracts.deploy import APP_ACCOUNT_MIN_BALANCE, build_escrow_app_args, escrow_state_schemas
+from contracts.fees import shared_policy
+from contracts.interact import decode_global_state, precheck_action, sign_deposit, sign_refund
+from contracts.rate_limit import RateLimitExceeded, is_transient, shared_client
+from contracts.signer_pool import SignerPool, asa_targets_from_env, wallet_mnemonics_from_env
+from contracts.txn_builder import PARAMS_CACHE_TTL
+from contracts.txn_templates import send_signed, templates_for
+
+
+# Algorand TestNet configuration (AlgoNode public API)
+TESTNET_ALGOD_ADDRESS = "https://testnet-api.algonode.cloud"
+TESTNET_ALGOD_TOKEN = ""
+
+# HTTP requests in flight at once; confirmation waits do not hold a slot
+DEFAULT_HTTP_WORKERS = 64
+
+# Operations run concurrently by gather_limited
+DEFAULT_CONCURRENCY = 256
+
+# Seconds to back off after a failed round lookup (block time is ~3s)
+CONFIRMATION_POLL_INTERVAL = 1.0
+
+# Consecutive failed round lookups (rate limited, node errors) before
+# every waiter is failed
+MAX_ROUND_FAILURES = 30
+
+# Extra rounds a timed-out waiter's final check may be retried for
+FINAL_CHECK_GRACE_ROUNDS = 4
+
+# Longest a call keeps queueing for the client's rate limit before
+# RateLimitExceeded reaches the caller (seconds)
+RATE_LIMIT_QUEUE_TIMEOUT = 120.0
+
+# rate_limit.ENDPOINT_BUDGETS key each client method spends; others use 'default'
+METHOD_ENDPOINTS = {
+    'send_transaction': 'send',
+    'send_transactions': 'send',
+    'send_raw_transaction': 'send',
+    'suggested_params': 'params',
+    'pending_transaction_info': 'pending',
+    'pending_transactions': 'pending',
+    'application_info': 'applications',
+    'account_info': 'accounts',
+    'account_asset_info': 'accounts',
+    'account_application_info': 'accounts',
+    'status': 'status',
+    'status_after_block': 'status',
+}
+
+_shared_client = None
+
+
+class AsyncAlgodClient:
+    """
+    Non-blocking wrapper around an algod client
+
+    Each HTTP request runs on a bounded worker pool and is awaited, so the
+    event loop is never blocked. Any AlgodClient method is available as a
+    coroutine, e.g. `await client.application_info(app_id)`. Suggested
+    params are cached briefly and shared by every concurrent caller.
+
+    Over a RateLimitedAlgodClient, calls queue on the event loop behind a
+    semaphore per endpoint sized to its burst, so a burst larger than the
+    budget is spread out instead of rejected. A call the limiter still
+    rejects (its budget spent by other users of the client) was never
+    sent, so it is retried after the advertised wait.
+    """
+
+    def __init__(self, client=None, max_workers=DEFAULT_HTTP_WORKERS):
+        self._client = client or shared_client(TESTNET_ALGOD_TOKEN, TESTNET_ALGOD_ADDRESS)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._params = None
+        self._params_fetched_at = 0.0
+        self._params_lock = None
+        self._watcher = None
+
+        # One slot per token of burst: callers holding a slot never wait
+        # longer than burst / rate for a token, which is within max_delay
+        buckets = getattr(self._client, 'buckets', {})
+        self._slots = {endpoint: asyncio.Semaphore(bucket.burst) for endpoint, bucket in buckets.items()}
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        async def call(*args, **kwargs):
+            return await self._run(functools.partial(method, *args, **kwargs), name)
+
+        return call
+
+    @property
+    def sync_client(self):
+        """The wrapped blocking client, for the sync modules' pricing and signing helpers"""
+        return self._client
+
+    async def run(self, func, *args, method=None):
+        """
+        Run a blocking helper on the worker pool, e.g. one that calls the
+        sync client; `method` names the client call it makes, so it queues
+        behind that endpoint's rate limit
+        """
+        return await self._run(functools.partial(func, *args), method)
+
+    async def _run(self, func, name):
+        """Run a blocking client call on the pool, queueing while rate limited"""
+        slots = self._slots.get(METHOD_ENDPOINTS.get(name, 'default'))
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + RATE_LIMIT_QUEUE_TIMEOUT
+        while True:
+            try:
+                if slots is None:
+                    return await loop.run_in_executor(self._executor, func)
+                async with slots:
+                    return await loop.run_in_executor(self._executor, func)
+            except RateLimitExceeded as e:
+                if loop.time() + e.retry_after > deadline:
+                    raise
+                await asyncio.sleep(e.retry_after)
+
+    async def suggested_params(self):
+        if self._params_lock is None:
+            self._params_lock = asyncio.Lock()
+
+        async with self._params_lock:
+            now = time.monotonic()
+            if self._params is None or now - self._params_fetched_at > PARAMS_CACHE_TTL:
+                self._params = await self._run(self._client.suggested_params, 'suggested_params')
+                self._params_fetched_at = now
+            return self._params
+
+    @property
+    def confirmations(self):
+        """The client's shared ConfirmationWatcher"""
+        if self._watcher is None:
+            self._watcher = ConfirmationWatcher(self)
+        return self._watcher
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class ConfirmationWatcher:
+    """
+    One confirmation poller shared by every waiter on a client
+
+    A single task waits for each new block with status_after_block, reads
+    the block's transaction ids and resolves every waiter whose transaction
+    is in it. However many operations are waiting, that is two requests per
+    round, plus one pending-transaction lookup per confirmed transaction
+    for its info. Rate-limit and transient node errors are retried on the
+    next round instead of failing the waiters.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        # tx_id -> {'futures': [Future], 'last_round': int, 'confirmed': bool}
+        self.waiters = {}
+        self._round = None
+        self._round_lookup = None
+        self._task = None
+        self._loop = None
+
+    async def wait(self, tx_id, wait_rounds):
+        """
+        Wait until `tx_id` is confirmed within `wait_rounds` rounds
+
+        Returns:
+            dict: Pending transaction info of the confirmed transaction
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A new event loop (e.g. a later asyncio.run) starts afresh
+            self._loop, self._task, self._round, self.waiters = loop, None, None, {}
+            self._round_lookup = None
+
+        if self._round is None:
+            if self._round_lookup is None or self._round_lookup.done():
+                self._round_lookup = loop.create_task(self._first_round())
+            await asyncio.shield(self._round_lookup)
+
+        future = loop.create_future()
+        waiter = self.waiters.setdefault(
+            tx_id, {'futures': [], 'last_round': self._round + wait_rounds, 'confirmed': False}
+        )
+        waiter['futures'].append(future)
+
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return await future
+
+    async def _first_round(self):
+        """Read the starting round once for every concurrent first waiter"""
+        for attempt in range(MAX_ROUND_FAILURES):
+            try:
+                self._round = (await self.client.status())['last-round']
+                return
+            except Exception:
+                if attempt == MAX_ROUND_FAILURES - 1:
+                    raise
+                await asyncio.sleep(CONFIRMATION_POLL_INTERVAL)
+
+    def _resolve(self, tx_id, info=None, error=None):
+        for future in self.waiters.pop(tx_id)['futures']:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(info)
+
+    async def _check(self, tx_id, waiter):
+        """Fetch info for a confirmed or timed-out waiter; errors retry next round"""
+        try:
+            info = await self.client.pending_transaction_info(tx_id)
+        except Exception as e:
+            if is_transient(e) and (
+                waiter['confirmed'] or self._round <= waiter['last_round'] + FINAL_CHECK_GRACE_ROUNDS
+            ):
+                return
+            self._resolve(tx_id, error=e)
+            return
+
+        if info.get('confirmed-round', 0) > 0:
+            self._resolve(tx_id, info)
+        elif info.get('pool-error'):
+            self._resolve(tx_id, error=Exception(f"pool error: {info['pool-error']}"))
+        elif self._round > waiter['last_round']:
+            self._resolve(tx_id, error=Exception(f"Wait for transaction id {tx_id} timed out"))
+
+    async def _run(self):
+        failures = 0
+        while self.waiters:
+            # Drop waiters whose callers were cancelled
+            for tx_id in [t for t, w in self.waiters.items() if all(f.done() for f in w['futures'])]:
+                del self.waiters[tx_id]
+            if not self.waiters:
+                return
+
+            next_round = self._round + 1
+            try:
+                status = await self.client.status_after_block(self._round)
+                if status['last-round'] < next_round:
+                    continue
+                block = await self.client.get_block_txids(next_round)
+                failures = 0
+            except Exception as e:
+                failures += 1
+                if failures >= MAX_ROUND_FAILURES:
+                    for tx_id in list(self.waiters):
+                        self._resolve(tx_id, error=e)
+                    return
+                await asyncio.sleep(CONFIRMATION_POLL_INTERVAL)
+                continue
+
+            self._round = next_round
+            in_block = set(block.get('blockTxids') or [])
+            checks = []
+            for tx_id, waiter in self.waiters.items():
+                if tx_id in in_block:
+                    waiter['confirmed'] = True
+                if waiter['confirmed'] or self._round > waiter['last_round']:
+                    checks.append(self._check(tx_id, waiter))
+            await asyncio.gather(*checks)
+
+
+def get_async_algod_client():
+    """Return the process-wide AsyncAlgodClient for TestNet"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = AsyncAlgodClient()
+    return _shared_client
+
+
+async def wait_for_confirmation(client, tx_id, wait_rounds=4):
+    """
+    Async equivalent of algosdk.transaction.wait_for_confirmation
+
+    Waits on the client's shared ConfirmationWatcher, so a pending
+    confirmation costs no worker thread and no requests of its own, and is
+    cancellable at any point.
+
+    Returns:
+        dict: Pending transaction info of the confirmed transaction
+    """
+    return await client.confirmations.wait(tx_id, wait_rounds)
+
+
+async def gather_limited(aws, limit=DEFAULT_CONCURRENCY):
+    """
+    Run awaitables concurrently with at most `limit` in progress
+
+    Exceptions are returned in place of results. Cancelling the caller
+    cancels every outstanding operation.
+
+    Returns:
+        list: Results in input order
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(bounded(aw) for aw in aws), return_exceptions=True)
+
+
+async def _prepare(client, params):
+    """Refresh the shared fee policy's congestion reading off the event loop"""
+    await client.run(shared_policy(client.sync_client).congestion, params, method='pending_transactions')
+
+
+async def _send_signed(client, signed):
+    return await client.run(send_signed, client.sync_client, signed, method='send_raw_transaction')
+
+
+async def _call_app(user_mnemonic, app_id, method, action, client, state=None):
+    """
+    Returns:
+        dict: Precheck failure result, or {'success': True, 'tx_id': str}
+    """
+    client = client or get_async_algod_client()
+
+    private_key = mnemonic.to_private_key(user_mnemonic)
+    address = account.address_from_private_key(private_key)
+
+    rejected = precheck_action(state, action, address)
+    if rejected:
+        return rejected
+
+    params = await client.suggested_params()
+    txn = templates_for(params).app_call(method, address, app_id, params)
+
+    tx_id = await _send_signed(client, [txn.sign(private_key)])
+    await wait_for_confirmation(client, tx_id, 4)
+
+    return {'success': True, 'tx_id': tx_id}
+
+
+async def pay_deposit(
+    user_mnemonic,
+    app_id,
+    deposit_amount,
+    rental_fee,
+    client=None,
+    state=None,
+    priority='normal'
+):
+    """
+    Async interact.pay_deposit
+
+    Returns:
+        dict: {'success': bool, 'tx_id': str, 'fee': int, 'error': str, 'rejection': str}
+    """
+    try:
+        client = client or get_async_algod_client()
+
+        user_private_key = mnemonic.to_private_key(user_mnemonic)
+        user_address = account.address_from_private_key(user_private_key)
+
+        rejected = precheck_action(
+            state, 'deposit', user_address,
+            payment_amount=deposit_amount + rental_fee
+        )
+        if rejected:
+            return rejected
+
+        params = await client.suggested_params()
+        await _prepare(client, params)
+        signed, fee = sign_deposit(
+            client.sync_client, user_private_key, app_id, deposit_amount, rental_fee, params, priority
+        )
+
+        tx_id = await _send_signed(client, signed)
+        await wait_for_confirmation(client, tx_id, 4)
+
+        return {'success': True, 'tx_id': tx_id, 'fee': fee}
+
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+async def confirm_delivery(vendor_mnemonic, app_id, client=None, state=None):
+    """
+    Async interact.confirm_delivery
+
+    Returns:
+        dict: {'success': bool, 'tx_id': str, 'error': str, 'rejection': str}
+    """
+    try:
+        return await _call_app(vendor_mnemonic, app_id, b"delivery", 'delivery', client, state)
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+async def confirm_return(organizer_mnemonic, app_id, client=None, state=None):
+    """
+    Async interact.confirm_return
+
+    Returns:
+        dict: {'success': bool, 'tx_id': str, 'error': str, 'rejection': str}
+    """
+    try:
+        return await _call_app(organizer_mnemonic, app_id, b"return", 'return', client, state)
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+async def refund_deposit(app_id, signer_mnemonic, organizer_addr, client=None, state=None):
+    """
+    Async interact.refund_deposit
+
+    Returns:
+        dict: {'success': bool, 'tx_id': str, 'error': str, 'rejection': str}
+    """
+    try:
+        client = client or get_async_algod_client()
+
+        signer_private_key = mnemonic.to_private_key(signer_mnemonic)
+        signer_address = account.address_from_private_key(signer_private_key)
+
+        rejected = precheck_action(state, 'refund', signer_address)
+        if rejected:
+            return rejected
+
+        params = await client.suggested_params()
+        await _prepare(client, params)
+        signed_txn = sign_refund(client.sync_client, signer_private_key, app_id, params)
+
+        tx_id = await client.send_transaction(signed_txn)
+        await wait_for_confirmation(client, tx_id, 4)
+
+        return {'success': True, 'tx_id': tx_id}
+
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+async def get_contract_state(app_id, client=None):
+    """
+    Async interact.get_contract_state
+
+    Returns:
+        dict: {'success': bool, 'state': dict, 'error': str}
+    """
+    try:
+        client = client or get_async_algod_client()
+
+        app_info = await client.application_info(app_id)
+        decoded_state = decode_global_state(app_info['params']['global-state'])
+
+        return {'success': True, 'state': decoded_state}
+
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+async def deploy_rental_escrow(
+    deployer_mnemonic,
+    organizer_addr,
+    vendor_addr,
+    deposit_amount,
+    rental_fee,
+    lease_start,
+    lease_end,
+    approval_program,
+    clear_program,
+    client=None,
+    fund_amount=APP_ACCOUNT_MIN_BALANCE
+):
+    """
+    Async deploy.deploy_rental_escrow
+
+    Takes already-compiled programs (see deploy.compile_escrow_programs) so
+    concurrent deploys do not recompile the same TEAL. The app account is
+    funded with `fund_amount` microALGOs after creation.
+
+    Returns:
+        dict: {'success': bool, 'app_id': int, 'tx_id': str, 'address': str,
+               'fund_tx_id': str, 'error': str}
+    """
+    app_id = None
+    try:
+        client = client or get_async_algod_client()
+
+        deployer_private_key = mnemonic.to_private_key(deployer_mnemonic)
+        deployer_address = account.address_from_private_key(deployer_private_key)
+
+        global_schema, local_schema = escrow_state_schemas()
+        params = await client.suggested_params()
+
+        txn = ApplicationCreateTxn(
+            sender=deployer_address,
+            sp=params,
+            on_complete=OnComplete.NoOpOC,
+            approval_program=approval_program,
+            clear_program=clear_program,
+            global_schema=global_schema,
+            local_schema=local_schema,
+            app_args=build_escrow_app_args(
+                organizer_addr,
+                vendor_addr,
+                deposit_amount,
+                rental_fee,
+                lease_start,
+                lease_end
+            )
+        )
+
+        tx_id = await client.send_transaction(txn.sign(deployer_private_key))
+        confirmed_txn = await wait_for_confirmation(client, tx_id, 4)
+        app_id = confirmed_txn['application-index']
+        contract_address = get_application_address(app_id)
+
+        fund_tx_id = None
+        if fund_amount > 0:
+            fund_txn = PaymentTxn(
+                sender=deployer_address, sp=params, receiver=contract_address, amt=fund_amount
+            )
+            fund_tx_id = await client.send_transaction(fund_txn.sign(deployer_private_key))
+            await wait_for_confirmation(client, fund_tx_id, 4)
+
+        return {
+            'success': True,
+            'app_id': app_id,
+            'tx_id': tx_id,
+            'address': contract_address,
+            'fund_tx_id': fund_tx_id
+        }
+
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+        if app_id is not None:
+            result['app_id'] = app_id
+        return result
+
+
+async def create_reward_asa(
+    creator_mnemonic,
+    asset_name,
+    unit_name,
+    total_supply,
+    decimals=0,
+    url="",
+    metadata_hash=None,
+    client=None
+):
+    """
+    Async create_reward_asas.create_reward_asa
+
+    Returns:
+        dict: {'success': bool, 'asa_id': int, 'tx_id': str, 'error': str}
+    """
+    try:
+        client = client or get_async_algod_client()
+
+        creator_private_key = mnemonic.to_private_key(creator_mnemonic)
+        creator_address = account.address_from_private_key(creator_private_key)
+
+        params = await client.suggested_params()
+
+        txn = AssetConfigTxn(
+            sender=creator_address,
+            sp=params,
+            total=total_supply,
+            default_frozen=False,
+            unit_name=unit_name,
+            asset_name=asset_name,
+            manager=creator_address,
+            reserve=creator_address,
+            freeze=creator_address,
+            clawback=creator_address,
+            url=url,
+            metadata_hash=metadata_hash,
+            decimals=decimals
+        )
+
+        tx_id = await client.send_transaction(txn.sign(creator_private_key))
+        confirmed_txn = await wait_for_confirmation(client, tx_id, 4)
+
+        return {
+            'success': True,
+            'asa_id': confirmed_txn['asset-index'],
+            'tx_id': tx_id,
+            'asset_name': asset_name,
+            'unit_name': unit_name
+        }
+
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+async def check_asset_opted_in(address, asa_id, client=None):
+    """Async create_claim_transaction.check_asset_opted_in"""
+    try:
+        client = client or get_async_algod_client()
+        account_info = await client.account_info(address)
+        return any(
+            asset['asset-id'] == int(asa_id)
+            for asset in account_info.get('assets', [])
+        )
+    except Exception:
+        return False
+
+
+async def create_opt_in_transaction(receiver_address, asa_id, client=None):
+    """
+    Async create_claim_transaction.create_opt_in_transaction
+
+    Returns:
+        dict: {'success': bool, 'needs_optin': bool, 'unsigned_txn': str, 'error': str}
+    """
+    try:
+        client = client or get_async_algod_client()
+        params = await client.suggested_params()
+
+        txn = AssetTransferTxn(
+            sender=receiver_address,
+            sp=params,
+            receiver=receiver_address,
+            amt=0,
+            index=int(asa_id)
+        )
+
+        return {
+            'success': True,
+            'needs_optin': True,
+            'unsigned_txn': encoding.msgpack_encode(txn)
+        }
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f'Failed to create opt-in transaction: {str(e)}'
+        }
+
+
+async def _pool_transfer(pool, client, receiver_address, asa_id, amount, priority):
+    """Async SignerPool.transfer: the pool's file-locked bookkeeping runs on the worker pool"""
+    address, reservation_id = await client.run(pool.acquire, asa_id, amount)
+    sender = address or pool.deployer_address
+
+    fee = 0
+    success = False
+    try:
+        params = await client.suggested_params()
+        await client.run(pool.fee_policy.congestion, params, method='pending_transactions')
+        signed, fee = pool.sign_transfer(address, receiver_address, asa_id, amount, params, priority)
+
+        tx_id = await _send_signed(client, signed)
+        await wait_for_confirmation(client, tx_id, 4)
+        success = True
+
+        result = {
+            'success': True,
+            'tx_id': tx_id,
+            'fee': fee,
+            'wallet': sender,
+            'receiver': receiver_address,
+            'asa_id': asa_id,
+            'amount': amount
+        }
+    except Exception as e:
+        result = {
+            'success': False,
+            'wallet': sender,
+            'error': f'Failed to transfer ASA: {str(e)}'
+        }
+    finally:
+        if address:
+            await client.run(pool.release, address, reservation_id, asa_id, amount, fee, success)
+
+    if address:
+        rebalanced = await client.run(pool.rebalance, [address])
+        if rebalanced:
+            result['rebalance_tx_id'] = rebalanced[address]
+    return result
+
+
+async def transfer_asa(receiver_address, asa_id, amount, client=None, priority='urgent'):
+    """
+    Async create_claim_transaction.transfer_asa
+
+    Routed through the signer pool named by ALGORAND_SIGNER_POOL_STATE,
+    like the sync version.
+
+    Returns:
+        dict: {'success': bool, 'tx_id': str, 'fee': int, 'wallet': str, 'error': str}
+    """
+    try:
+        client = client or get_async_algod_client()
+
+        deployer_mnemonic = os.getenv('ALGORAND_DEPLOYER_MNEMONIC')
+        if not deployer_mnemonic:
+            return {
+                'success': False,
+                'error': 'ALGORAND_DEPLOYER_MNEMONIC not set'
+            }
+
+        pool_state = os.getenv('ALGORAND_SIGNER_POOL_STATE')
+        if pool_state:
+            pool = await client.run(
+                functools.partial(
+                    SignerPool,
+                    pool_state,
+                    deployer_mnemonic,
+                    wallet_mnemonics=wallet_mnemonics_from_env(),
+                    asa_targets=asa_targets_from_env(),
+                    client=client.sync_client
+                )
+            )
+            return await _pool_transfer(pool, client, receiver_address, asa_id, amount, priority)
+
+        deployer_private_key = mnemonic.to_private_key(deployer_mnemonic)
+
+        params = await client.suggested_params()
+        await _prepare(client, params)
+        signed, fee = sign_reward_transfer(
+            client.sync_client, deployer_private_key, receiver_address, asa_id, amount, params, priority
+        )
+
+        tx_id = await _send_signed(client, signed)
+        await wait_for_confirmation(client, tx_id, 4)
+
+        return {
+            'success': True,
+            'tx_id': tx_id,
+            'fee': fee,
+            'receiver': receiver_address,
+            'asa_id': asa_id,
+            'amount': amount
+        }
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f'Failed to transfer ASA: {str(e)}'
+        }
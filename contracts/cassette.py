@@ -0,0 +1,396 @@
+"""
+Record-and-replay harness for algod traffic
+Records every algod request and response of real flows (with timing) into a
+JSONL cassette, replays them offline with the original or scaled latency,
+and compares request counts and wall time per flow between two runs
+"""
+
+import re
+import sys
+import copy
+import json
+import time
+import base64
+import argparse
+import importlib
+import threading
+import contextlib
+from collections import deque
+import msgpack
+from algosdk import encoding
+from algosdk.error import AlgodHTTPError
+from algosdk.v2client import algod
+
+from contracts.deploy import get_algod_client
+from contracts.rate_limit import install_shared_client
+
+
+CASSETTE_VERSION = 1
+
+# Flows slower than the baseline by more than this fraction are regressions
+DEFAULT_TOLERANCE = 0.10
+
+# Workload run when none is named (deploy, deposit and reward claim flows)
+DEFAULT_WORKLOAD = "contracts.workload"
+
+# Path segments that differ between runs of the same workload
+TXID_SEGMENT = re.compile(r"^[A-Z2-7]{52}$")
+ADDRESS_SEGMENT = re.compile(r"^[A-Z2-7]{58}$")
+
+
+class CassetteMiss(Exception):
+    """Raised in replay for a request the cassette has no response for"""
+
+
+def request_key(method, requrl, params):
+    """
+    Key used to match a request to its recording
+
+    Transaction ids and addresses in the path are wildcarded, so a run
+    whose transactions differ (e.g. other fees) still matches.
+    """
+    segments = []
+    for segment in requrl.split("/"):
+        if TXID_SEGMENT.match(segment):
+            segment = "{txid}"
+        elif ADDRESS_SEGMENT.match(segment):
+            segment = "{address}"
+        segments.append(segment)
+    query = "&".join(f"{key}={value}" for key, value in sorted((params or {}).items()))
+    return f"{method} {'/'.join(segments)}?{query}"
+
+
+def _first_txid(raw_group):
+    """Transaction id of the first signed transaction in a raw group"""
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(raw_group)
+    signed = next(unpacker)
+    packed = base64.b64encode(msgpack.packb(signed, use_bin_type=True)).decode()
+    return encoding.msgpack_decode(packed).get_txid()
+
+
+class _CassetteClient(algod.AlgodClient):
+    """AlgodClient that counts requests and times named flows"""
+
+    def __init__(self, algod_token, algod_address, headers=None):
+        super().__init__(algod_token, algod_address, headers)
+        self.flows = []
+        self._flow = None
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def flow(self, name):
+        """
+        Attribute the requests made inside the block to flow `name`
+
+        An exception ends the flow and is recorded as its error rather
+        than raised, so the remaining flows still run.
+        """
+        self._flow = {'type': 'flow', 'name': name, 'requests': 0}
+        started = time.perf_counter()
+        try:
+            yield
+            self._flow['error'] = None
+        except Exception as e:
+            self._flow['error'] = str(e)
+        finally:
+            self._flow['wall_time'] = time.perf_counter() - started
+            self.flows.append(self._flow)
+            self._on_flow(self._flow)
+            self._flow = None
+
+    def _count_request(self):
+        with self._lock:
+            if self._flow is not None:
+                self._flow['requests'] += 1
+                return self._flow['name']
+            return None
+
+    def _on_flow(self, flow):
+        pass
+
+
+class RecordingAlgodClient(_CassetteClient):
+    """
+    Pass-through client that writes every request to a cassette
+
+    Each line of the cassette is a JSON object: one 'header', then an
+    'interaction' per request (method, path, params, response or error,
+    elapsed seconds, flow) and a 'flow' summary after each flow.
+    """
+
+    def __init__(self, cassette_path, client=None):
+        """
+        Args:
+            cassette_path: JSONL file to write (overwritten)
+            client: Algod client that really sends requests (defaults to
+                the shared TestNet client)
+        """
+        self.client = client or get_algod_client()
+        super().__init__(self.client.algod_token, self.client.algod_address, self.client.headers)
+        self._file = open(cassette_path, "w")
+        self._write({
+            'type': 'header',
+            'version': CASSETTE_VERSION,
+            'algod_address': self.client.algod_address,
+            'recorded_at': int(time.time())
+        })
+
+    def _write(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def _on_flow(self, flow):
+        self._write(flow)
+
+    def algod_request(
+        self,
+        method,
+        requrl,
+        params=None,
+        data=None,
+        headers=None,
+        response_format="json",
+        timeout=30
+    ):
+        entry = {
+            'type': 'interaction',
+            'flow': self._count_request(),
+            'key': request_key(method, requrl, params),
+            'method': method,
+            'path': requrl,
+            'params': params,
+            'response_format': response_format
+        }
+        started = time.perf_counter()
+        try:
+            response = self.client.algod_request(
+                method, requrl, params, data, headers, response_format, timeout
+            )
+            if response_format == "json":
+                entry['response'] = response
+            else:
+                entry['response_b64'] = base64.b64encode(response).decode()
+            return response
+        except AlgodHTTPError as e:
+            entry['error'] = {'message': str(e), 'code': e.code, 'data': e.data}
+            raise
+        except Exception as e:
+            entry['error'] = {'message': str(e), 'code': None, 'data': None}
+            raise
+        finally:
+            entry['elapsed'] = time.perf_counter() - started
+            self._write(entry)
+
+    def close(self):
+        self._file.close()
+
+
+class ReplayAlgodClient(_CassetteClient):
+    """
+    Offline client that answers from a cassette
+
+    Recorded responses are served in order per request key; once a key's
+    recordings are used up its last response is repeated (e.g. a
+    confirmation poll that now runs one more time). Each response waits
+    its recorded latency times `latency_scale` (0 measures CPU time only).
+    Submitted transactions are answered with their real transaction id.
+    """
+
+    def __init__(self, cassette_path, latency_scale=1.0):
+        self.latency_scale = latency_scale
+        self.recorded_flows = []
+        self._responses = {}
+
+        header = None
+        with open(cassette_path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry['type'] == 'header':
+                    header = entry
+                elif entry['type'] == 'interaction':
+                    self._responses.setdefault(entry['key'], deque()).append(entry)
+                elif entry['type'] == 'flow':
+                    self.recorded_flows.append(entry)
+
+        if header is None or header['version'] != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette format in {cassette_path}")
+        super().__init__("", header['algod_address'])
+
+    def algod_request(
+        self,
+        method,
+        requrl,
+        params=None,
+        data=None,
+        headers=None,
+        response_format="json",
+        timeout=30
+    ):
+        self._count_request()
+        key = request_key(method, requrl, params)
+
+        with self._lock:
+            recordings = self._responses.get(key)
+            if not recordings:
+                raise CassetteMiss(f"No recorded response for {key}")
+            entry = recordings.popleft() if len(recordings) > 1 else recordings[0]
+
+        if self.latency_scale:
+            time.sleep(entry['elapsed'] * self.latency_scale)
+
+        if 'error' in entry:
+            error = entry['error']
+            if error['code'] is None:
+                raise ConnectionError(error['message'])
+            raise AlgodHTTPError(error['message'], error['code'], error['data'])
+
+        if method == "POST" and requrl == "/transactions":
+            return {'txId': _first_txid(data)}
+        if 'response_b64' in entry:
+            return base64.b64decode(entry['response_b64'])
+        return copy.deepcopy(entry['response'])
+
+
+def run_flows(client, flows):
+    """
+    Run named flows with `client` installed as the shared algod client
+
+    Every module's get_algod_client() goes through rate_limit.shared_client,
+    so the flows need no changes to be recorded or replayed.
+
+    Args:
+        client: RecordingAlgodClient or ReplayAlgodClient
+        flows: [(name, callable)]; a flow fails if it raises or returns a
+            dict with 'success': False
+
+    Returns:
+        list: Flow summaries of this run
+    """
+    previous = install_shared_client(client.algod_address, client)
+    try:
+        for name, run in flows:
+            with client.flow(name):
+                result = run()
+                if isinstance(result, dict) and result.get('success') is False:
+                    raise RuntimeError(result.get('error', 'flow reported failure'))
+    finally:
+        install_shared_client(client.algod_address, previous)
+    return client.flows
+
+
+def summarize_flows(flows):
+    """
+    Returns:
+        dict: {name: {'runs': int, 'requests': int, 'wall_time': float, 'errors': int}}
+    """
+    summary = {}
+    for flow in flows:
+        entry = summary.setdefault(flow['name'], {'runs': 0, 'requests': 0, 'wall_time': 0.0, 'errors': 0})
+        entry['runs'] += 1
+        entry['requests'] += flow['requests']
+        entry['wall_time'] += flow['wall_time']
+        entry['errors'] += 1 if flow.get('error') else 0
+    return summary
+
+
+def compare_flows(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare two runs of the same workload flow by flow
+
+    A flow regresses if it makes more requests, fails where it did not,
+    or its wall time grows by more than `tolerance`.
+
+    Returns:
+        dict: {
+            'flows': {name: {'requests_before', 'requests_after',
+                             'wall_time_before', 'wall_time_after',
+                             'wall_time_change', 'regression'}},
+            'regressions': [name]
+        }
+    """
+    before = summarize_flows(baseline)
+    after = summarize_flows(current)
+
+    flows = {}
+    regressions = []
+    for name in sorted(set(before) | set(after)):
+        old = before.get(name)
+        new = after.get(name)
+        if old is None or new is None:
+            flows[name] = {'missing_from': 'baseline' if old is None else 'current', 'regression': True}
+            regressions.append(name)
+            continue
+
+        change = (new['wall_time'] - old['wall_time']) / old['wall_time'] if old['wall_time'] else 0.0
+        regression = (
+            new['requests'] > old['requests']
+            or new['errors'] > old['errors']
+            or change > tolerance
+        )
+        flows[name] = {
+            'requests_before': old['requests'],
+            'requests_after': new['requests'],
+            'wall_time_before': round(old['wall_time'], 4),
+            'wall_time_after': round(new['wall_time'], 4),
+            'wall_time_change': round(change, 4),
+            'regression': regression
+        }
+        if regression:
+            regressions.append(name)
+
+    return {'flows': flows, 'regressions': regressions}
+
+
+def load_flows(spec):
+    """Load a [(name, callable)] list from 'module:attribute'"""
+    module_name, _, attribute = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attribute or "FLOWS")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record or replay algod traffic of named flows")
+    parser.add_argument("mode", choices=("record", "replay"))
+    parser.add_argument("cassette", help="Cassette file (JSONL)")
+    parser.add_argument("flows", nargs="?", default=DEFAULT_WORKLOAD,
+                        help="Workload as module:attribute holding [(name, callable)] "
+                             f"(default: {DEFAULT_WORKLOAD})")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Replay latency multiplier (0 = no network wait)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--save", help="Replay: write this run's flow summaries to a JSON file")
+    parser.add_argument("--baseline", help="Replay: compare against flow summaries saved by --save "
+                                           "(default: the recording)")
+    args = parser.parse_args()
+
+    flows = load_flows(args.flows)
+
+    if args.mode == "record":
+        client = RecordingAlgodClient(args.cassette)
+        try:
+            recorded = run_flows(client, flows)
+        finally:
+            client.close()
+        print(json.dumps(summarize_flows(recorded), indent=2))
+        sys.exit(0)
+
+    client = ReplayAlgodClient(args.cassette, latency_scale=args.latency_scale)
+    replayed = run_flows(client, flows)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(replayed, f, indent=2)
+
+    # Replays at the same latency scale are directly comparable; the
+    # recording itself is only a fair baseline at scale 1
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    else:
+        baseline = client.recorded_flows
+    comparison = compare_flows(baseline, replayed, args.tolerance)
+
+    print(json.dumps(comparison, indent=2))
+    sys.exit(1 if comparison['regressions'] else 0)
@@ -7,10 +7,20 @@ import json
 import base64
 import os
 from algosdk import mnemonic, account
-from algosdk.v2client import algod
 from algosdk.transaction import AssetTransferTxn, wait_for_confirmation
 from algosdk import encoding
 
+try:
+    from contracts.fees import shared_policy
+    from contracts.rate_limit import shared_client
+    from contracts.signer_pool import SignerPool, asa_targets_from_env, wallet_mnemonics_from_env
+    from contracts.txn_templates import send_signed, templates_for
+except ImportError:  # run as a script from inside contracts/
+    from fees import shared_policy
+    from rate_limit import shared_client
+    from signer_pool import SignerPool, asa_targets_from_env, wallet_mnemonics_from_env
+    from txn_templates import send_signed, templates_for
+
 # Algorand TestNet configuration
 TESTNET_ALGOD_ADDRESS = "https://testnet-api.algonode.cloud"
 TESTNET_ALGOD_TOKEN = ""
@@ -48,10 +58,7 @@ def create_opt_in_transaction(receiver_address, asa_id):
         }
     """
     try:
-        client = algod.AlgodClient(
-            algod_token=TESTNET_ALGOD_TOKEN,
-            algod_address=TESTNET_ALGOD_ADDRESS
-        )
+        client = shared_client(TESTNET_ALGOD_TOKEN, TESTNET_ALGOD_ADDRESS)
         
         params = client.suggested_params()
         
@@ -79,22 +86,45 @@ def create_opt_in_transaction(receiver_address, asa_id):
         }
 
 
-def transfer_asa(receiver_address, asa_id, amount):
+def sign_reward_transfer(client, sender_private_key, receiver_address, asa_id, amount, params, priority='urgent'):
+    """
+    Build, price and sign a reward ASA transfer from the deployer
+    
+    async_api.transfer_asa signs through this as well.
+    
+    Returns:
+        tuple: (signed template transactions for send_signed, fee paid)
+    """
+    sender_address = account.address_from_private_key(sender_private_key)
+    txn = templates_for(params).asset_transfer(
+        sender_address, receiver_address, asa_id, amount, params
+    )
+    fee = shared_policy(client).apply(
+        [txn], priority=priority, params=params, operation='reward_transfer'
+    )
+    return [txn.sign(sender_private_key)], fee
+
+
+def transfer_asa(receiver_address, asa_id, amount, priority='urgent'):
     """
     Transfer ASA from deployer to receiver (backend signs and submits)
     
+    Reward claims default to 'urgent' fee priority so players are not left
+    waiting during congestion. When ALGORAND_SIGNER_POOL_STATE names a
+    signer pool state file, the transfer is sent from the least-loaded hot
+    wallet instead (see signer_pool.py), falling back to the deployer.
+    
     Returns:
         dict: {
             'success': bool,
             'tx_id': str,
+            'fee': int,
+            'wallet': str (sending account, signer pool only),
             'error': str (if failed)
         }
     """
     try:
-        client = algod.AlgodClient(
-            algod_token=TESTNET_ALGOD_TOKEN,
-            algod_address=TESTNET_ALGOD_ADDRESS
-        )
+        client = shared_client(TESTNET_ALGOD_TOKEN, TESTNET_ALGOD_ADDRESS)
         
         # Get deployer mnemonic
         deployer_mnemonic = os.getenv('ALGORAND_DEPLOYER_MNEMONIC')
@@ -104,25 +134,27 @@ def transfer_asa(receiver_address, asa_id, amount):
                 'error': 'ALGORAND_DEPLOYER_MNEMONIC not set'
             }
         
+        pool_state = os.getenv('ALGORAND_SIGNER_POOL_STATE')
+        if pool_state:
+            pool = SignerPool(
+                pool_state,
+                deployer_mnemonic,
+                wallet_mnemonics=wallet_mnemonics_from_env(),
+                asa_targets=asa_targets_from_env(),
+                client=client
+            )
+            return pool.transfer(receiver_address, asa_id, amount, priority=priority)
+        
         deployer_private_key = mnemonic.to_private_key(deployer_mnemonic)
-        deployer_address = account.address_from_private_key(deployer_private_key)
         
         params = client.suggested_params()
         
-        # Create transfer transaction
-        txn = AssetTransferTxn(
-            sender=deployer_address,
-            sp=params,
-            receiver=receiver_address,
-            amt=amount,
-            index=int(asa_id)
+        signed, fee = sign_reward_transfer(
+            client, deployer_private_key, receiver_address, asa_id, amount, params, priority
         )
         
-        # Sign transaction
-        signed_txn = txn.sign(deployer_private_key)
-        
         # Submit transaction
-        tx_id = client.send_transaction(signed_txn)
+        tx_id = send_signed(client, signed)
         
         # Wait for confirmation
         wait_for_confirmation(client, tx_id, 4)
@@ -130,6 +162,7 @@ def transfer_asa(receiver_address, asa_id, amount):
         return {
             'success': True,
             'tx_id': tx_id,
+            'fee': fee,
             'receiver': receiver_address,
             'asa_id': asa_id,
             'amount': amount
@@ -154,10 +187,7 @@ if __name__ == "__main__":
     amount = int(sys.argv[3])
     
     # Initialize client
-    client = algod.AlgodClient(
-        algod_token=TESTNET_ALGOD_TOKEN,
-        algod_address=TESTNET_ALGOD_ADDRESS
-    )
+    client = shared_client(TESTNET_ALGOD_TOKEN, TESTNET_ALGOD_ADDRESS)
     
     # Check if user has opted in to the ASA
     opted_in = check_asset_opted_in(client, receiver_address, asa_id)
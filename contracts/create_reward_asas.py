@@ -7,23 +7,24 @@ import sys
 import os
 import json
 from algosdk import account, mnemonic
-from algosdk.v2client import algod
 from algosdk.transaction import (
     AssetConfigTxn,
     wait_for_confirmation
 )
 
+try:
+    from contracts.rate_limit import shared_client
+except ImportError:  # run as a script from inside contracts/
+    from rate_limit import shared_client
+
 # Algorand TestNet configuration (AlgoNode public API)
 TESTNET_ALGOD_ADDRESS = "https://testnet-api.algonode.cloud"
 TESTNET_ALGOD_TOKEN = ""  # Public node doesn't require token
 
 
 def get_algod_client():
-    """Create and return Algod client for TestNet"""
-    return algod.AlgodClient(
-        algod_token=TESTNET_ALGOD_TOKEN,
-        algod_address=TESTNET_ALGOD_ADDRESS
-    )
+    """Return the shared rate-limited Algod client for TestNet"""
+    return shared_client(TESTNET_ALGOD_TOKEN, TESTNET_ALGOD_ADDRESS)
 
 
 def create_reward_asa(
@@ -7,27 +7,37 @@ import sys
 import os
 import base64
 import json
-from algosdk import account, mnemonic
-from algosdk.v2client import algod
+from algosdk import account, encoding, mnemonic
 from algosdk.transaction import (
     ApplicationCreateTxn,
+    PaymentTxn,
     StateSchema,
     OnComplete,
+    assign_group_id,
     wait_for_confirmation
 )
+from algosdk.logic import get_application_address
+
+try:
+    from contracts.rate_limit import shared_client
+except ImportError:  # run as a script from inside contracts/
+    from rate_limit import shared_client
 
 
 # Algorand TestNet configuration (AlgoNode public API)
 TESTNET_ALGOD_ADDRESS = "https://testnet-api.algonode.cloud"
 TESTNET_ALGOD_TOKEN = ""  # Public node doesn't require token
 
+# Algorand protocol limit on transactions per atomic group
+MAX_GROUP_SIZE = 16
+
+# Minimum balance an application account must hold before it can receive payments
+APP_ACCOUNT_MIN_BALANCE = 100_000
+
 
 def get_algod_client():
-    """Create and return Algod client for TestNet"""
-    return algod.AlgodClient(
-        algod_token=TESTNET_ALGOD_TOKEN,
-        algod_address=TESTNET_ALGOD_ADDRESS
-    )
+    """Return the shared rate-limited Algod client for TestNet"""
+    return shared_client(TESTNET_ALGOD_TOKEN, TESTNET_ALGOD_ADDRESS)
 
 
 def compile_program(client, source_code):
@@ -45,6 +55,67 @@ def compile_program(client, source_code):
     return base64.b64decode(compile_response['result'])
 
 
+def compile_escrow_programs(client):
+    """
+    Read and compile the rental escrow approval and clear programs
+    
+    Args:
+        client: Algod client
+    
+    Returns:
+        tuple: (approval_program_bytes, clear_program_bytes)
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    with open(os.path.join(script_dir, "rental_escrow_approval.teal"), "r") as f:
+        approval_program_source = f.read()
+    
+    with open(os.path.join(script_dir, "rental_escrow_clear.teal"), "r") as f:
+        clear_program_source = f.read()
+    
+    return (
+        compile_program(client, approval_program_source),
+        compile_program(client, clear_program_source)
+    )
+
+
+def escrow_state_schemas():
+    """
+    Return (global_schema, local_schema) for the rental escrow contract
+    
+    Global state: 13 values (2 addresses + 11 uints)
+    Local state: none
+    """
+    return (
+        StateSchema(num_uints=11, num_byte_slices=2),
+        StateSchema(num_uints=0, num_byte_slices=0)
+    )
+
+
+def build_escrow_app_args(
+    organizer_addr,
+    vendor_addr,
+    deposit_amount,
+    rental_fee,
+    lease_start,
+    lease_end
+):
+    """Encode rental escrow creation arguments in contract order"""
+    return [
+        encoding.decode_address(organizer_addr),  # organizer public key
+        encoding.decode_address(vendor_addr),     # vendor public key
+        deposit_amount.to_bytes(8, 'big'),  # deposit amount
+        rental_fee.to_bytes(8, 'big'),      # rental fee
+        lease_start.to_bytes(8, 'big'),     # lease start timestamp
+        lease_end.to_bytes(8, 'big')        # lease end timestamp
+    ]
+
+
+def chunked(items, size=MAX_GROUP_SIZE):
+    """Split a list into consecutive chunks of at most `size` items"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
 def deploy_rental_escrow(
     deployer_mnemonic,
     organizer_addr,
@@ -52,11 +123,15 @@ def deploy_rental_escrow(
     deposit_amount,
     rental_fee,
     lease_start,
-    lease_end
+    lease_end,
+    fund_amount=APP_ACCOUNT_MIN_BALANCE
 ):
     """
     Deploy rental escrow smart contract to Algorand TestNet
     
+    The app account is then funded with `fund_amount` microALGOs so it
+    stays above the minimum balance while it pays out the fee and deposit.
+    
     Args:
         deployer_mnemonic: 25-word mnemonic of deployer account
         organizer_addr: Event organizer wallet address
@@ -65,6 +140,7 @@ def deploy_rental_escrow(
         rental_fee: Total rental fee in microALGOs
         lease_start: Lease start timestamp (Unix seconds)
         lease_end: Lease end timestamp (Unix seconds)
+        fund_amount: microALGOs sent to the new app account
     
     Returns:
         dict: {
@@ -72,9 +148,11 @@ def deploy_rental_escrow(
             'app_id': int,
             'tx_id': str,
             'address': str (contract account address),
-            'error': str (if failed)
+            'fund_tx_id': str,
+            'error': str (if failed; 'app_id' is set if only funding failed)
         }
     """
+    app_id = None
     try:
         # Initialize client
         client = get_algod_client()
@@ -85,37 +163,23 @@ def deploy_rental_escrow(
         
         print(f"Deploying contract from: {deployer_address}")
         
-        # Read compiled TEAL programs
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        with open(os.path.join(script_dir, "rental_escrow_approval.teal"), "r") as f:
-            approval_program_source = f.read()
-        
-        with open(os.path.join(script_dir, "rental_escrow_clear.teal"), "r") as f:
-            clear_program_source = f.read()
-        
         # Compile programs to bytecode
-        approval_program_compiled = compile_program(client, approval_program_source)
-        clear_program_compiled = compile_program(client, clear_program_source)
+        approval_program_compiled, clear_program_compiled = compile_escrow_programs(client)
         
-        # Define state schema
-        # Global state: 11 values (2 addresses + 9 uints)
-        # Local state: none
-        global_schema = StateSchema(num_uints=9, num_byte_slices=2)
-        local_schema = StateSchema(num_uints=0, num_byte_slices=0)
+        global_schema, local_schema = escrow_state_schemas()
         
         # Get suggested parameters
         params = client.suggested_params()
         
         # Prepare application args
-        app_args = [
-            organizer_addr.encode(),  # organizer wallet address
-            vendor_addr.encode(),     # vendor wallet address  
-            deposit_amount.to_bytes(8, 'big'),  # deposit amount
-            rental_fee.to_bytes(8, 'big'),      # rental fee
-            lease_start.to_bytes(8, 'big'),     # lease start timestamp
-            lease_end.to_bytes(8, 'big')        # lease end timestamp
-        ]
+        app_args = build_escrow_app_args(
+            organizer_addr,
+            vendor_addr,
+            deposit_amount,
+            rental_fee,
+            lease_start,
+            lease_end
+        )
         
         # Create application transaction
         txn = ApplicationCreateTxn(
@@ -144,9 +208,20 @@ def deploy_rental_escrow(
         app_id = confirmed_txn['application-index']
         
         # Calculate contract account address
-        from algosdk.logic import get_application_address
         contract_address = get_application_address(app_id)
         
+        # Fund the app account so its payouts keep it above min balance
+        fund_tx_id = None
+        if fund_amount > 0:
+            fund_txn = PaymentTxn(
+                sender=deployer_address,
+                sp=params,
+                receiver=contract_address,
+                amt=fund_amount
+            )
+            fund_tx_id = client.send_transaction(fund_txn.sign(deployer_private_key))
+            wait_for_confirmation(client, fund_tx_id, 4)
+        
         print(f"✅ Contract deployed successfully!")
         print(f"   App ID: {app_id}")
         print(f"   Contract Address: {contract_address}")
@@ -157,16 +232,192 @@ def deploy_rental_escrow(
             'success': True,
             'app_id': app_id,
             'tx_id': tx_id,
-            'address': contract_address
+            'address': contract_address,
+            'fund_tx_id': fund_tx_id
         }
         
     except Exception as e:
         error_message = str(e)
         print(f"❌ Deployment failed: {error_message}")
-        return {
+        result = {
             'success': False,
             'error': error_message
         }
+        if app_id is not None:
+            result['app_id'] = app_id
+        return result
+
+
+def deploy_rental_escrows_batch(
+    deployer_mnemonic,
+    bookings,
+    fund_amount=APP_ACCOUNT_MIN_BALANCE,
+    client=None
+):
+    """
+    Deploy many rental escrow contracts in atomic groups of up to 16
+    
+    Programs are compiled once and suggested params fetched once for the
+    whole batch. All creation groups are submitted before waiting, so the
+    batch costs one confirmation cycle per group instead of one per booking.
+    Each new app account is then funded with `fund_amount` microALGOs in
+    grouped payments.
+    
+    Args:
+        deployer_mnemonic: 25-word mnemonic of deployer account
+        bookings: List of dicts with keys 'booking_id', 'organizer_addr',
+            'vendor_addr', 'deposit_amount', 'rental_fee', 'lease_start',
+            'lease_end' (same units as deploy_rental_escrow). A booking with
+            only 'booking_id' creates an unassigned escrow (warm pool)
+        fund_amount: microALGOs sent to each app account (0 to skip funding)
+        client: Optional Algod client (defaults to TestNet)
+    
+    Returns:
+        dict: {
+            'success': bool (False if any group failed),
+            'escrows': {booking_id: {'app_id': int, 'address': str, 'tx_id': str,
+                                     'funded': bool}},
+            'fund_tx_ids': [str],
+            'failed_groups': [{'stage': 'create' | 'confirm' | 'fund',
+                               'booking_ids': [str], 'tx_ids': [str],
+                               'error': str}],
+            'error': str (first failure, if any)
+        }
+    
+    A failed group does not stop the batch: every app that was created is
+    still returned in 'escrows' (with 'funded': False if its funding group
+    failed), so none leak unrecorded. A 'confirm' failure means the group
+    was sent but not seen confirmed; its apps may still exist.
+    """
+    escrows = {}
+    fund_tx_ids = []
+    failed_groups = []
+    
+    def fail(stage, booking_ids, tx_ids, error):
+        print(f"❌ Batch {stage} failed for {len(booking_ids)} booking(s): {error}")
+        failed_groups.append({
+            'stage': stage,
+            'booking_ids': booking_ids,
+            'tx_ids': tx_ids,
+            'error': str(error)
+        })
+    
+    def result():
+        summary = {
+            'success': not failed_groups,
+            'escrows': escrows,
+            'fund_tx_ids': fund_tx_ids,
+            'failed_groups': failed_groups
+        }
+        if failed_groups:
+            summary['error'] = failed_groups[0]['error']
+        return summary
+    
+    if not bookings:
+        return result()
+    
+    try:
+        client = client or get_algod_client()
+        
+        deployer_private_key = mnemonic.to_private_key(deployer_mnemonic)
+        deployer_address = account.address_from_private_key(deployer_private_key)
+        
+        print(f"Deploying {len(bookings)} contracts from: {deployer_address}")
+        
+        # Compile once and share params across every group
+        approval_program_compiled, clear_program_compiled = compile_escrow_programs(client)
+        global_schema, local_schema = escrow_state_schemas()
+        params = client.suggested_params()
+    except Exception as e:
+        fail('create', [booking['booking_id'] for booking in bookings], [], e)
+        return result()
+    
+    # Submit all creation groups before waiting on any of them
+    pending_groups = []
+    for group in chunked(bookings):
+        booking_ids = [booking['booking_id'] for booking in group]
+        try:
+            txns = [
+                ApplicationCreateTxn(
+                    sender=deployer_address,
+                    sp=params,
+                    on_complete=OnComplete.NoOpOC,
+                    approval_program=approval_program_compiled,
+                    clear_program=clear_program_compiled,
+                    global_schema=global_schema,
+                    local_schema=local_schema,
+                    app_args=build_escrow_app_args(
+                        booking['organizer_addr'],
+                        booking['vendor_addr'],
+                        booking['deposit_amount'],
+                        booking['rental_fee'],
+                        booking['lease_start'],
+                        booking['lease_end']
+                    ) if 'organizer_addr' in booking else []
+                )
+                for booking in group
+            ]
+            if len(txns) > 1:
+                assign_group_id(txns)
+            
+            signed_txns = [txn.sign(deployer_private_key) for txn in txns]
+            client.send_transactions(signed_txns)
+            pending_groups.append((group, [txn.get_txid() for txn in txns]))
+        except Exception as e:
+            fail('create', booking_ids, [], e)
+    
+    print(f"Submitted {len(pending_groups)} creation group(s), waiting for confirmation...")
+    
+    # A group confirms atomically, so waiting on its first txn is enough
+    for group, tx_ids in pending_groups:
+        try:
+            wait_for_confirmation(client, tx_ids[0], 4)
+            for booking, tx_id in zip(group, tx_ids):
+                app_id = client.pending_transaction_info(tx_id)['application-index']
+                escrows[booking['booking_id']] = {
+                    'app_id': app_id,
+                    'address': get_application_address(app_id),
+                    'tx_id': tx_id,
+                    'funded': fund_amount <= 0
+                }
+        except Exception as e:
+            fail('confirm', [booking['booking_id'] for booking in group], tx_ids, e)
+    
+    # Fund every new app account in grouped payments
+    if fund_amount > 0:
+        pending_fund_groups = []
+        for group in chunked(list(escrows.items())):
+            booking_ids = [booking_id for booking_id, _ in group]
+            try:
+                txns = [
+                    PaymentTxn(
+                        sender=deployer_address,
+                        sp=params,
+                        receiver=escrow['address'],
+                        amt=fund_amount
+                    )
+                    for _, escrow in group
+                ]
+                if len(txns) > 1:
+                    assign_group_id(txns)
+                
+                client.send_transactions([txn.sign(deployer_private_key) for txn in txns])
+                pending_fund_groups.append((booking_ids, txns[0].get_txid()))
+            except Exception as e:
+                fail('fund', booking_ids, [], e)
+        
+        for booking_ids, tx_id in pending_fund_groups:
+            try:
+                wait_for_confirmation(client, tx_id, 4)
+                fund_tx_ids.append(tx_id)
+                for booking_id in booking_ids:
+                    escrows[booking_id]['funded'] = True
+            except Exception as e:
+                fail('fund', booking_ids, [tx_id], e)
+    
+    print(f"✅ Deployed {len(escrows)} contracts in {len(pending_groups)} group(s)")
+    
+    return result()
 
 
 if __name__ == "__main__":
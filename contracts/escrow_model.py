@@ -0,0 +1,199 @@
+"""
+Local model of the rental escrow contract lifecycle
+Mirrors the assertions in rental_escrow.approval_program so an action can be
+rejected from cached state before any transaction is built or sent
+"""
+
+
+# Vendor may sweep the escrow this many seconds after lease_end (30 days)
+TIMEOUT_GRACE_PERIOD = 2592000
+
+ACTIONS = (
+    'bind',
+    'deposit',
+    'delivery',
+    'return',
+    'damage',
+    'release_fee',
+    'settle_fee',
+    'refund',
+    'claim',
+    'timeout',
+    'delete'
+)
+
+# Human-readable text for each rejection reason
+REJECTION_MESSAGES = {
+    'unknown_action': 'Unknown escrow action',
+    'already_bound': 'Escrow is already bound to a booking',
+    'not_organizer': 'Only the organizer can perform this action',
+    'not_vendor': 'Only the vendor can perform this action',
+    'deposit_already_paid': 'Deposit has already been paid',
+    'deposit_not_paid': 'Deposit has not been paid yet',
+    'insufficient_payment': 'Payment is less than deposit plus rental fee',
+    'already_delivered': 'Prop delivery has already been confirmed',
+    'not_delivered': 'Prop delivery has not been confirmed yet',
+    'already_returned': 'Prop return has already been confirmed',
+    'not_returned': 'Prop return has not been confirmed yet',
+    'damage_reported': 'Damage has been reported for this rental',
+    'dispute_active': 'A dispute is active for this rental',
+    'no_damage_reported': 'No damage has been reported for this rental',
+    'timeout_not_reached': 'Lease end grace period has not passed yet',
+    'fee_already_released': 'Rental fee has already been released',
+    'already_settled': 'Deposit has already been settled',
+    'not_settled': 'Escrow is not fully settled yet',
+}
+
+
+def _reject(action, reason):
+    return {
+        'allowed': False,
+        'action': action,
+        'reason': reason,
+        'message': REJECTION_MESSAGES[reason]
+    }
+
+
+def validate_action(state, action, sender=None, payment_amount=None, now=None):
+    """
+    Check whether the contract would accept `action` in the given state
+
+    Checks run in the same order as the contract's Asserts, so the reported
+    reason is the one algod would have failed on.
+
+    Args:
+        state: Decoded global state (as returned by get_contract_state)
+        action: One of ACTIONS
+        sender: Address submitting the app call (skip sender checks if None)
+        payment_amount: Grouped payment amount for 'deposit' (skipped if None)
+        now: Unix timestamp compared like Global.latest_timestamp ('timeout')
+
+    Returns:
+        dict: {
+            'allowed': bool,
+            'action': str,
+            'reason': str (if rejected),
+            'message': str (if rejected)
+        }
+    """
+    def is_sender(key):
+        return sender is None or sender == state.get(key)
+
+    if action == 'bind':
+        # Creator-only; the creator is not part of global state
+        if state.get('organizer', '') != '':
+            return _reject(action, 'already_bound')
+
+    elif action == 'deposit':
+        if not is_sender('organizer'):
+            return _reject(action, 'not_organizer')
+        if state.get('deposit_paid', 0) != 0:
+            return _reject(action, 'deposit_already_paid')
+        if payment_amount is not None and (
+            payment_amount < state.get('deposit_amount', 0) + state.get('rental_fee', 0)
+        ):
+            return _reject(action, 'insufficient_payment')
+
+    elif action == 'delivery':
+        if not is_sender('vendor'):
+            return _reject(action, 'not_vendor')
+        if state.get('deposit_paid', 0) != 1:
+            return _reject(action, 'deposit_not_paid')
+        if state.get('prop_delivered', 0) != 0:
+            return _reject(action, 'already_delivered')
+
+    elif action == 'return':
+        if not is_sender('organizer'):
+            return _reject(action, 'not_organizer')
+        if state.get('prop_delivered', 0) != 1:
+            return _reject(action, 'not_delivered')
+        if state.get('prop_returned', 0) != 0:
+            return _reject(action, 'already_returned')
+
+    elif action == 'damage':
+        if not is_sender('vendor'):
+            return _reject(action, 'not_vendor')
+        if state.get('prop_returned', 0) != 1:
+            return _reject(action, 'not_returned')
+
+    elif action == 'release_fee':
+        if state.get('prop_delivered', 0) != 1:
+            return _reject(action, 'not_delivered')
+        if state.get('fee_released', 0) != 0:
+            return _reject(action, 'fee_already_released')
+
+    elif action == 'settle_fee':
+        # Creator-only; the creator is not part of global state
+        if state.get('prop_delivered', 0) != 1:
+            return _reject(action, 'not_delivered')
+        if state.get('fee_released', 0) != 0:
+            return _reject(action, 'fee_already_released')
+
+    elif action == 'refund':
+        if state.get('prop_returned', 0) != 1:
+            return _reject(action, 'not_returned')
+        if state.get('damage_reported', 0) != 0:
+            return _reject(action, 'damage_reported')
+        if state.get('dispute_active', 0) != 0:
+            return _reject(action, 'dispute_active')
+        if state.get('settled', 0) != 0:
+            return _reject(action, 'already_settled')
+
+    elif action == 'claim':
+        if state.get('damage_reported', 0) != 1:
+            return _reject(action, 'no_damage_reported')
+        if state.get('settled', 0) != 0:
+            return _reject(action, 'already_settled')
+
+    elif action == 'timeout':
+        if not is_sender('vendor'):
+            return _reject(action, 'not_vendor')
+        if now is not None and now < state.get('lease_end', 0) + TIMEOUT_GRACE_PERIOD:
+            return _reject(action, 'timeout_not_reached')
+        if state.get('settled', 0) != 0:
+            return _reject(action, 'already_settled')
+
+    elif action == 'delete':
+        # Creator-only; unbound warm-pool escrows may always be deleted
+        if state.get('organizer', '') != '' and not (
+            state.get('settled', 0) == 1 and state.get('fee_released', 0) == 1
+        ):
+            return _reject(action, 'not_settled')
+
+    else:
+        return _reject(action, 'unknown_action')
+
+    return {'allowed': True, 'action': action}
+
+
+def apply_action(state, action, terms=None):
+    """
+    Return the global state after the contract accepts `action`
+
+    Used by caches and mirrors to advance state once a call is confirmed.
+    The input dict is not modified. 'bind' takes the new terms from
+    `terms` (organizer, vendor, deposit_amount, rental_fee, lease_start,
+    lease_end).
+    """
+    new_state = dict(state)
+
+    if action == 'bind':
+        new_state.update(terms or {})
+    elif action == 'deposit':
+        new_state['deposit_paid'] = 1
+    elif action == 'delivery':
+        new_state['prop_delivered'] = 1
+    elif action == 'return':
+        new_state['prop_returned'] = 1
+    elif action == 'damage':
+        new_state['damage_reported'] = 1
+        new_state['dispute_active'] = 1
+    elif action in ('release_fee', 'settle_fee'):
+        new_state['fee_released'] = 1
+    elif action in ('refund', 'claim'):
+        new_state['settled'] = 1
+    elif action == 'timeout':
+        new_state['fee_released'] = 1
+        new_state['settled'] = 1
+
+    return new_state
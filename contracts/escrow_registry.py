@@ -0,0 +1,290 @@
+"""
+Columnar in-memory registry of rental escrows for dashboard aggregates
+Stores escrow state in typed array columns with interned addresses so
+filters and group-by sums over hundreds of thousands of escrows stay fast.
+NumPy is used for vectorized scans when installed; otherwise the same
+queries run over the stdlib arrays.
+"""
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # optional acceleration
+    np = None
+
+
+# Status flag bits, one per boolean in the contract's global state
+DEPOSIT_PAID = 1
+PROP_DELIVERED = 2
+PROP_RETURNED = 4
+DAMAGE_REPORTED = 8
+DISPUTE_ACTIVE = 16
+FEE_RELEASED = 32
+SETTLED = 64
+
+STATE_FLAGS = {
+    'deposit_paid': DEPOSIT_PAID,
+    'prop_delivered': PROP_DELIVERED,
+    'prop_returned': PROP_RETURNED,
+    'damage_reported': DAMAGE_REPORTED,
+    'dispute_active': DISPUTE_ACTIVE,
+    'fee_released': FEE_RELEASED,
+    'settled': SETTLED,
+}
+
+# Integer columns copied straight from global state
+AMOUNT_COLUMNS = ('deposit_amount', 'rental_fee', 'lease_start', 'lease_end')
+
+# Interned string columns: name -> global state key (None = caller supplied)
+INTERNED_COLUMNS = {'organizer': 'organizer', 'vendor': 'vendor', 'event': None}
+
+# No event supplied for an escrow
+NO_EVENT = -1
+
+
+class EscrowRegistry:
+    """
+    Escrow state held as parallel typed columns, one row per app
+
+    Rows are addressed through `self.rows` (app_id -> row). Removal swaps
+    the last row into the freed slot, so columns stay dense.
+    """
+
+    def __init__(self):
+        self.columns = {'app_id': array('q'), 'flags': array('B')}
+        for name in AMOUNT_COLUMNS:
+            self.columns[name] = array('q')
+        for name in INTERNED_COLUMNS:
+            self.columns[name] = array('i')
+
+        self.rows = {}
+        self._values = {name: [] for name in INTERNED_COLUMNS}
+        self._index = {name: {} for name in INTERNED_COLUMNS}
+
+    def __len__(self):
+        return len(self.columns['app_id'])
+
+    def intern(self, column, value):
+        """Return the integer id of `value` in an interned column"""
+        if value is None:
+            return NO_EVENT
+        index = self._index[column]
+        if value not in index:
+            index[value] = len(self._values[column])
+            self._values[column].append(value)
+        return index[value]
+
+    def _encode(self, state, event_id):
+        flags = 0
+        for key, bit in STATE_FLAGS.items():
+            if state.get(key):
+                flags |= bit
+
+        row = {'flags': flags, 'event': self.intern('event', event_id)}
+        for name in AMOUNT_COLUMNS:
+            row[name] = state.get(name, 0)
+        for name, key in INTERNED_COLUMNS.items():
+            if key is not None:
+                row[name] = self.intern(name, state.get(key))
+        return row
+
+    def upsert(self, app_id, state, event_id=None):
+        """
+        Insert or replace an escrow from its decoded global state
+
+        Args:
+            app_id: Application ID
+            state: Decoded global state (as from get_contract_state)
+            event_id: Optional event the booking belongs to (an existing
+                row keeps its event when omitted)
+        """
+        row_values = self._encode(state, event_id)
+        row = self.rows.get(app_id)
+        if row is not None and event_id is None:
+            del row_values['event']
+
+        if row is None:
+            self.rows[app_id] = len(self)
+            self.columns['app_id'].append(app_id)
+            for name, value in row_values.items():
+                self.columns[name].append(value)
+        else:
+            for name, value in row_values.items():
+                self.columns[name][row] = value
+
+    def update(self, app_id, changes):
+        """
+        Apply a partial state change, e.g. {'prop_returned': 1}
+
+        Only the touched columns are written.
+        """
+        row = self.rows[app_id]
+        for key, value in changes.items():
+            if key in STATE_FLAGS:
+                if value:
+                    self.columns['flags'][row] |= STATE_FLAGS[key]
+                else:
+                    self.columns['flags'][row] &= ~STATE_FLAGS[key] & 0xFF
+            elif key in AMOUNT_COLUMNS:
+                self.columns[key][row] = value
+            elif key in INTERNED_COLUMNS.values():
+                self.columns[key][row] = self.intern(key, value)
+
+    def remove(self, app_id):
+        """Drop an escrow by moving the last row into its slot"""
+        row = self.rows.pop(app_id)
+        last = len(self) - 1
+
+        for column in self.columns.values():
+            if row != last:
+                column[row] = column[last]
+            column.pop()
+
+        if row != last:
+            self.rows[self.columns['app_id'][row]] = row
+
+    def labels(self, column):
+        """Return the interned values of a column, indexed by id"""
+        return self._values[column]
+
+    def load_columns(self, columns, labels):
+        """
+        Replace the registry contents with prebuilt columns
+
+        Args:
+            columns: {name: array} with the same names and typecodes as
+                self.columns, all of equal length
+            labels: {interned column: list of values indexed by id}
+        """
+        self.columns = columns
+        self._values = {name: list(labels[name]) for name in INTERNED_COLUMNS}
+        self._index = {
+            name: {value: i for i, value in enumerate(values)}
+            for name, values in self._values.items()
+        }
+        self.rows = dict(zip(columns['app_id'], range(len(columns['app_id']))))
+
+    def _view(self, name):
+        column = self.columns[name]
+        if np is not None:
+            return np.frombuffer(column, dtype=column.typecode) if len(column) else np.array([], dtype=column.typecode)
+        return column
+
+    def select(self, flags_set=0, flags_clear=0, lease_end_before=None, vendor=None, event=None):
+        """
+        Return a row mask for escrows matching every given condition
+
+        Args:
+            flags_set: Flag bits that must all be set
+            flags_clear: Flag bits that must all be clear
+            lease_end_before: Only escrows with lease_end < this timestamp
+            vendor: Only this vendor address
+            event: Only this event id
+
+        Returns:
+            NumPy bool array, or list of bools without NumPy
+        """
+        flags = self._view('flags')
+        lease_end = self._view('lease_end')
+        vendor_id = self._index['vendor'].get(vendor, -2) if vendor is not None else None
+        event_id = self._index['event'].get(event, -2) if event is not None else None
+        vendors = self._view('vendor')
+        events = self._view('event')
+
+        if np is not None:
+            mask = (flags & flags_set) == flags_set
+            if flags_clear:
+                mask &= (flags & flags_clear) == 0
+            if lease_end_before is not None:
+                mask &= lease_end < lease_end_before
+            if vendor_id is not None:
+                mask &= vendors == vendor_id
+            if event_id is not None:
+                mask &= events == event_id
+            return mask
+
+        return [
+            (f & flags_set) == flags_set
+            and not (f & flags_clear)
+            and (lease_end_before is None or lease_end[i] < lease_end_before)
+            and (vendor_id is None or vendors[i] == vendor_id)
+            and (event_id is None or events[i] == event_id)
+            for i, f in enumerate(flags)
+        ]
+
+    def app_ids(self, mask):
+        """Return the app ids of rows selected by `mask`"""
+        if np is not None:
+            return self._view('app_id')[mask].tolist()
+        return [app_id for app_id, keep in zip(self.columns['app_id'], mask) if keep]
+
+    def sum_by(self, value_column, by, mask=None):
+        """
+        Sum `value_column` per distinct value of interned column `by`
+
+        Returns:
+            dict: {group value: total}
+        """
+        values = self._view(value_column)
+        groups = self._view(by)
+        labels = self._values[by]
+
+        if np is not None:
+            if mask is not None:
+                values, groups = values[mask], groups[mask]
+            keep = groups >= 0
+            totals = np.bincount(groups[keep], weights=values[keep], minlength=len(labels))
+            return {labels[i]: int(total) for i, total in enumerate(totals) if total}
+
+        totals = {}
+        for i, group in enumerate(groups):
+            if group >= 0 and (mask is None or mask[i]):
+                totals[labels[group]] = totals.get(labels[group], 0) + values[i]
+        return {label: total for label, total in totals.items() if total}
+
+    def count_by(self, by, mask=None):
+        """
+        Count rows per distinct value of interned column `by`
+
+        Returns:
+            dict: {group value: count}
+        """
+        groups = self._view(by)
+        labels = self._values[by]
+
+        if np is not None:
+            if mask is not None:
+                groups = groups[mask]
+            counts = np.bincount(groups[groups >= 0], minlength=len(labels))
+            return {labels[i]: int(count) for i, count in enumerate(counts) if count}
+
+        counts = {}
+        for i, group in enumerate(groups):
+            if group >= 0 and (mask is None or mask[i]):
+                counts[labels[group]] = counts.get(labels[group], 0) + 1
+        return counts
+
+    def deposit_locked_by_vendor(self):
+        """Total deposit held in escrow per vendor (paid, not yet settled)"""
+        return self.sum_by('deposit_amount', 'vendor', self.select(DEPOSIT_PAID, SETTLED))
+
+    def open_escrows_by_event(self):
+        """Number of funded escrows per event whose prop is not back yet"""
+        return self.count_by('event', self.select(DEPOSIT_PAID, PROP_RETURNED))
+
+    def settled_app_ids(self):
+        """App ids whose deposit is settled and fee released (deletable)"""
+        return self.app_ids(self.select(SETTLED | FEE_RELEASED))
+
+    def fees_owed_by_vendor(self):
+        """Rental fees earned (prop delivered) but not yet paid out, per vendor"""
+        return self.sum_by('rental_fee', 'vendor', self.select(PROP_DELIVERED, FEE_RELEASED))
+
+    def fee_owed_app_ids(self):
+        """App ids whose rental fee can be collected for settlement"""
+        return self.app_ids(self.select(PROP_DELIVERED, FEE_RELEASED))
+
+    def overdue_returns(self, now):
+        """App ids of delivered props not returned by lease_end"""
+        return self.app_ids(self.select(PROP_DELIVERED, PROP_RETURNED, lease_end_before=now))
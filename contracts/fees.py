@@ -0,0 +1,194 @@
+"""
+Fee policy for contract and reward transactions
+Reads network congestion from algod, prices transactions per priority,
+pools a whole group's fee on one payer transaction and tallies the fees
+spent per operation
+"""
+
+import time
+import threading
+
+
+# Pending pool size above which the network is treated as congested
+CONGESTION_POOL_THRESHOLD = 10_000
+
+# Typical signed transaction size, used to price per-byte fees when the
+# transaction itself is not at hand (inner transactions)
+TYPICAL_TXN_SIZE = 250
+
+# Bytes a transaction grows by after estimate_size(): the group id added by
+# assign_group_id and the widest fee value apply() may set
+GROUP_ID_SIZE = 38
+FEE_FIELD_SIZE = 13
+
+# Seconds a congestion reading is reused before asking algod again
+CONGESTION_REFRESH_INTERVAL = 10
+
+# Per-priority strategy: fee multiplier applied under congestion, and a cap
+# in microALGOs per transaction. The cap never goes below the fee the network
+# requires for the transaction. Uncongested, every priority pays min fee.
+FEE_STRATEGIES = {
+    'urgent': {'multiplier': 4, 'max_fee': 20_000},       # player reward claims
+    'normal': {'multiplier': 2, 'max_fee': 10_000},       # booking flow calls
+    'background': {'multiplier': 1, 'max_fee': 2_000},    # sweeps, timeouts, airdrops
+}
+
+
+_shared_policies = {}
+_shared_policies_lock = threading.Lock()
+
+
+class FeePolicy:
+    """
+    Price and pool transaction fees according to network congestion
+
+    Fees must be applied before assign_group_id, since the group id
+    covers each member's fee. Pass the suggested params already fetched
+    for the transactions so pricing costs no extra params request.
+    """
+
+    def __init__(self, client, strategies=None):
+        """
+        Args:
+            client: Algod client
+            strategies: Optional overrides of FEE_STRATEGIES
+        """
+        self.client = client
+        self.strategies = dict(FEE_STRATEGIES, **(strategies or {}))
+        self.spent = {}
+        self._pending = None
+        self._pending_read_at = 0.0
+        self._params = None
+        self._lock = threading.Lock()
+
+    def _pending_txns(self, now):
+        """Pending pool size, read from algod at most every refresh interval"""
+        if self._pending is None or now - self._pending_read_at > CONGESTION_REFRESH_INTERVAL:
+            self._pending = self.client.pending_transactions(max_txns=1).get('total-transactions', 0)
+            self._pending_read_at = now
+        return self._pending
+
+    def congestion(self, params=None):
+        """
+        Read (and briefly cache) congestion indicators from algod
+
+        Args:
+            params: Suggested params the caller already fetched; without
+                them the policy fetches (and caches) its own
+
+        Returns:
+            dict: {
+                'min_fee': int,
+                'fee_per_byte': int (non-zero only under congestion),
+                'pending_txns': int,
+                'congested': bool
+            }
+        """
+        now = time.monotonic()
+        if params is None:
+            if self._params is None or now - self._params[1] > CONGESTION_REFRESH_INTERVAL:
+                self._params = (self.client.suggested_params(), now)
+            params = self._params[0]
+
+        pending = self._pending_txns(now)
+        return {
+            'min_fee': params.min_fee,
+            'fee_per_byte': params.fee,
+            'pending_txns': pending,
+            'congested': params.fee > 0 or pending > CONGESTION_POOL_THRESHOLD
+        }
+
+    def txn_fee(self, priority='normal', params=None, size=TYPICAL_TXN_SIZE):
+        """
+        Return the fee in microALGOs for one transaction at `priority`
+
+        Args:
+            priority: Key of self.strategies
+            params: Suggested params the transaction was built with
+            size: Signed size of the transaction in bytes
+
+        The priority's max_fee caps the congestion multiplier only; the
+        fee never drops below the network minimum of
+        max(min_fee, fee_per_byte * size).
+        """
+        strategy = self.strategies[priority]
+        congestion = self.congestion(params)
+
+        if not congestion['congested']:
+            return congestion['min_fee']
+
+        required = max(congestion['min_fee'], congestion['fee_per_byte'] * size)
+        fee = int(required * strategy['multiplier'])
+        return max(required, min(fee, strategy['max_fee']))
+
+    @staticmethod
+    def signed_size(txn, grouped=False):
+        """Upper bound on the signed, encoded size of `txn` once apply() and grouping are done"""
+        return txn.estimate_size() + FEE_FIELD_SIZE + (GROUP_ID_SIZE if grouped else 0)
+
+    def apply(self, txns, priority='normal', payer_index=0, inner_txns=0, operation=None, params=None):
+        """
+        Put the whole group's fee on one payer transaction
+
+        Every other member pays zero. `inner_txns` adds fee budget for inner
+        transactions issued by an app call in the group. Under a per-byte
+        fee each member is priced from its own encoded size.
+
+        Args:
+            txns: Unsigned transactions of one group (modified in place)
+            priority: Key of self.strategies
+            payer_index: Index of the transaction that pays for the group
+            inner_txns: Number of inner transactions the group triggers
+            operation: If given, record the fee under this operation name
+            params: Suggested params the transactions were built with
+
+        Returns:
+            int: Total fee paid by the group in microALGOs
+        """
+        total_fee = self.txn_fee(priority, params) * inner_txns
+        if self.congestion(params)['fee_per_byte'] > 0:
+            grouped = len(txns) > 1
+            total_fee += sum(self.txn_fee(priority, params, self.signed_size(txn, grouped)) for txn in txns)
+        else:
+            total_fee += self.txn_fee(priority, params) * len(txns)
+
+        for index, txn in enumerate(txns):
+            txn.fee = total_fee if index == payer_index else 0
+
+        if operation:
+            self.record(operation, total_fee)
+
+        return total_fee
+
+    def record(self, operation, fee):
+        """Add a fee to the per-operation tally"""
+        with self._lock:
+            entry = self.spent.setdefault(operation, {'count': 0, 'total_fee': 0})
+            entry['count'] += 1
+            entry['total_fee'] += fee
+
+    def report(self):
+        """
+        Returns:
+            dict: {operation: {'count': int, 'total_fee': int, 'average_fee': int}}
+        """
+        with self._lock:
+            return {
+                operation: dict(entry, average_fee=entry['total_fee'] // entry['count'])
+                for operation, entry in self.spent.items()
+            }
+
+
+def shared_policy(client):
+    """
+    Return the process-wide FeePolicy for an algod client
+
+    One-shot helpers (pay_deposit, transfer_asa, ...) price through it so
+    the congestion reading is cached across calls and their fees add up
+    in one per-operation report.
+    """
+    with _shared_policies_lock:
+        policy = _shared_policies.get(id(client))
+        if policy is None or policy.client is not client:
+            policy = _shared_policies[id(client)] = FeePolicy(client)
+        return policy
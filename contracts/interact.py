@@ -4,32 +4,124 @@ Provides functions to call contract methods from backend
 """
 
 import base64
-from algosdk import account, mnemonic
-from algosdk.v2client import algod
+from algosdk import account, encoding, mnemonic
 from algosdk.transaction import (
     ApplicationCallTxn,
-    PaymentTxn,
     OnComplete,
-    assign_group_id,
     wait_for_confirmation
 )
 from algosdk.logic import get_application_address
 
+try:
+    from contracts.escrow_model import validate_action
+    from contracts.fees import shared_policy
+    from contracts.rate_limit import shared_client
+    from contracts.txn_templates import assign_group, send_signed, templates_for
+except ImportError:  # run as a script from inside contracts/
+    from escrow_model import validate_action
+    from fees import shared_policy
+    from rate_limit import shared_client
+    from txn_templates import assign_group, send_signed, templates_for
+
 
 # Algorand TestNet configuration
 TESTNET_ALGOD_ADDRESS = "https://testnet-api.algonode.cloud"
 TESTNET_ALGOD_TOKEN = ""
 
+# Global state keys holding 32-byte public keys (empty while unassigned)
+ADDRESS_KEYS = ('organizer', 'vendor')
+
 
 def get_algod_client():
-    """Create and return Algod client for TestNet"""
-    return algod.AlgodClient(
-        algod_token=TESTNET_ALGOD_TOKEN,
-        algod_address=TESTNET_ALGOD_ADDRESS
+    """Return the shared rate-limited Algod client for TestNet"""
+    return shared_client(TESTNET_ALGOD_TOKEN, TESTNET_ALGOD_ADDRESS)
+
+
+def precheck_action(state, action, sender, **kwargs):
+    """
+    Validate an action against cached contract state before building it
+    
+    Args:
+        state: Cached/mirrored decoded global state, or None to skip the check
+        action: Escrow action name (see escrow_model.ACTIONS)
+        sender: Address that will sign the app call
+    
+    Returns:
+        dict: Failure result to return to the caller, or None if allowed
+    """
+    if state is None:
+        return None
+    
+    verdict = validate_action(state, action, sender=sender, **kwargs)
+    if verdict['allowed']:
+        return None
+    
+    return {
+        'success': False,
+        'error': verdict['message'],
+        'rejection': verdict['reason']
+    }
+
+
+def sign_deposit(client, user_private_key, app_id, deposit_amount, rental_fee, params, priority='normal'):
+    """
+    Build, price and sign the deposit group (app call + payment)
+    
+    Shared with async_api, which only does the network I/O itself.
+    
+    Returns:
+        tuple: (signed template transactions for send_signed, fee paid)
+    """
+    user_address = account.address_from_private_key(user_private_key)
+    templates = templates_for(params)
+    
+    # Transaction 1: Application call with "deposit" arg
+    app_call_txn = templates.app_call(b"deposit", user_address, app_id, params)
+    
+    # Transaction 2: Payment to contract
+    payment_txn = templates.payment(
+        user_address, get_application_address(app_id), deposit_amount + rental_fee, params
+    )
+    
+    # Payment carries the fee for the whole group
+    fee = shared_policy(client).apply(
+        [app_call_txn, payment_txn], priority=priority, payer_index=1,
+        params=params, operation='deposit'
+    )
+    
+    # Group transactions
+    assign_group([app_call_txn, payment_txn])
+    
+    return [app_call_txn.sign(user_private_key), payment_txn.sign(user_private_key)], fee
+
+
+def sign_refund(client, signer_private_key, app_id, params):
+    """
+    Build, price and sign the refund app call, including the fee for the
+    contract's inner refund payment
+    
+    Returns:
+        SignedTransaction
+    """
+    txn = ApplicationCallTxn(
+        sender=account.address_from_private_key(signer_private_key),
+        sp=params,
+        index=app_id,
+        on_complete=OnComplete.NoOpOC,
+        app_args=[b"refund"]
     )
+    shared_policy(client).apply([txn], inner_txns=1, params=params, operation='refund')
+    return txn.sign(signer_private_key)
 
 
-def pay_deposit(user_mnemonic, app_id, deposit_amount, rental_fee):
+def pay_deposit(
+    user_mnemonic,
+    app_id,
+    deposit_amount,
+    rental_fee,
+    state=None,
+    priority='normal'
+):
     """
     Organizer pays deposit + rental fee to escrow contract
     
@@ -38,9 +130,11 @@ def pay_deposit(user_mnemonic, app_id, deposit_amount, rental_fee):
         app_id: Application ID of deployed contract
         deposit_amount: Security deposit in microALGOs
         rental_fee: Rental fee in microALGOs
+        state: Optional cached contract state for a local precheck
+        priority: Fee priority (see fees.FEE_STRATEGIES)
     
     Returns:
-        dict: {'success': bool, 'tx_id': str, 'error': str}
+        dict: {'success': bool, 'tx_id': str, 'fee': int, 'error': str, 'rejection': str}
     """
     try:
         client = get_algod_client()
@@ -49,58 +143,43 @@ def pay_deposit(user_mnemonic, app_id, deposit_amount, rental_fee):
         user_private_key = mnemonic.to_private_key(user_mnemonic)
         user_address = account.address_from_private_key(user_private_key)
         
-        # Get contract address
-        contract_address = get_application_address(app_id)
+        rejected = precheck_action(
+            state, 'deposit', user_address,
+            payment_amount=deposit_amount + rental_fee
+        )
+        if rejected:
+            return rejected
         
         # Get suggested parameters
         params = client.suggested_params()
         
-        # Transaction 1: Application call with "deposit" arg
-        app_call_txn = ApplicationCallTxn(
-            sender=user_address,
-            sp=params,
-            index=app_id,
-            on_complete=OnComplete.NoOpOC,
-            app_args=[b"deposit"]
-        )
-        
-        # Transaction 2: Payment to contract
-        payment_txn = PaymentTxn(
-            sender=user_address,
-            sp=params,
-            receiver=contract_address,
-            amt=deposit_amount + rental_fee
+        signed, fee = sign_deposit(
+            client, user_private_key, app_id, deposit_amount, rental_fee, params, priority
         )
         
-        # Group transactions
-        gid = assign_group_id([app_call_txn, payment_txn])
-        
-        # Sign transactions
-        signed_app_call = app_call_txn.sign(user_private_key)
-        signed_payment = payment_txn.sign(user_private_key)
-        
         # Send transaction group
-        tx_id = client.send_transactions([signed_app_call, signed_payment])
+        tx_id = send_signed(client, signed)
         
         # Wait for confirmation
         wait_for_confirmation(client, tx_id, 4)
         
-        return {'success': True, 'tx_id': tx_id}
+        return {'success': True, 'tx_id': tx_id, 'fee': fee}
         
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
 
-def confirm_delivery(vendor_mnemonic, app_id):
+def confirm_delivery(vendor_mnemonic, app_id, state=None):
     """
     Vendor confirms prop delivery
     
     Args:
         vendor_mnemonic: Vendor's 25-word mnemonic
         app_id: Application ID of deployed contract
+        state: Optional cached contract state for a local precheck
     
     Returns:
-        dict: {'success': bool, 'tx_id': str, 'error': str}
+        dict: {'success': bool, 'tx_id': str, 'error': str, 'rejection': str}
     """
     try:
         client = get_algod_client()
@@ -108,18 +187,16 @@ def confirm_delivery(vendor_mnemonic, app_id):
         vendor_private_key = mnemonic.to_private_key(vendor_mnemonic)
         vendor_address = account.address_from_private_key(vendor_private_key)
         
+        rejected = precheck_action(state, 'delivery', vendor_address)
+        if rejected:
+            return rejected
+        
         params = client.suggested_params()
         
-        txn = ApplicationCallTxn(
-            sender=vendor_address,
-            sp=params,
-            index=app_id,
-            on_complete=OnComplete.NoOpOC,
-            app_args=[b"delivery"]
-        )
+        txn = templates_for(params).app_call(b"delivery", vendor_address, app_id, params)
         
         signed_txn = txn.sign(vendor_private_key)
-        tx_id = client.send_transaction(signed_txn)
+        tx_id = send_signed(client, [signed_txn])
         
         wait_for_confirmation(client, tx_id, 4)
         
@@ -129,16 +206,17 @@ def confirm_delivery(vendor_mnemonic, app_id):
         return {'success': False, 'error': str(e)}
 
 
-def confirm_return(organizer_mnemonic, app_id):
+def confirm_return(organizer_mnemonic, app_id, state=None):
     """
     Organizer confirms prop return
     
     Args:
         organizer_mnemonic: Organizer's 25-word mnemonic
         app_id: Application ID of deployed contract
+        state: Optional cached contract state for a local precheck
     
     Returns:
-        dict: {'success': bool, 'tx_id': str, 'error': str}
+        dict: {'success': bool, 'tx_id': str, 'error': str, 'rejection': str}
     """
     try:
         client = get_algod_client()
@@ -146,18 +224,16 @@ def confirm_return(organizer_mnemonic, app_id):
         organizer_private_key = mnemonic.to_private_key(organizer_mnemonic)
         organizer_address = account.address_from_private_key(organizer_private_key)
         
+        rejected = precheck_action(state, 'return', organizer_address)
+        if rejected:
+            return rejected
+        
         params = client.suggested_params()
         
-        txn = ApplicationCallTxn(
-            sender=organizer_address,
-            sp=params,
-            index=app_id,
-            on_complete=OnComplete.NoOpOC,
-            app_args=[b"return"]
-        )
+        txn = templates_for(params).app_call(b"return", organizer_address, app_id, params)
         
         signed_txn = txn.sign(organizer_private_key)
-        tx_id = client.send_transaction(signed_txn)
+        tx_id = send_signed(client, [signed_txn])
         
         wait_for_confirmation(client, tx_id, 4)
         
@@ -167,18 +243,18 @@ def confirm_return(organizer_mnemonic, app_id):
         return {'success': False, 'error': str(e)}
 
 
-def refund_deposit(app_id, signer_mnemonic, organizer_addr):
+def refund_deposit(app_id, signer_mnemonic, organizer_addr, state=None):
     """
-    Refund deposit to organizer (requires contract to sign inner txn)
-    Note: This simplified version assumes contract can create inner transactions
+    Refund deposit to organizer (contract pays it with an inner transaction)
     
     Args:
         app_id: Application ID
         signer_mnemonic: Account authorized to trigger refund
         organizer_addr: Address to receive refund
+        state: Optional cached contract state for a local precheck
     
     Returns:
-        dict: {'success': bool, 'tx_id': str, 'error': str}
+        dict: {'success': bool, 'tx_id': str, 'error': str, 'rejection': str}
     """
     try:
         client = get_algod_client()
@@ -186,19 +262,13 @@ def refund_deposit(app_id, signer_mnemonic, organizer_addr):
         signer_private_key = mnemonic.to_private_key(signer_mnemonic)
         signer_address = account.address_from_private_key(signer_private_key)
         
-        params = client.suggested_params()
+        rejected = precheck_action(state, 'refund', signer_address)
+        if rejected:
+            return rejected
         
-        # Note: In production, this would need proper inner transaction support
-        # For now, this is a placeholder for the contract interaction pattern
-        txn = ApplicationCallTxn(
-            sender=signer_address,
-            sp=params,
-            index=app_id,
-            on_complete=OnComplete.NoOpOC,
-            app_args=[b"refund"]
-        )
+        params = client.suggested_params()
         
-        signed_txn = txn.sign(signer_private_key)
+        signed_txn = sign_refund(client, signer_private_key, app_id, params)
         tx_id = client.send_transaction(signed_txn)
         
         wait_for_confirmation(client, tx_id, 4)
@@ -209,6 +279,34 @@ def refund_deposit(app_id, signer_mnemonic, organizer_addr):
         return {'success': False, 'error': str(e)}
 
 
+def decode_global_state(global_state):
+    """
+    Decode the algod global-state list into a plain dict
+    
+    Args:
+        global_state: 'global-state' list from application_info
+    
+    Returns:
+        dict: {key: str or int}
+    """
+    decoded_state = {}
+    for item in global_state:
+        key = base64.b64decode(item['key']).decode('utf-8')
+        
+        if item['value']['type'] == 1:  # bytes
+            raw = base64.b64decode(item['value']['bytes'])
+            if key in ADDRESS_KEYS:
+                value = encoding.encode_address(raw) if raw else ''
+            else:
+                value = raw.decode('utf-8')
+        else:  # uint
+            value = item['value']['uint']
+        
+        decoded_state[key] = value
+    
+    return decoded_state
+
+
 def get_contract_state(app_id):
     """
     Read global state of escrow contract
@@ -223,19 +321,7 @@ def get_contract_state(app_id):
         client = get_algod_client()
         
         app_info = client.application_info(app_id)
-        global_state = app_info['params']['global-state']
-        
-        # Decode state
-        decoded_state = {}
-        for item in global_state:
-            key = base64.b64decode(item['key']).decode('utf-8')
-            
-            if item['value']['type'] == 1:  # bytes
-                value = base64.b64decode(item['value']['bytes']).decode('utf-8')
-            else:  # uint
-                value = item['value']['uint']
-            
-            decoded_state[key] = value
+        decoded_state = decode_global_state(app_info['params']['global-state'])
         
         return {'success': True, 'state': decoded_state}
         
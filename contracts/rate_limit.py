@@ -0,0 +1,312 @@
+"""
+Client-side rate limiting for the algod client
+Spends per-endpoint and global token buckets before each HTTP request so
+bursts stay inside the public node's limits, and lets concurrent identical
+reads share one in-flight request (single-flight)
+"""
+
+import copy
+import time
+import threading
+from algosdk.error import (
+    AlgodHTTPError,
+    AlgodRequestError,
+    ConfirmationTimeoutError
+)
+from algosdk.v2client import algod, indexer
+
+
+# Per-endpoint budgets: (requests per second, burst size)
+ENDPOINT_BUDGETS = {
+    'applications': (20, 40),
+    'accounts': (20, 40),
+    'params': (5, 10),
+    'pending': (20, 40),
+    'send': (10, 20),
+    'status': (10, 20),
+    'default': (10, 20),
+}
+
+# Budget shared by every endpoint, kept under the public node's per-IP limit
+GLOBAL_BUDGET = (50, 100)
+
+# Budget for the indexer, a separate service with its own per-IP limit
+INDEXER_BUDGET = (10, 20)
+
+# Longest a request may wait for a token before it is rejected (seconds)
+MAX_DELAY = 2.0
+
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when a request would have to wait longer than max_delay
+
+    The request was not sent, so it is always safe to retry it after
+    `retry_after` seconds.
+    """
+
+    def __init__(self, message, retry_after=0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def wait_time(self, now):
+        """Seconds until one token is available (tokens may be reserved below zero)"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def take(self):
+        self.tokens -= 1
+
+
+def is_transient(error):
+    """
+    True if a failed request is worth retrying later: client-side rate
+    limiting, network failures, node-side 429/5xx responses and
+    confirmation timeouts. Other errors (a 4xx rejection, a rejected
+    transaction) will fail the same way again.
+    """
+    if isinstance(error, (RateLimitExceeded, AlgodRequestError, ConfirmationTimeoutError, OSError)):
+        return True
+    if isinstance(error, AlgodHTTPError):
+        return error.code is None or error.code == 429 or error.code >= 500
+    return False
+
+
+def endpoint_for(method, requrl):
+    """Map an algod request to its ENDPOINT_BUDGETS key"""
+    parts = requrl.strip("/").split("/")
+
+    if parts[0] == "transactions":
+        if len(parts) == 1:
+            return 'send' if method == "POST" else 'default'
+        if parts[1] == "params":
+            return 'params'
+        if parts[1] == "pending":
+            return 'pending'
+    if parts[0] in ENDPOINT_BUDGETS:
+        return parts[0]
+    return 'default'
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class RateLimitedAlgodClient(algod.AlgodClient):
+    """
+    AlgodClient that throttles and coalesces its own HTTP requests
+
+    Every SDK method goes through algod_request, so the limits apply to
+    all of them. GET requests for the same URL and query that overlap in
+    time are sent once; the other callers receive a copy of the result
+    (or the same error). Coalesced requests spend no tokens.
+    """
+
+    def __init__(
+        self,
+        algod_token,
+        algod_address,
+        headers=None,
+        budgets=None,
+        global_budget=GLOBAL_BUDGET,
+        max_delay=MAX_DELAY
+    ):
+        """
+        Args:
+            algod_token, algod_address, headers: As for algod.AlgodClient
+            budgets: Optional overrides of ENDPOINT_BUDGETS
+            global_budget: (rate, burst) shared by every endpoint
+            max_delay: Longest wait for a token before RateLimitExceeded
+        """
+        super().__init__(algod_token, algod_address, headers)
+        self.max_delay = max_delay
+        self.buckets = {
+            endpoint: TokenBucket(*budget)
+            for endpoint, budget in dict(ENDPOINT_BUDGETS, **(budgets or {})).items()
+        }
+        self.global_bucket = TokenBucket(*global_budget)
+        self.counters = {}
+
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def _count(self, endpoint, counter, amount=1):
+        entry = self.counters.setdefault(
+            endpoint,
+            {'requests': 0, 'sent': 0, 'coalesced': 0, 'delayed': 0, 'rejected': 0, 'delay_seconds': 0.0}
+        )
+        entry[counter] += amount
+
+    def _throttle(self, endpoint):
+        """Reserve a token from both buckets, sleeping if needed"""
+        with self._lock:
+            now = time.monotonic()
+            bucket = self.buckets[endpoint]
+            delay = max(bucket.wait_time(now), self.global_bucket.wait_time(now))
+
+            if delay > self.max_delay:
+                self._count(endpoint, 'rejected')
+                raise RateLimitExceeded(
+                    f"algod '{endpoint}' budget exhausted (next token in {delay:.2f}s)",
+                    retry_after=delay - self.max_delay
+                )
+
+            bucket.take()
+            self.global_bucket.take()
+            self._count(endpoint, 'sent')
+            if delay:
+                self._count(endpoint, 'delayed')
+                self._count(endpoint, 'delay_seconds', delay)
+
+        if delay:
+            time.sleep(delay)
+
+    def algod_request(
+        self,
+        method,
+        requrl,
+        params=None,
+        data=None,
+        headers=None,
+        response_format="json",
+        timeout=30
+    ):
+        endpoint = endpoint_for(method, requrl)
+        with self._lock:
+            self._count(endpoint, 'requests')
+
+        if method != "GET":
+            self._throttle(endpoint)
+            return super().algod_request(method, requrl, params, data, headers, response_format, timeout)
+
+        key = (requrl, tuple(sorted((params or {}).items())), response_format)
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _InFlight()
+            else:
+                call.waiters += 1
+                self._count(endpoint, 'coalesced')
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        result = None
+        try:
+            self._throttle(endpoint)
+            result = super().algod_request(method, requrl, params, data, headers, response_format, timeout)
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                waiters = call.waiters
+            # Followers get their own copy; the leader's caller may mutate `result`
+            if waiters:
+                call.result = copy.deepcopy(result)
+            call.done.set()
+
+    def stats(self):
+        """
+        Returns:
+            dict: {
+                'total': {'requests', 'sent', 'coalesced', 'delayed', 'rejected', 'delay_seconds'},
+                'endpoints': {endpoint: same counters}
+            }
+        """
+        with self._lock:
+            endpoints = {endpoint: dict(entry) for endpoint, entry in self.counters.items()}
+
+        total = {'requests': 0, 'sent': 0, 'coalesced': 0, 'delayed': 0, 'rejected': 0, 'delay_seconds': 0.0}
+        for entry in endpoints.values():
+            for counter, value in entry.items():
+                total[counter] += value
+        return {'total': total, 'endpoints': endpoints}
+
+
+class RateLimitedIndexerClient(indexer.IndexerClient):
+    """
+    IndexerClient that spends one token bucket before each HTTP request
+
+    Used for paged scans, which would otherwise issue requests as fast as
+    the indexer answers them.
+    """
+
+    def __init__(self, indexer_token, indexer_address, headers=None, budget=INDEXER_BUDGET, max_delay=MAX_DELAY):
+        """
+        Args:
+            indexer_token, indexer_address, headers: As for indexer.IndexerClient
+            budget: (rate, burst) for every indexer request
+            max_delay: Longest wait for a token before RateLimitExceeded
+        """
+        super().__init__(indexer_token, indexer_address, headers)
+        self.max_delay = max_delay
+        self.bucket = TokenBucket(*budget)
+        self._lock = threading.Lock()
+
+    def indexer_request(self, method, requrl, params=None, data=None, headers=None, timeout=30):
+        with self._lock:
+            delay = self.bucket.wait_time(time.monotonic())
+            if delay > self.max_delay:
+                raise RateLimitExceeded(
+                    f"indexer budget exhausted (next token in {delay:.2f}s)",
+                    retry_after=delay - self.max_delay
+                )
+            self.bucket.take()
+
+        if delay:
+            time.sleep(delay)
+        return super().indexer_request(method, requrl, params, data, headers, timeout)
+
+
+def shared_client(algod_token, algod_address):
+    """
+    Return the process-wide RateLimitedAlgodClient for a node
+
+    Every module asking for the same node shares one client, so they draw
+    from the same budgets and coalesce with each other.
+    """
+    with _shared_clients_lock:
+        client = _shared_clients.get(algod_address)
+        if client is None:
+            client = _shared_clients[algod_address] = RateLimitedAlgodClient(algod_token, algod_address)
+        return client
+
+
+def install_shared_client(algod_address, client):
+    """
+    Make `client` the shared client for a node, e.g. a recording or replay
+    client from cassette.py; pass None to go back to the default
+
+    Returns:
+        The previously installed client, or None
+    """
+    with _shared_clients_lock:
+        previous = _shared_clients.pop(algod_address, None)
+        if client is not None:
+            _shared_clients[algod_address] = client
+        return previous
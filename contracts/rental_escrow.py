@@ -5,10 +5,15 @@ Handles security deposit escrow for prop rentals on Algorand
 
 from pyteal import *
 
+try:
+    from contracts.teal_optimizer import StateCache, compile_optimized
+except ImportError:  # run as a script from inside contracts/
+    from teal_optimizer import StateCache, compile_optimized
 
-def approval_program():
+
+def approval_handlers(optimize=True):
     """
-    Stateful smart contract for rental deposit escrow.
+    Handlers of the rental deposit escrow, keyed by method name.
     
     Global State:
     - organizer (bytes): Wallet address of event organizer (renter)
@@ -22,145 +27,269 @@ def approval_program():
     - prop_returned (uint): Boolean flag if prop has been returned
     - damage_reported (uint): Boolean flag if damage was reported
     - dispute_active (uint): Boolean flag if dispute is active
+    - fee_released (uint): Boolean flag if rental fee has been paid to vendor
+    - settled (uint): Boolean flag if deposit was refunded, claimed or swept
+    
+    Addresses are stored as raw 32-byte public keys so they compare
+    against Txn.sender() and can receive inner payments.
+    
+    Handlers read and write state through a StateCache; `optimize=False`
+    compares flags with `== Int(1)`/`== Int(0)` as the original contract
+    did, the baseline in teal_optimizer.method_report.
     """
     
     # Global state keys
-    organizer_key = Bytes("organizer")
-    vendor_key = Bytes("vendor")
-    deposit_amount_key = Bytes("deposit_amount")
-    rental_fee_key = Bytes("rental_fee")
-    lease_start_key = Bytes("lease_start")
-    lease_end_key = Bytes("lease_end")
-    deposit_paid_key = Bytes("deposit_paid")
-    prop_delivered_key = Bytes("prop_delivered")
-    prop_returned_key = Bytes("prop_returned")
-    damage_reported_key = Bytes("damage_reported")
-    dispute_active_key = Bytes("dispute_active")
+    organizer_key = "organizer"
+    vendor_key = "vendor"
+    deposit_amount_key = "deposit_amount"
+    rental_fee_key = "rental_fee"
+    lease_start_key = "lease_start"
+    lease_end_key = "lease_end"
+    deposit_paid_key = "deposit_paid"
+    prop_delivered_key = "prop_delivered"
+    prop_returned_key = "prop_returned"
+    damage_reported_key = "damage_reported"
+    dispute_active_key = "dispute_active"
+    fee_released_key = "fee_released"
+    settled_key = "settled"
+    
+    state = StateCache(optimize)
+    
+    def store_terms(first_arg):
+        """Store rental terms from application args starting at `first_arg`"""
+        return Seq([
+            state.put(organizer_key, Txn.application_args[first_arg]),
+            state.put(vendor_key, Txn.application_args[first_arg + 1]),
+            state.put(deposit_amount_key, Btoi(Txn.application_args[first_arg + 2])),
+            state.put(rental_fee_key, Btoi(Txn.application_args[first_arg + 3])),
+            state.put(lease_start_key, Btoi(Txn.application_args[first_arg + 4])),
+            state.put(lease_end_key, Btoi(Txn.application_args[first_arg + 5]))
+        ])
     
     # Initialize contract on creation
     # Args: [organizer_addr, vendor_addr, deposit_amount, rental_fee, lease_start, lease_end]
+    # or no args to create an unassigned escrow for the warm pool (see on_bind)
     on_creation = Seq([
-        Assert(Txn.application_args.length() == Int(6)),
-        App.globalPut(organizer_key, Txn.application_args[0]),
-        App.globalPut(vendor_key, Txn.application_args[1]),
-        App.globalPut(deposit_amount_key, Btoi(Txn.application_args[2])),
-        App.globalPut(rental_fee_key, Btoi(Txn.application_args[3])),
-        App.globalPut(lease_start_key, Btoi(Txn.application_args[4])),
-        App.globalPut(lease_end_key, Btoi(Txn.application_args[5])),
-        App.globalPut(deposit_paid_key, Int(0)),
-        App.globalPut(prop_delivered_key, Int(0)),
-        App.globalPut(prop_returned_key, Int(0)),
-        App.globalPut(damage_reported_key, Int(0)),
-        App.globalPut(dispute_active_key, Int(0)),
+        Assert(Or(
+            Txn.application_args.length() == Int(6),
+            Txn.application_args.length() == Int(0)
+        )),
+        If(Txn.application_args.length() == Int(6))
+        .Then(store_terms(0))
+        .Else(Seq([
+            state.put(organizer_key, Bytes("")),
+            state.put(vendor_key, Bytes("")),
+            state.put(deposit_amount_key, Int(0)),
+            state.put(rental_fee_key, Int(0)),
+            state.put(lease_start_key, Int(0)),
+            state.put(lease_end_key, Int(0))
+        ])),
+        state.put(deposit_paid_key, Int(0)),
+        state.put(prop_delivered_key, Int(0)),
+        state.put(prop_returned_key, Int(0)),
+        state.put(damage_reported_key, Int(0)),
+        state.put(dispute_active_key, Int(0)),
+        state.put(fee_released_key, Int(0)),
+        state.put(settled_key, Int(0)),
+        Approve()
+    ])
+    
+    def pay(receiver, amount, close_to=None):
+        """Inner payment from the escrow; the app call covers its fee"""
+        fields = {
+            TxnField.type_enum: TxnType.Payment,
+            TxnField.receiver: receiver,
+            TxnField.amount: amount,
+            TxnField.fee: Int(0)
+        }
+        if close_to is not None:
+            fields[TxnField.close_remainder_to] = close_to
+        return Seq([
+            InnerTxnBuilder.Begin(),
+            InnerTxnBuilder.SetFields(fields),
+            InnerTxnBuilder.Submit()
+        ])
+    
+    # Creator binds an unassigned (pre-deployed) escrow to a booking
+    # Args: ["bind", organizer_addr, vendor_addr, deposit_amount, rental_fee, lease_start, lease_end]
+    on_bind = Seq([
+        Assert(Txn.sender() == Global.creator_address()),
+        Assert(state.get(organizer_key) == Bytes("")),
+        Assert(Txn.application_args.length() == Int(7)),
+        store_terms(1),
         Approve()
     ])
     
     # Organizer pays deposit + rental fee
     # Grouped transaction: [App call, Payment to contract]
+    # The payment sender is checked against Txn.sender(), already known to be
+    # the organizer, instead of reading the organizer key a second time
     on_deposit = Seq([
-        Assert(Txn.sender() == App.globalGet(organizer_key)),
-        Assert(App.globalGet(deposit_paid_key) == Int(0)),
+        Assert(Txn.sender() == state.get(organizer_key)),
+        Assert(state.is_clear(deposit_paid_key)),
         Assert(Global.group_size() == Int(2)),
         Assert(Gtxn[1].type_enum() == TxnType.Payment),
-        Assert(Gtxn[1].sender() == App.globalGet(organizer_key)),
+        Assert(Gtxn[1].sender() == Txn.sender()),
         Assert(Gtxn[1].receiver() == Global.current_application_address()),
         Assert(
             Gtxn[1].amount() >= 
-            App.globalGet(deposit_amount_key) + App.globalGet(rental_fee_key)
+            state.get(deposit_amount_key) + state.get(rental_fee_key)
         ),
-        App.globalPut(deposit_paid_key, Int(1)),
+        state.put(deposit_paid_key, Int(1)),
         Approve()
     ])
     
     # Vendor confirms prop delivery
     on_delivery = Seq([
-        Assert(Txn.sender() == App.globalGet(vendor_key)),
-        Assert(App.globalGet(deposit_paid_key) == Int(1)),
-        Assert(App.globalGet(prop_delivered_key) == Int(0)),
-        App.globalPut(prop_delivered_key, Int(1)),
+        Assert(Txn.sender() == state.get(vendor_key)),
+        Assert(state.is_set(deposit_paid_key)),
+        Assert(state.is_clear(prop_delivered_key)),
+        state.put(prop_delivered_key, Int(1)),
         Approve()
     ])
     
     # Organizer confirms prop return
     on_return = Seq([
-        Assert(Txn.sender() == App.globalGet(organizer_key)),
-        Assert(App.globalGet(prop_delivered_key) == Int(1)),
-        Assert(App.globalGet(prop_returned_key) == Int(0)),
-        App.globalPut(prop_returned_key, Int(1)),
+        Assert(Txn.sender() == state.get(organizer_key)),
+        Assert(state.is_set(prop_delivered_key)),
+        Assert(state.is_clear(prop_returned_key)),
+        state.put(prop_returned_key, Int(1)),
         Approve()
     ])
     
     # Vendor reports damage
     on_damage = Seq([
-        Assert(Txn.sender() == App.globalGet(vendor_key)),
-        Assert(App.globalGet(prop_returned_key) == Int(1)),
-        App.globalPut(damage_reported_key, Int(1)),
-        App.globalPut(dispute_active_key, Int(1)),
+        Assert(Txn.sender() == state.get(vendor_key)),
+        Assert(state.is_set(prop_returned_key)),
+        state.put(damage_reported_key, Int(1)),
+        state.put(dispute_active_key, Int(1)),
         Approve()
     ])
     
     # Release rental fee to vendor (after delivery)
-    # Grouped transaction: [App call, Inner payment to vendor]
+    # Inner payment to vendor; app call carries the inner fee (2x min fee)
     on_release_rental_fee = Seq([
-        Assert(App.globalGet(prop_delivered_key) == Int(1)),
-        Assert(Global.group_size() == Int(2)),
-        Assert(Gtxn[1].type_enum() == TxnType.Payment),
-        Assert(Gtxn[1].sender() == Global.current_application_address()),
-        Assert(Gtxn[1].receiver() == App.globalGet(vendor_key)),
-        Assert(Gtxn[1].amount() == App.globalGet(rental_fee_key)),
+        Assert(state.is_set(prop_delivered_key)),
+        Assert(state.is_clear(fee_released_key)),
+        state.put(fee_released_key, Int(1)),
+        pay(state.get(vendor_key), state.get(rental_fee_key)),
+        Approve()
+    ])
+    
+    # Creator collects the rental fee for periodic net settlement
+    # (see settlement.py); the vendor is paid later in one payout covering
+    # all of its settled bookings. Inner payment to the creator; app call
+    # carries the inner fee (2x min fee)
+    on_settle_fee = Seq([
+        Assert(Txn.sender() == Global.creator_address()),
+        Assert(state.is_set(prop_delivered_key)),
+        Assert(state.is_clear(fee_released_key)),
+        state.put(fee_released_key, Int(1)),
+        pay(Global.creator_address(), state.get(rental_fee_key)),
         Approve()
     ])
     
     # Refund deposit to organizer (no damage, prop returned)
-    # Grouped transaction: [App call, Inner payment to organizer]
+    # Inner payment to organizer; app call carries the inner fee (2x min fee)
     on_refund_deposit = Seq([
-        Assert(App.globalGet(prop_returned_key) == Int(1)),
-        Assert(App.globalGet(damage_reported_key) == Int(0)),
-        Assert(App.globalGet(dispute_active_key) == Int(0)),
-        Assert(Global.group_size() == Int(2)),
-        Assert(Gtxn[1].type_enum() == TxnType.Payment),
-        Assert(Gtxn[1].sender() == Global.current_application_address()),
-        Assert(Gtxn[1].receiver() == App.globalGet(organizer_key)),
-        Assert(Gtxn[1].amount() == App.globalGet(deposit_amount_key)),
+        Assert(state.is_set(prop_returned_key)),
+        Assert(state.is_clear(damage_reported_key)),
+        Assert(state.is_clear(dispute_active_key)),
+        Assert(state.is_clear(settled_key)),
+        state.put(settled_key, Int(1)),
+        pay(state.get(organizer_key), state.get(deposit_amount_key)),
         Approve()
     ])
     
     # Claim deposit to vendor (damage reported)
-    # Grouped transaction: [App call, Inner payment to vendor]
+    # Inner payment to vendor; app call carries the inner fee (2x min fee)
     on_claim_deposit = Seq([
-        Assert(App.globalGet(damage_reported_key) == Int(1)),
-        Assert(Global.group_size() == Int(2)),
-        Assert(Gtxn[1].type_enum() == TxnType.Payment),
-        Assert(Gtxn[1].sender() == Global.current_application_address()),
-        Assert(Gtxn[1].receiver() == App.globalGet(vendor_key)),
-        Assert(Gtxn[1].amount() == App.globalGet(deposit_amount_key)),
+        Assert(state.is_set(damage_reported_key)),
+        Assert(state.is_clear(settled_key)),
+        state.put(settled_key, Int(1)),
+        pay(state.get(vendor_key), state.get(deposit_amount_key)),
         Approve()
     ])
     
     # Emergency timeout release (after lease end + grace period)
     # If no action taken, vendor can claim everything after 30 days past lease end
+    # Contract closes its own account to the vendor via inner payment;
+    # the app call must carry the inner transaction fee (2x min fee)
     on_timeout_claim = Seq([
-        Assert(Txn.sender() == App.globalGet(vendor_key)),
-        Assert(Global.latest_timestamp() >= App.globalGet(lease_end_key) + Int(2592000)),  # 30 days
-        Assert(Global.group_size() == Int(2)),
-        Assert(Gtxn[1].type_enum() == TxnType.Payment),
-        Assert(Gtxn[1].sender() == Global.current_application_address()),
-        Assert(Gtxn[1].receiver() == App.globalGet(vendor_key)),
-        Assert(Gtxn[1].close_remainder_to() == App.globalGet(vendor_key)),
+        Assert(Txn.sender() == state.get(vendor_key)),
+        Assert(Global.latest_timestamp() >= state.get(lease_end_key) + Int(2592000)),  # 30 days
+        Assert(state.is_clear(settled_key)),
+        state.put(fee_released_key, Int(1)),
+        state.put(settled_key, Int(1)),
+        pay(Txn.sender(), Int(0), close_to=Txn.sender()),
         Approve()
     ])
     
+    # Creator deletes a finished escrow (or an unbound warm-pool escrow)
+    # Closes the app account to the creator, releasing its minimum balance;
+    # app call carries the inner fee (2x min fee)
+    on_delete = Seq([
+        Assert(Txn.sender() == Global.creator_address()),
+        Assert(Or(
+            And(
+                state.is_set(settled_key),
+                state.is_set(fee_released_key)
+            ),
+            state.get(organizer_key) == Bytes("")
+        )),
+        pay(Global.creator_address(), Int(0), close_to=Global.creator_address()),
+        Approve()
+    ])
+    
+    return {
+        'create': on_creation,
+        'delete': on_delete,
+        'bind': on_bind,
+        'deposit': on_deposit,
+        'delivery': on_delivery,
+        'return': on_return,
+        'damage': on_damage,
+        'release_fee': on_release_rental_fee,
+        'settle_fee': on_settle_fee,
+        'refund': on_refund_deposit,
+        'claim': on_claim_deposit,
+        'timeout': on_timeout_claim
+    }
+
+
+# NoOp methods in routing order, selected by the first application arg
+NOOP_METHODS = (
+    'bind',
+    'deposit',
+    'delivery',
+    'return',
+    'damage',
+    'release_fee',
+    'settle_fee',
+    'refund',
+    'claim',
+    'timeout'
+)
+
+
+def approval_program(optimize=True):
+    """
+    Stateful smart contract for rental deposit escrow.
+    
+    See approval_handlers for the global state layout.
+    """
+    handlers = approval_handlers(optimize)
+    
     # Route based on application call argument
     program = Cond(
-        [Txn.application_id() == Int(0), on_creation],
-        [Txn.application_args[0] == Bytes("deposit"), on_deposit],
-        [Txn.application_args[0] == Bytes("delivery"), on_delivery],
-        [Txn.application_args[0] == Bytes("return"), on_return],
-        [Txn.application_args[0] == Bytes("damage"), on_damage],
-        [Txn.application_args[0] == Bytes("release_fee"), on_release_rental_fee],
-        [Txn.application_args[0] == Bytes("refund"), on_refund_deposit],
-        [Txn.application_args[0] == Bytes("claim"), on_claim_deposit],
-        [Txn.application_args[0] == Bytes("timeout"), on_timeout_claim]
+        [Txn.application_id() == Int(0), handlers['create']],
+        [Txn.on_completion() == OnComplete.DeleteApplication, handlers['delete']],
+        # Handlers below only apply to NoOp calls (no update/opt-in/close-out)
+        [Txn.on_completion() != OnComplete.NoOp, Reject()],
+        *[
+            [Txn.application_args[0] == Bytes(method), handlers[method]]
+            for method in NOOP_METHODS
+        ]
     )
     
     return program
@@ -177,8 +306,7 @@ def clear_state_program():
 if __name__ == "__main__":
     # Compile to TEAL
     with open("rental_escrow_approval.teal", "w") as f:
-        compiled = compileTeal(approval_program(), mode=Mode.Application, version=10)
-        f.write(compiled)
+        f.write(compile_optimized(approval_program()))
     
     with open("rental_escrow_clear.teal", "w") as f:
         compiled = compileTeal(clear_state_program(), mode=Mode.Application, version=10)
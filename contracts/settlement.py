@@ -0,0 +1,409 @@
+"""
+Periodic net settlement of vendor rental fees
+Collects delivered bookings' rental fees from their escrows into the
+deployer account with the contract's settle_fee call, then pays each vendor
+one net payout covering all of its collected bookings, and reconciles every
+payout to its bookings in an audit report
+"""
+
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from algosdk import account, encoding, mnemonic
+from algosdk.error import AlgodHTTPError
+from algosdk.transaction import (
+    ApplicationCallTxn,
+    OnComplete,
+    PaymentTxn,
+    assign_group_id,
+    wait_for_confirmation
+)
+
+from contracts.airdrop import (
+    VALIDITY_WINDOW,
+    Checkpoint,
+    get_indexer_client,
+    resolve_in_doubt,
+    submit_raw_group
+)
+from contracts.deploy import chunked, get_algod_client
+from contracts.escrow_model import validate_action
+from contracts.fees import FeePolicy
+from contracts.interact import decode_global_state
+
+
+# Parallel application lookups when verifying candidates
+LOOKUP_WORKERS = 16
+
+
+class SettlementLedger(Checkpoint):
+    """
+    Append-only settlement journal (same event log as the airdrop checkpoint)
+
+    Rows are "collect:<app_id>" for fees moved from an escrow to the
+    deployer and "payout:<app_id>" for fees included in a vendor payout.
+    Submitted events also carry the escrows (app_id, vendor, amount) or
+    payouts (vendor, amount, app_ids, tx_id) they cover, which is what the
+    audit report is built from.
+    """
+
+    def __init__(self, path):
+        self.escrows = {}
+        self.payout_groups = {}
+        self.paid = []
+        super().__init__(path)
+
+    def _apply(self, event):
+        kind = event['event']
+        if kind == 'submitted':
+            for escrow in event.get('escrows', []):
+                self.escrows[escrow['app_id']] = dict(escrow, collect_tx_id=event['tx_id'])
+            if 'payouts' in event:
+                self.payout_groups[event['tx_id']] = event['payouts']
+        elif kind == 'confirmed' and event['tx_id'] in self.payout_groups:
+            self.paid.extend(self.payout_groups[event['tx_id']])
+        super()._apply(event)
+
+    def collected_app_ids(self):
+        return {app_id for app_id in self.escrows if f"collect:{app_id}" in self.done_rows}
+
+    def owed_by_vendor(self):
+        """
+        Returns:
+            dict: {vendor: [escrow]} for collected fees not yet paid out
+        """
+        owed = {}
+        for app_id in sorted(self.collected_app_ids()):
+            if f"payout:{app_id}" not in self.done_rows:
+                escrow = self.escrows[app_id]
+                owed.setdefault(escrow['vendor'], []).append(escrow)
+        return owed
+
+
+def find_settleable_escrows(client, app_ids, creator_address):
+    """
+    Verify candidates on-chain: created by us, delivered, fee not released
+
+    Returns:
+        list: [{'app_id': int, 'vendor': str, 'amount': int}]
+    """
+    def inspect(app_id):
+        try:
+            params = client.application_info(app_id)['params']
+            if params['creator'] != creator_address:
+                return None
+
+            state = decode_global_state(params.get('global-state', []))
+            if not validate_action(state, 'settle_fee')['allowed']:
+                return None
+
+            return {'app_id': app_id, 'vendor': state['vendor'], 'amount': state['rental_fee']}
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=LOOKUP_WORKERS) as pool:
+        return [escrow for escrow in pool.map(inspect, app_ids) if escrow]
+
+
+def settlement_report(ledger):
+    """
+    Reconcile every payout in the ledger to its underlying bookings
+
+    Returns:
+        dict: {
+            'vendors': {vendor: {
+                'paid_total': int,
+                'payouts': [{'tx_id': str, 'amount': int, 'reconciled': bool,
+                             'bookings': [{'app_id', 'amount', 'collect_tx_id'}]}],
+                'owed_total': int,
+                'owed_bookings': [{'app_id', 'amount', 'collect_tx_id'}]
+            }},
+            'totals': {'collected': int, 'paid': int, 'outstanding': int,
+                       'bookings_collected': int, 'bookings_paid': int},
+            'reconciled': bool (every payout equals its bookings and
+                collected == paid + outstanding)
+        }
+    """
+    def booking(app_id):
+        escrow = ledger.escrows[app_id]
+        return {'app_id': app_id, 'amount': escrow['amount'], 'collect_tx_id': escrow['collect_tx_id']}
+
+    vendors = {}
+
+    def vendor_entry(vendor):
+        return vendors.setdefault(
+            vendor, {'paid_total': 0, 'payouts': [], 'owed_total': 0, 'owed_bookings': []}
+        )
+
+    reconciled = True
+    paid_total = bookings_paid = 0
+    for payout in ledger.paid:
+        bookings = [booking(app_id) for app_id in payout['app_ids']]
+        matches = sum(b['amount'] for b in bookings) == payout['amount'] and all(
+            ledger.escrows[app_id]['vendor'] == payout['vendor'] for app_id in payout['app_ids']
+        )
+        reconciled = reconciled and matches
+
+        entry = vendor_entry(payout['vendor'])
+        entry['paid_total'] += payout['amount']
+        entry['payouts'].append({
+            'tx_id': payout['tx_id'],
+            'amount': payout['amount'],
+            'reconciled': matches,
+            'bookings': bookings
+        })
+        paid_total += payout['amount']
+        bookings_paid += len(bookings)
+
+    outstanding = 0
+    for vendor, escrows in ledger.owed_by_vendor().items():
+        entry = vendor_entry(vendor)
+        entry['owed_bookings'] = [booking(escrow['app_id']) for escrow in escrows]
+        entry['owed_total'] = sum(escrow['amount'] for escrow in escrows)
+        outstanding += entry['owed_total']
+
+    collected_ids = ledger.collected_app_ids()
+    collected = sum(ledger.escrows[app_id]['amount'] for app_id in collected_ids)
+
+    return {
+        'vendors': vendors,
+        'totals': {
+            'collected': collected,
+            'paid': paid_total,
+            'outstanding': outstanding,
+            'bookings_collected': len(collected_ids),
+            'bookings_paid': bookings_paid
+        },
+        'reconciled': reconciled and collected == paid_total + outstanding
+    }
+
+
+def settle_vendor_fees(
+    deployer_mnemonic,
+    ledger_path,
+    app_ids=None,
+    registry=None,
+    client=None,
+    idx_client=None
+):
+    """
+    Run one settlement cycle: collect owed rental fees, then pay vendors
+
+    Fees are collected in atomic groups of settle_fee calls. Each vendor
+    then gets a single payment for everything collected on its behalf,
+    batched into groups of payments. Every group is journaled before it
+    is sent, and groups left in doubt by a crashed run are resolved
+    before anything new is sent, so no fee is collected or paid twice.
+    A group algod rejects is retried one escrow (or vendor) at a time so
+    one bad member does not block the rest.
+
+    Args:
+        deployer_mnemonic: 25-word mnemonic of the escrow creator (treasury)
+        ledger_path: Settlement journal (created if missing)
+        app_ids: Candidate application IDs
+        registry: Optional EscrowRegistry; supplies candidates and is
+            updated as fees are collected
+        client: Optional Algod client (defaults to TestNet)
+        idx_client: Optional Indexer client (defaults to TestNet)
+
+    Returns:
+        dict: {
+            'success': bool,
+            'collected': int (bookings collected this run),
+            'paid': {vendor: amount paid this run},
+            'failed': [{'stage': str, 'tx_id': str, 'error': str}],
+            'fees': {operation: {'count': int, 'total_fee': int, 'average_fee': int}},
+            'report': settlement_report of the whole ledger,
+            'error': str (if failed)
+        }
+    """
+    client = client or get_algod_client()
+    idx_client = idx_client or get_indexer_client()
+    ledger = SettlementLedger(ledger_path)
+    fee_policy = FeePolicy(client)
+
+    deployer_private_key = mnemonic.to_private_key(deployer_mnemonic)
+    deployer_address = account.address_from_private_key(deployer_private_key)
+
+    collected = 0
+    paid = {}
+    failed = []
+
+    def send_groups(stage, batches, build):
+        """
+        Journal and submit a group per batch, then wait on each in turn
+
+        `build(members)` returns the (txns, event) for a batch. A rejected
+        batch of several members is split into one group per member.
+        """
+        pending = []
+        queue = list(batches)
+        while queue:
+            members = queue.pop(0)
+            txns, event = build(members)
+            signed = [encoding.msgpack_encode(txn.sign(deployer_private_key)) for txn in txns]
+            tx_id = txns[0].get_txid()
+
+            ledger.record(dict(event, event='submitted', tx_id=tx_id, signed=signed))
+            try:
+                submit_raw_group(client, signed)
+                pending.append((tx_id, event))
+            except AlgodHTTPError as e:
+                # Rejected outright by algod on first submission, so it never
+                # landed and its members can safely be sent again
+                if e.code == 400:
+                    ledger.record({'event': 'expired', 'tx_id': tx_id})
+                    if len(members) > 1:
+                        queue.extend([member] for member in members)
+                        continue
+                failed.append({'stage': stage, 'tx_id': tx_id, 'error': str(e)})
+            except Exception as e:
+                # Left in doubt on purpose; the next run resolves it safely
+                failed.append({'stage': stage, 'tx_id': tx_id, 'error': str(e)})
+
+        confirmed = []
+        for tx_id, event in pending:
+            try:
+                wait_for_confirmation(client, tx_id, VALIDITY_WINDOW)
+                ledger.record({'event': 'confirmed', 'tx_id': tx_id, 'rows': event['rows']})
+                confirmed.append(event)
+            except Exception as e:
+                failed.append({'stage': stage, 'tx_id': tx_id, 'error': str(e)})
+        return confirmed
+
+    try:
+        resolve_in_doubt(client, idx_client, ledger)
+
+        candidates = set(app_ids or [])
+        if registry is not None:
+            candidates.update(registry.fee_owed_app_ids())
+        candidates -= ledger.collected_app_ids()
+
+        escrows = find_settleable_escrows(client, sorted(candidates), deployer_address)
+        print(f"Collecting {len(escrows)} rental fees out of {len(candidates)} candidates")
+
+        params = client.suggested_params()
+        params.last = params.first + VALIDITY_WINDOW
+
+        def build_collect(group):
+            txns = [
+                ApplicationCallTxn(
+                    sender=deployer_address,
+                    sp=params,
+                    index=escrow['app_id'],
+                    on_complete=OnComplete.NoOpOC,
+                    app_args=[b"settle_fee"]
+                )
+                for escrow in group
+            ]
+            # Each call pays the fee to the deployer with one inner payment
+            fee_policy.apply(
+                txns, priority='background', inner_txns=len(txns), params=params,
+                operation='settle_fee_collect'
+            )
+            if len(txns) > 1:
+                assign_group_id(txns)
+            return txns, {
+                'rows': [f"collect:{escrow['app_id']}" for escrow in group],
+                'last_valid': params.last,
+                'escrows': group
+            }
+
+        for event in send_groups('collect', chunked(escrows), build_collect):
+            collected += len(event['escrows'])
+            if registry is not None:
+                for escrow in event['escrows']:
+                    if escrow['app_id'] in registry.rows:
+                        registry.update(escrow['app_id'], {'fee_released': 1})
+
+        owed = ledger.owed_by_vendor()
+        params = client.suggested_params()
+        params.last = params.first + VALIDITY_WINDOW
+
+        def build_payout(vendors):
+            txns, payouts = [], []
+            for vendor in vendors:
+                escrows = owed[vendor]
+                txn = PaymentTxn(
+                    sender=deployer_address,
+                    sp=params,
+                    receiver=vendor,
+                    amt=sum(escrow['amount'] for escrow in escrows),
+                    note=f"EmergeBee rental fee settlement: {len(escrows)} bookings".encode()
+                )
+                txns.append(txn)
+                payouts.append({
+                    'vendor': vendor,
+                    'amount': txn.amt,
+                    'app_ids': [escrow['app_id'] for escrow in escrows]
+                })
+
+            fee_policy.apply(
+                txns, priority='background', params=params, operation='settle_fee_payout'
+            )
+            # Transaction ids change with the group id, so read them afterwards
+            if len(txns) > 1:
+                assign_group_id(txns)
+            for txn, payout in zip(txns, payouts):
+                payout['tx_id'] = txn.get_txid()
+
+            return txns, {
+                'rows': [f"payout:{app_id}" for payout in payouts for app_id in payout['app_ids']],
+                'last_valid': params.last,
+                'payouts': payouts
+            }
+
+        for event in send_groups('payout', chunked(sorted(owed)), build_payout):
+            for payout in event['payouts']:
+                paid[payout['vendor']] = payout['amount']
+
+        print(f"✅ Collected {collected} fees, paid {len(paid)} vendors, {len(failed)} groups failed")
+
+        return {
+            'success': not failed,
+            'collected': collected,
+            'paid': paid,
+            'failed': failed,
+            'fees': fee_policy.report(),
+            'report': settlement_report(ledger)
+        }
+    except Exception as e:
+        error_message = str(e)
+        print(f"❌ Settlement aborted: {error_message}")
+        return {
+            'success': False,
+            'collected': collected,
+            'paid': paid,
+            'failed': failed,
+            'error': f'Settlement aborted: {error_message}'
+        }
+    finally:
+        ledger.close()
+
+
+if __name__ == "__main__":
+    # One settlement cycle, e.g. from a nightly cron job
+    parser = argparse.ArgumentParser(description="Net settlement of vendor rental fees")
+    parser.add_argument("ledger", help="Settlement journal (JSONL)")
+    parser.add_argument("app_ids", nargs="*", type=int, help="Candidate escrow app ids")
+    parser.add_argument("--report", help="Write the audit report to this JSON file")
+    args = parser.parse_args()
+
+    deployer_mnemonic = os.getenv('ALGORAND_DEPLOYER_MNEMONIC')
+    if not deployer_mnemonic:
+        print(json.dumps({
+            'success': False,
+            'error': 'ALGORAND_DEPLOYER_MNEMONIC not set'
+        }))
+        sys.exit(1)
+
+    result = settle_vendor_fees(deployer_mnemonic, args.ledger, app_ids=args.app_ids)
+
+    if args.report and 'report' in result:
+        with open(args.report, "w") as f:
+            json.dump(result['report'], f, indent=2)
+
+    print(json.dumps({key: value for key, value in result.items() if key != 'report'}))
+    sys.exit(0 if result['success'] else 1)
@@ -0,0 +1,596 @@
+"""
+Sharded hot-wallet signer pool for reward transfers
+Spreads reward ASA transfers over several hot wallets, each funded from the
+deployer (and usually rekeyed to it), routes every claim to the least-loaded
+wallet that can cover it, tracks each wallet's ALGO balance and ASA
+inventory, and tops wallets up from the deployer when they run low
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import fcntl
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from algosdk import account, mnemonic
+from algosdk.transaction import (
+    AssetTransferTxn,
+    PaymentTxn,
+    assign_group_id,
+    wait_for_confirmation
+)
+
+try:
+    from contracts.deploy import get_algod_client
+    from contracts.fees import FEE_STRATEGIES, FeePolicy
+    from contracts.txn_templates import send_signed, templates_for
+except ImportError:  # imported by create_claim_transaction run from inside contracts/
+    from deploy import get_algod_client
+    from fees import FEE_STRATEGIES, FeePolicy
+    from txn_templates import send_signed, templates_for
+
+
+# ALGO each wallet is topped up to, and the fraction of a target below
+# which a wallet (ALGO or an ASA) counts as low
+WALLET_ALGO_TARGET = 2_000_000
+LOW_WATERMARK = 0.25
+
+# Seconds a wallet's on-chain balances are trusted before a refresh
+REFRESH_INTERVAL = 60
+
+# ALGO kept free above min balance so a wallet can always pay its fee
+FEE_RESERVE = max(strategy['max_fee'] for strategy in FEE_STRATEGIES.values())
+
+# Parallel account lookups when refreshing wallets
+REFRESH_WORKERS = 8
+
+# Seconds after which a reservation is assumed to belong to a process that
+# died before releasing it; a transfer sends and confirms well within this
+RESERVATION_TTL = 300
+
+
+class SignerPool:
+    """
+    Reward hot wallets and their balances, persisted to a JSON file
+
+    Wallets are either rekeyed to the deployer (the deployer key signs for
+    them, so no extra secret is stored) or have their own mnemonic. Claim
+    processes run concurrently, so every state change happens under an
+    exclusive file lock and is written back before the lock is released;
+    network calls are made outside the lock. Inventory is reserved when a
+    claim is routed, so two processes never spend the same tokens, and a
+    reservation left by a crashed process expires after RESERVATION_TTL.
+    """
+
+    def __init__(self, state_path, deployer_mnemonic, wallet_mnemonics=(), asa_targets=None, client=None):
+        """
+        Args:
+            state_path: JSON file holding wallets, balances and counters
+            deployer_mnemonic: 25-word mnemonic of the treasury; signs for
+                rekeyed wallets and funds rebalancing
+            wallet_mnemonics: Mnemonics of wallets that sign for themselves
+            asa_targets: {asa_id: units each wallet is topped up to}
+            client: Optional Algod client (defaults to TestNet)
+        """
+        self.state_path = state_path
+        self.client = client or get_algod_client()
+        self.fee_policy = FeePolicy(self.client)
+        self.asa_targets = {int(asa_id): target for asa_id, target in (asa_targets or {}).items()}
+
+        self._deployer_key = mnemonic.to_private_key(deployer_mnemonic)
+        self.deployer_address = account.address_from_private_key(self._deployer_key)
+        self._keys = {}
+        for wallet_mnemonic in wallet_mnemonics:
+            key = mnemonic.to_private_key(wallet_mnemonic)
+            self._keys[account.address_from_private_key(key)] = key
+
+        self.wallets = {}
+        self.counters = {'routed': 0, 'fallback': 0, 'rebalances': 0}
+        with self._locked():
+            for address in self._keys:
+                self.wallets.setdefault(address, self._new_wallet(rekeyed=False))
+
+    @staticmethod
+    def _new_wallet(rekeyed):
+        return {
+            'rekeyed': rekeyed,
+            'algo': 0,
+            'min_balance': 0,
+            'assets': {},
+            # reservation id -> {'asa': str, 'amount': int, 'at': wall-clock time}
+            'reservations': {},
+            'sent': 0,
+            'refreshed_at': 0.0,
+            'rebalance_tx_id': None,
+            'rebalance_at': 0.0
+        }
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Hold the pool's file lock with freshly loaded state, then save it"""
+        with open(self.state_path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(self.state_path):
+                    with open(self.state_path, "r") as f:
+                        saved = json.load(f)
+                    self.wallets = saved['wallets']
+                    self.counters.update(saved['counters'])
+                    for wallet in self.wallets.values():
+                        # Untimed counters from older state files cannot expire
+                        wallet.pop('reserved', None)
+                        wallet.pop('in_flight', None)
+                        wallet.setdefault('reservations', {})
+                yield
+                tmp_path = self.state_path + ".tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump({'wallets': self.wallets, 'counters': self.counters}, f)
+                os.replace(tmp_path, self.state_path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _signing_key(self, address):
+        if address in self._keys:
+            return self._keys[address]
+        if self.wallets[address]['rekeyed']:
+            return self._deployer_key
+        raise ValueError(f"No signing key for hot wallet {address}")
+
+    def _fetch(self, rebalance_tx_ids):
+        """
+        Read balances (and top-up status) from algod; call without the lock
+
+        Args:
+            rebalance_tx_ids: {address: rebalance tx id or None} as last seen
+
+        Returns:
+            list: [(address, account info or None, rebalance tx id, top-up
+                done: True, False, or None if algod does not know the txn)]
+        """
+        def lookup(item):
+            address, tx_id = item
+            try:
+                info = self.client.account_info(address)
+            except Exception:
+                return address, None, tx_id, False
+
+            done = False
+            if tx_id:
+                try:
+                    done = self.client.pending_transaction_info(tx_id).get('confirmed-round', 0) > 0
+                except Exception:
+                    done = None  # dropped from the pool, or not sent yet
+            return address, info, tx_id, done
+
+        with ThreadPoolExecutor(max_workers=REFRESH_WORKERS) as pool:
+            return list(pool.map(lookup, rebalance_tx_ids.items()))
+
+    def _apply_refresh(self, fetched):
+        """Store balances read by _fetch (call with the lock held)"""
+        now = time.time()
+        for address, info, tx_id, done in fetched:
+            wallet = self.wallets.get(address)
+            if wallet is None or info is None:
+                continue
+            wallet['algo'] = info['amount']
+            wallet['min_balance'] = info.get('min-balance', 0)
+            wallet['assets'] = {
+                str(asset['asset-id']): asset['amount'] for asset in info.get('assets', [])
+            }
+            wallet['refreshed_at'] = now
+            # Another process may have sent a newer top-up meanwhile. An
+            # unknown txn is only given up on once it is old enough to have
+            # been sent; until then the claim may be about to be sent.
+            if tx_id is None or wallet['rebalance_tx_id'] != tx_id:
+                continue
+            if done or (done is None and now - wallet.get('rebalance_at', 0.0) > REFRESH_INTERVAL):
+                wallet['rebalance_tx_id'] = None
+
+    def _refresh(self, addresses):
+        """Reload balances from algod; call without the lock"""
+        with self._locked():
+            tx_ids = {address: self.wallets[address]['rebalance_tx_id'] for address in addresses}
+        fetched = self._fetch(tx_ids)
+        with self._locked():
+            self._apply_refresh(fetched)
+
+    def refresh(self):
+        """Reload every wallet's balances from algod"""
+        with self._locked():
+            addresses = list(self.wallets)
+        self._refresh(addresses)
+
+    def add_wallets(self, addresses, rekeyed=True):
+        """Track existing wallets (rekeyed to the deployer by default)"""
+        with self._locked():
+            for address in addresses:
+                self.wallets.setdefault(address, self._new_wallet(rekeyed))
+        self._refresh(addresses)
+
+    def provision(self, count, asa_ids=(), algo_amount=WALLET_ALGO_TARGET):
+        """
+        Create `count` new hot wallets rekeyed to the deployer
+
+        One atomic group per wallet funds it from the deployer, opts it in
+        to `asa_ids` and rekeys it to the deployer, so its own key is never
+        needed again. ASA inventory is added by rebalance().
+
+        Returns:
+            list: Addresses of the new wallets
+        """
+        params = self.client.suggested_params()
+        tx_ids, addresses = [], []
+
+        for _ in range(count):
+            wallet_key, wallet_address = account.generate_account()
+            txns = [PaymentTxn(
+                sender=self.deployer_address, sp=params, receiver=wallet_address, amt=algo_amount
+            )]
+            for asa_id in asa_ids:
+                txns.append(AssetTransferTxn(
+                    sender=wallet_address, sp=params, receiver=wallet_address, amt=0, index=int(asa_id)
+                ))
+            txns.append(PaymentTxn(
+                sender=wallet_address, sp=params, receiver=wallet_address, amt=0,
+                rekey_to=self.deployer_address
+            ))
+
+            self.fee_policy.apply(
+                txns, priority='background', params=params, operation='provision_wallet'
+            )
+            assign_group_id(txns)
+            signed = [txns[0].sign(self._deployer_key)] + [txn.sign(wallet_key) for txn in txns[1:]]
+            tx_ids.append(self.client.send_transactions(signed))
+            addresses.append(wallet_address)
+
+        for tx_id in tx_ids:
+            wait_for_confirmation(self.client, tx_id, 4)
+
+        self.add_wallets(addresses, rekeyed=True)
+        return addresses
+
+    @staticmethod
+    def _reserved(wallet, key):
+        return sum(entry['amount'] for entry in wallet['reservations'].values() if entry['asa'] == key)
+
+    @classmethod
+    def _available(cls, wallet, key):
+        """
+        Units of ASA `key` (a str) not reserved by transfers in flight
+
+        Reservations are kept apart from `assets`, which a refresh in any
+        process overwrites with the on-chain balance.
+        """
+        return wallet['assets'].get(key, 0) - cls._reserved(wallet, key)
+
+    def _expire_reservations(self, now):
+        """Drop reservations older than RESERVATION_TTL (call with the lock held)"""
+        for address, wallet in self.wallets.items():
+            expired = [
+                reservation_id for reservation_id, entry in wallet['reservations'].items()
+                if now - entry['at'] > RESERVATION_TTL
+            ]
+            for reservation_id in expired:
+                del wallet['reservations'][reservation_id]
+            if expired:
+                # The dead process may have spent them; trust the chain again
+                wallet['refreshed_at'] = 0.0
+
+    def _spendable_algo(self, wallet):
+        return wallet['algo'] - wallet['min_balance'] - FEE_RESERVE
+
+    def _is_low(self, wallet):
+        if wallet['rebalance_tx_id']:
+            return False
+        if wallet['algo'] - wallet['min_balance'] < WALLET_ALGO_TARGET * LOW_WATERMARK:
+            return True
+        return any(
+            self._available(wallet, str(asa_id)) < target * LOW_WATERMARK
+            for asa_id, target in self.asa_targets.items()
+        )
+
+    def acquire(self, asa_id, amount):
+        """
+        Route a transfer to the least-loaded wallet able to cover it
+
+        The amount is reserved against that wallet's inventory until
+        release() is called, or until it expires after RESERVATION_TTL.
+
+        Returns:
+            tuple: (wallet address, reservation id), or (None, None) if no
+            wallet can cover it
+        """
+        key = str(int(asa_id))
+        with self._locked():
+            stale = [
+                address for address, wallet in self.wallets.items()
+                if time.time() - wallet['refreshed_at'] > REFRESH_INTERVAL
+            ]
+            tx_ids = {address: self.wallets[address]['rebalance_tx_id'] for address in stale}
+        fetched = self._fetch(tx_ids) if stale else []
+
+        with self._locked():
+            now = time.time()
+            self._apply_refresh(fetched)
+            self._expire_reservations(now)
+
+            eligible = [
+                (len(wallet['reservations']), -self._available(wallet, key), address)
+                for address, wallet in self.wallets.items()
+                if self._available(wallet, key) >= amount and self._spendable_algo(wallet) >= 0
+            ]
+            if not eligible:
+                self.counters['fallback'] += 1
+                return None, None
+
+            address = min(eligible)[2]
+            reservation_id = uuid.uuid4().hex
+            self.wallets[address]['reservations'][reservation_id] = {'asa': key, 'amount': amount, 'at': now}
+            self.counters['routed'] += 1
+            return address, reservation_id
+
+    def release(self, address, reservation_id, asa_id, amount, fee, success):
+        """
+        Finish a routed transfer and drop its reservation
+
+        A confirmed transfer is deducted from the cached balance. If a
+        refresh already saw it on-chain the wallet reads low until the
+        next refresh, which never overspends.
+        """
+        key = str(int(asa_id))
+        with self._locked():
+            wallet = self.wallets[address]
+            wallet['reservations'].pop(reservation_id, None)
+            if success:
+                wallet['sent'] += 1
+                wallet['algo'] -= fee
+                wallet['assets'][key] = wallet['assets'].get(key, 0) - amount
+            else:
+                # Balances may have moved under us; reload on next acquire
+                wallet['refreshed_at'] = 0.0
+
+    def sign_transfer(self, address, receiver, asa_id, amount, params, priority='urgent'):
+        """
+        Build, price and sign a transfer routed to `address` (None for the
+        deployer fallback); shared with async_api
+
+        Returns:
+            tuple: (signed template transactions for send_signed, fee paid)
+        """
+        sender = address or self.deployer_address
+        signing_key = self._signing_key(address) if address else self._deployer_key
+        txn = templates_for(params).asset_transfer(sender, receiver, asa_id, amount, params)
+        fee = self.fee_policy.apply(
+            [txn], priority=priority, params=params, operation='reward_transfer'
+        )
+        return [txn.sign(signing_key)], fee
+
+    def transfer(self, receiver, asa_id, amount, priority='urgent'):
+        """
+        Send a reward transfer from the pool (or the deployer as fallback)
+
+        Returns:
+            dict: {
+                'success': bool,
+                'tx_id': str,
+                'fee': int,
+                'wallet': str (sending account),
+                'rebalance_tx_id': str (if the wallet was topped up),
+                'error': str (if failed)
+            }
+        """
+        address, reservation_id = self.acquire(asa_id, amount)
+        sender = address or self.deployer_address
+
+        fee = 0
+        success = False
+        try:
+            params = self.client.suggested_params()
+            # Inside the try so a missing key still releases the reservation
+            signed, fee = self.sign_transfer(address, receiver, asa_id, amount, params, priority)
+
+            tx_id = send_signed(self.client, signed)
+            wait_for_confirmation(self.client, tx_id, 4)
+            success = True
+
+            result = {
+                'success': True,
+                'tx_id': tx_id,
+                'fee': fee,
+                'wallet': sender,
+                'receiver': receiver,
+                'asa_id': asa_id,
+                'amount': amount
+            }
+        except Exception as e:
+            result = {
+                'success': False,
+                'wallet': sender,
+                'error': f'Failed to transfer ASA: {str(e)}'
+            }
+        finally:
+            if address:
+                self.release(address, reservation_id, asa_id, amount, fee, success)
+
+        if address:
+            rebalanced = self.rebalance([address])
+            if rebalanced:
+                result['rebalance_tx_id'] = rebalanced[address]
+        return result
+
+    def rebalance(self, addresses=None, wait=False):
+        """
+        Top low wallets back up to their ALGO and ASA targets
+
+        Sends one group per low wallet from the deployer: an ALGO payment
+        and an ASA transfer for each low inventory (opting the wallet in
+        first if needed). Groups are sent without waiting unless `wait`;
+        a wallet with a top-up in flight is not topped up again.
+
+        Returns:
+            dict: {address: tx_id} of top-ups sent
+        """
+        with self._locked():
+            targets = [
+                address for address in (addresses or list(self.wallets))
+                if self._is_low(self.wallets[address])
+            ]
+        if not targets:
+            return {}
+
+        # Network reads happen before the lock; pricing then reuses the
+        # congestion reading this warms up
+        params = self.client.suggested_params()
+        self.fee_policy.congestion(params)
+
+        groups = {}
+        with self._locked():
+            for address in targets:
+                wallet = self.wallets[address]
+                # Re-checked under the lock: another process may have topped it up
+                if not self._is_low(wallet):
+                    continue
+                txns = []
+
+                algo_missing = WALLET_ALGO_TARGET - (wallet['algo'] - wallet['min_balance'])
+                if algo_missing > 0:
+                    txns.append(PaymentTxn(
+                        sender=self.deployer_address, sp=params, receiver=address, amt=algo_missing
+                    ))
+
+                for asa_id, target in self.asa_targets.items():
+                    if str(asa_id) not in wallet['assets']:
+                        txns.append(AssetTransferTxn(
+                            sender=address, sp=params, receiver=address, amt=0, index=asa_id
+                        ))
+                    held = self._available(wallet, str(asa_id))
+                    if held < target * LOW_WATERMARK:
+                        txns.append(AssetTransferTxn(
+                            sender=self.deployer_address, sp=params, receiver=address,
+                            amt=target - held, index=asa_id
+                        ))
+
+                # The deployer pays the whole group's fee
+                payer_index = next(
+                    (i for i, txn in enumerate(txns) if txn.sender == self.deployer_address), None
+                )
+                if payer_index is None:
+                    continue
+                self.fee_policy.apply(
+                    txns, priority='background', payer_index=payer_index, params=params,
+                    operation='rebalance'
+                )
+                if len(txns) > 1:
+                    assign_group_id(txns)
+
+                try:
+                    signed = [
+                        txn.sign(self._deployer_key if txn.sender == self.deployer_address
+                                 else self._signing_key(address))
+                        for txn in txns
+                    ]
+                except Exception as e:
+                    print(f"❌ Rebalance of {address} failed: {str(e)}")
+                    continue
+
+                # Claimed before sending so no other process tops it up too;
+                # a top-up that never lands is cleared by the next refresh
+                tx_id = signed[0].get_txid()
+                wallet['rebalance_tx_id'] = tx_id
+                wallet['rebalance_at'] = time.time()
+                groups[address] = (tx_id, signed)
+
+        sent, failed = {}, []
+        for address, (tx_id, signed) in groups.items():
+            try:
+                self.client.send_transactions(signed)
+                sent[address] = tx_id
+            except Exception as e:
+                print(f"❌ Rebalance of {address} failed: {str(e)}")
+                failed.append((address, tx_id))
+
+        if groups:
+            with self._locked():
+                for address, tx_id in sent.items():
+                    # Reload balances once the top-up has had time to land
+                    self.wallets[address]['refreshed_at'] = 0.0
+                    self.counters['rebalances'] += 1
+                for address, tx_id in failed:
+                    if self.wallets[address]['rebalance_tx_id'] == tx_id:
+                        self.wallets[address]['rebalance_tx_id'] = None
+
+        if wait:
+            for tx_id in sent.values():
+                wait_for_confirmation(self.client, tx_id, 4)
+        return sent
+
+    def stats(self):
+        """
+        Returns:
+            dict: {'wallets': {address: {'algo', 'assets', 'reserved', 'in_flight',
+                                         'sent', 'rebalancing'}},
+                   'routed': int, 'fallback': int, 'rebalances': int}
+        """
+        with self._locked():
+            return dict(
+                self.counters,
+                wallets={
+                    address: {
+                        'algo': wallet['algo'],
+                        'assets': dict(wallet['assets']),
+                        'reserved': {
+                            key: self._reserved(wallet, key)
+                            for key in {entry['asa'] for entry in wallet['reservations'].values()}
+                        },
+                        'in_flight': len(wallet['reservations']),
+                        'sent': wallet['sent'],
+                        'rebalancing': bool(wallet['rebalance_tx_id'])
+                    }
+                    for address, wallet in self.wallets.items()
+                }
+            )
+
+
+def wallet_mnemonics_from_env():
+    """Own-key hot wallets from ALGORAND_HOT_WALLET_MNEMONICS (comma-separated)"""
+    value = os.getenv('ALGORAND_HOT_WALLET_MNEMONICS', '')
+    return [words.strip() for words in value.split(',') if words.strip()]
+
+
+def asa_targets_from_env():
+    """Per-wallet ASA targets from ALGORAND_HOT_WALLET_ASA_TARGETS, e.g. '123:5000,456:100'"""
+    value = os.getenv('ALGORAND_HOT_WALLET_ASA_TARGETS', '')
+    targets = {}
+    for item in value.split(','):
+        if item.strip():
+            asa_id, target = item.split(':')
+            targets[int(asa_id)] = int(target)
+    return targets
+
+
+if __name__ == "__main__":
+    deployer_mnemonic = os.getenv('ALGORAND_DEPLOYER_MNEMONIC')
+
+    if not deployer_mnemonic or len(sys.argv) < 3 or sys.argv[2] not in ('provision', 'rebalance', 'stats'):
+        print("Usage: ALGORAND_DEPLOYER_MNEMONIC=... python -m contracts.signer_pool "
+              "<state_file> provision <count> | rebalance | stats")
+        sys.exit(1)
+
+    pool = SignerPool(
+        sys.argv[1],
+        deployer_mnemonic,
+        wallet_mnemonics=wallet_mnemonics_from_env(),
+        asa_targets=asa_targets_from_env()
+    )
+
+    if sys.argv[2] == 'provision':
+        addresses = pool.provision(int(sys.argv[3]), asa_ids=list(pool.asa_targets))
+        pool.rebalance(addresses, wait=True)
+        print(json.dumps({'provisioned': addresses}))
+    elif sys.argv[2] == 'rebalance':
+        pool.refresh()
+        print(json.dumps({'rebalanced': pool.rebalance(wait=True)}))
+    else:
+        print(json.dumps(pool.stats(), indent=2))
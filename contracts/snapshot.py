@@ -0,0 +1,266 @@
+"""
+Compact binary snapshots of the escrow registry
+Writes every tracked escrow, plus the round the data is valid at, as
+fixed-width little-endian column sections that load back with a handful of
+array.frombytes calls (or can be memory-mapped directly), then catches up
+only on escrows touched since the snapshot round
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from algosdk import encoding
+from algosdk.error import AlgodHTTPError
+
+from contracts.deploy import get_algod_client
+from contracts.escrow_registry import EscrowRegistry
+from contracts.interact import decode_global_state
+from contracts.rate_limit import RateLimitedIndexerClient
+
+
+# Algorand TestNet indexer (AlgoNode public API)
+TESTNET_INDEXER_ADDRESS = "https://testnet-idx.algonode.cloud"
+TESTNET_INDEXER_TOKEN = ""
+
+SNAPSHOT_MAGIC = b"EBESNAP1"
+SNAPSHOT_VERSION = 1
+
+# magic, version, round, row count, organizer count, vendor count, event JSON length
+HEADER = struct.Struct("<8sHQIIII")
+
+# Column sections in file order, each `count` items of the registry typecode
+COLUMN_ORDER = (
+    'app_id',
+    'deposit_amount',
+    'rental_fee',
+    'lease_start',
+    'lease_end',
+    'flags',
+    'organizer',
+    'vendor',
+    'event'
+)
+
+# Unassigned (warm-pool) escrows have no address; stored as 32 zero bytes
+EMPTY_ADDRESS_KEY = bytes(32)
+
+# Parallel application lookups during catch-up
+CATCH_UP_WORKERS = 16
+
+# Application calls per indexer page while scanning for changed escrows
+CATCH_UP_PAGE_SIZE = 1000
+
+
+def get_indexer_client():
+    """Create and return a rate-limited Indexer client for TestNet"""
+    return RateLimitedIndexerClient(
+        indexer_token=TESTNET_INDEXER_TOKEN,
+        indexer_address=TESTNET_INDEXER_ADDRESS
+    )
+
+
+def _le_bytes(column):
+    if sys.byteorder == "little":
+        return column.tobytes()
+    swapped = array(column.typecode, column)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def _address_table(addresses):
+    return b"".join(
+        encoding.decode_address(address) if address else EMPTY_ADDRESS_KEY
+        for address in addresses
+    )
+
+
+def _read_address_table(buffer, offset, count):
+    addresses = []
+    for i in range(count):
+        key = bytes(buffer[offset + 32 * i:offset + 32 * (i + 1)])
+        addresses.append(encoding.encode_address(key) if key != EMPTY_ADDRESS_KEY else '')
+    return addresses, offset + 32 * count
+
+
+def write_snapshot(path, registry, round_number):
+    """
+    Atomically write the registry to `path`
+
+    Args:
+        path: Snapshot file
+        registry: EscrowRegistry to save
+        round_number: Round the registry contents are valid at
+    """
+    organizers = registry.labels('organizer')
+    vendors = registry.labels('vendor')
+    events = json.dumps(registry.labels('event')).encode()
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(
+            SNAPSHOT_MAGIC,
+            SNAPSHOT_VERSION,
+            round_number,
+            len(registry),
+            len(organizers),
+            len(vendors),
+            len(events)
+        ))
+        for name in COLUMN_ORDER:
+            f.write(_le_bytes(registry.columns[name]))
+        f.write(_address_table(organizers))
+        f.write(_address_table(vendors))
+        f.write(events)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path):
+    """
+    Load a snapshot written by write_snapshot
+
+    Returns:
+        tuple: (EscrowRegistry, round_number)
+    """
+    registry = EscrowRegistry()
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        magic, version, round_number, count, n_organizers, n_vendors, events_length = (
+            HEADER.unpack_from(buffer, 0)
+        )
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {path}")
+
+        offset = HEADER.size
+        columns = {}
+        for name in COLUMN_ORDER:
+            column = array(registry.columns[name].typecode)
+            size = column.itemsize * count
+            column.frombytes(buffer[offset:offset + size])
+            if sys.byteorder != "little":
+                column.byteswap()
+            columns[name] = column
+            offset += size
+
+        organizers, offset = _read_address_table(buffer, offset, n_organizers)
+        vendors, offset = _read_address_table(buffer, offset, n_vendors)
+        events = json.loads(bytes(buffer[offset:offset + events_length]))
+
+    registry.load_columns(columns, {'organizer': organizers, 'vendor': vendors, 'event': events})
+    return registry, round_number
+
+
+def changed_app_ids(idx_client, app_ids, since_round):
+    """
+    Find tracked apps with application calls after `since_round`
+
+    Pages through every application call since the snapshot round and
+    keeps the tracked ones, so the number of requests depends on chain
+    activity rather than on the number of tracked escrows. Indexer errors
+    propagate; the snapshot is then left at its round for the next run.
+
+    Returns:
+        tuple: (set of changed app ids, indexer round the scan covers)
+    """
+    tracked = set(app_ids)
+    changed = set()
+    covered_round = None
+    next_page = None
+
+    while True:
+        response = idx_client.search_transactions(
+            txn_type='appl',
+            min_round=since_round + 1,
+            limit=CATCH_UP_PAGE_SIZE,
+            next_page=next_page
+        )
+        if covered_round is None:
+            # Later pages may reach past this round, never short of it
+            covered_round = response['current-round']
+
+        stack = list(response.get('transactions', []))
+        while stack:
+            # Matches may be inner calls, returned inside their root txn
+            txn = stack.pop()
+            app_id = txn.get('application-transaction', {}).get('application-id')
+            if app_id in tracked:
+                changed.add(app_id)
+            stack.extend(txn.get('inner-txns', []))
+
+        next_page = response.get('next-token')
+        if not next_page or len(response.get('transactions', [])) < CATCH_UP_PAGE_SIZE:
+            break
+
+    return changed, max(since_round, covered_round)
+
+
+def catch_up(registry, since_round, client=None, idx_client=None):
+    """
+    Refresh only the escrows touched since the snapshot round
+
+    Deleted apps are removed from the registry. Indexer errors propagate
+    from changed_app_ids before anything is changed.
+
+    Returns:
+        dict: {'round': int (round the registry is now valid at),
+               'updated': int, 'removed': int,
+               'failed': [{'app_id': int, 'error': str}]}
+    """
+    client = client or get_algod_client()
+    idx_client = idx_client or get_indexer_client()
+
+    changed, current_round = changed_app_ids(idx_client, registry.rows, since_round)
+
+    def fetch(app_id):
+        try:
+            params = client.application_info(app_id)['params']
+            return app_id, decode_global_state(params.get('global-state', [])), None
+        except AlgodHTTPError as e:
+            if e.code == 404:
+                return app_id, None, None
+            return app_id, None, str(e)
+        except Exception as e:
+            return app_id, None, str(e)
+
+    updated = removed = 0
+    failed = []
+    with ThreadPoolExecutor(max_workers=CATCH_UP_WORKERS) as pool:
+        for app_id, state, error in pool.map(fetch, sorted(changed)):
+            if error is not None:
+                failed.append({'app_id': app_id, 'error': error})
+            elif state is None:
+                registry.remove(app_id)
+                removed += 1
+            else:
+                registry.upsert(app_id, state)
+                updated += 1
+
+    # Stay at the snapshot round if anything is missing, so it is retried
+    round_number = since_round if failed else current_round
+
+    return {'round': round_number, 'updated': updated, 'removed': removed, 'failed': failed}
+
+
+def warm_start(path, client=None, idx_client=None):
+    """
+    Load a snapshot, catch up to the current round and rewrite it
+
+    Returns:
+        tuple: (EscrowRegistry, catch_up result)
+    """
+    registry, round_number = load_snapshot(path)
+    result = catch_up(registry, round_number, client, idx_client)
+    write_snapshot(path, registry, result['round'])
+    return registry, result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python -m contracts.snapshot <snapshot_file>")
+        sys.exit(1)
+
+    registry, result = warm_start(sys.argv[1])
+    print(json.dumps(dict(result, escrows=len(registry))))
@@ -0,0 +1,257 @@
+"""
+Sweeper for settled rental escrows
+Deletes escrow apps whose deposit is settled and fee released, closing each
+app account back to the deployer, and reports the ALGO reclaimed
+"""
+
+import os
+import sys
+import json
+from concurrent.futures import ThreadPoolExecutor
+from algosdk import account, mnemonic
+from algosdk.error import AlgodHTTPError
+from algosdk.transaction import ApplicationDeleteTxn, assign_group_id, wait_for_confirmation
+from algosdk.logic import get_application_address
+
+from contracts.deploy import chunked, escrow_state_schemas, get_algod_client
+from contracts.escrow_model import validate_action
+from contracts.fees import FeePolicy
+from contracts.interact import decode_global_state
+from contracts.warm_pool import WarmPool
+
+
+# Creator minimum-balance increase per app (protocol constants, microALGOs)
+APP_CREATE_MIN_BALANCE = 100_000
+SCHEMA_UINT_MIN_BALANCE = 28_500
+SCHEMA_BYTES_MIN_BALANCE = 50_000
+
+# Parallel application/account lookups when verifying candidates
+LOOKUP_WORKERS = 16
+
+
+def escrow_creator_min_balance():
+    """Minimum balance each deployed escrow adds to its creator"""
+    global_schema, _ = escrow_state_schemas()
+    return (
+        APP_CREATE_MIN_BALANCE
+        + SCHEMA_UINT_MIN_BALANCE * global_schema.num_uints
+        + SCHEMA_BYTES_MIN_BALANCE * global_schema.num_byte_slices
+    )
+
+
+def discover_escrows(client, creator_address, warm_pool=None):
+    """
+    List the apps `creator_address` has created, minus warm-pool escrows
+
+    Args:
+        client: Algod client
+        creator_address: Escrow deployer
+        warm_pool: Optional WarmPool whose escrows are excluded
+
+    Returns:
+        (list of app ids, bool include_unbound): unbound escrows are only
+        safe to delete when the pool is known and not refilling
+    """
+    exclude, refilling = warm_pool.sweep_exclusions() if warm_pool is not None else (set(), True)
+    created = client.account_info(creator_address).get('created-apps', [])
+    return [app['id'] for app in created if app['id'] not in exclude], not refilling
+
+
+def find_deletable_escrows(client, app_ids, creator_address, include_unbound=True):
+    """
+    Verify candidates on-chain: created by us and fully settled
+
+    Unbound escrows (never bound to a booking) are deletable too, unless
+    `include_unbound` is False.
+
+    Returns:
+        tuple: ([{'app_id': int, 'balance': int}] for deletable escrows,
+                [{'app_id': int, 'error': str}] for failed lookups)
+    """
+    def inspect(app_id):
+        try:
+            params = client.application_info(app_id)['params']
+            if params['creator'] != creator_address:
+                return None, None
+
+            state = decode_global_state(params.get('global-state', []))
+            if not validate_action(state, 'delete')['allowed']:
+                return None, None
+            if not include_unbound and state.get('organizer', '') == '':
+                return None, None
+
+            balance = client.account_info(get_application_address(app_id))['amount']
+            return {'app_id': app_id, 'balance': balance}, None
+        except AlgodHTTPError as e:
+            if e.code == 404:
+                return None, None  # already deleted
+            return None, {'app_id': app_id, 'error': f"Lookup failed: {str(e)}"}
+        except Exception as e:
+            return None, {'app_id': app_id, 'error': f"Lookup failed: {str(e)}"}
+
+    deletable, failed = [], []
+    with ThreadPoolExecutor(max_workers=LOOKUP_WORKERS) as pool:
+        for escrow, error in pool.map(inspect, app_ids):
+            if escrow:
+                deletable.append(escrow)
+            if error:
+                failed.append(error)
+    return deletable, failed
+
+
+def sweep_settled_escrows(deployer_mnemonic, app_ids=None, registry=None, warm_pool=None, client=None):
+    """
+    Delete settled escrows in atomic groups and reclaim their ALGO
+
+    Candidates come from `app_ids` or a registry's settled rows; with
+    neither, every app the deployer created is a candidate (see
+    discover_escrows), so the sweeper can run unattended. Candidates are
+    re-checked on-chain before deletion; a candidate that cannot be looked
+    up is reported in `failed` and fails the sweep. A failing group is retried one
+    escrow at a time so one bad app does not block the rest.
+
+    Args:
+        deployer_mnemonic: 25-word mnemonic of the escrow creator
+        app_ids: Candidate application IDs
+        registry: Optional EscrowRegistry; supplies candidates and has
+            deleted escrows removed
+        warm_pool: Optional WarmPool; when discovering candidates its
+            escrows are kept, and without it no unbound escrow is deleted
+        client: Optional Algod client (defaults to TestNet)
+
+    Returns:
+        dict: {
+            'success': bool,
+            'deleted': [int],
+            'failed': [{'app_id': int, 'error': str}],
+            'reclaimed_app_balances': int (microALGOs closed back to deployer),
+            'reclaimed_min_balance': int (creator minimum balance released),
+            'fees': int,
+            'net_reclaimed': int,
+            'error': str (if failed)
+        }
+    """
+    try:
+        client = client or get_algod_client()
+        fee_policy = FeePolicy(client)
+
+        deployer_private_key = mnemonic.to_private_key(deployer_mnemonic)
+        deployer_address = account.address_from_private_key(deployer_private_key)
+
+        include_unbound = True
+        if app_ids is None and registry is None:
+            candidates, include_unbound = discover_escrows(client, deployer_address, warm_pool)
+        else:
+            candidates = list(app_ids or [])
+            if registry is not None:
+                candidates.extend(registry.settled_app_ids())
+
+        escrows, failed = find_deletable_escrows(
+            client, sorted(set(candidates)), deployer_address, include_unbound=include_unbound
+        )
+        print(f"Found {len(escrows)} deletable escrows out of {len(set(candidates))} candidates")
+
+        params = client.suggested_params()
+
+        def submit(group):
+            txns = [
+                ApplicationDeleteTxn(sender=deployer_address, sp=params, index=escrow['app_id'])
+                for escrow in group
+            ]
+            # Each delete closes the app account with one inner payment
+            fee = fee_policy.apply(
+                txns, priority='background', inner_txns=len(txns), params=params,
+                operation='delete_escrow'
+            )
+            if len(txns) > 1:
+                assign_group_id(txns)
+            client.send_transactions([txn.sign(deployer_private_key) for txn in txns])
+            return txns[0].get_txid(), fee
+
+        # Submit every group before waiting on any of them
+        pending = []
+        for group in chunked(escrows):
+            try:
+                pending.append((group, *submit(group)))
+            except Exception as e:
+                pending.append((group, None, str(e)))
+
+        deleted = []
+        reclaimed_balances = 0
+        fees = 0
+
+        for group, tx_id, fee_or_error in pending:
+            try:
+                if tx_id is None:
+                    raise Exception(fee_or_error)
+                wait_for_confirmation(client, tx_id, 4)
+                confirmed = [(escrow, fee_or_error // len(group)) for escrow in group]
+            except Exception as e:
+                confirmed = []
+                if len(group) == 1:
+                    failed.append({'app_id': group[0]['app_id'], 'error': str(e)})
+                else:
+                    for escrow in group:
+                        try:
+                            single_tx_id, single_fee = submit([escrow])
+                            wait_for_confirmation(client, single_tx_id, 4)
+                            confirmed.append((escrow, single_fee))
+                        except Exception as single_error:
+                            failed.append({'app_id': escrow['app_id'], 'error': str(single_error)})
+
+            for escrow, fee in confirmed:
+                deleted.append(escrow['app_id'])
+                reclaimed_balances += escrow['balance']
+                fees += fee
+                if registry is not None and escrow['app_id'] in registry.rows:
+                    registry.remove(escrow['app_id'])
+
+        reclaimed_min_balance = escrow_creator_min_balance() * len(deleted)
+
+        print(f"✅ Deleted {len(deleted)} escrows, {len(failed)} failed")
+        print(f"   Reclaimed: {(reclaimed_balances + reclaimed_min_balance) / 1_000_000} ALGO")
+
+        return {
+            'success': not failed,
+            'deleted': deleted,
+            'failed': failed,
+            'reclaimed_app_balances': reclaimed_balances,
+            'reclaimed_min_balance': reclaimed_min_balance,
+            'fees': fees,
+            'net_reclaimed': reclaimed_balances + reclaimed_min_balance - fees
+        }
+
+    except Exception as e:
+        error_message = str(e)
+        print(f"❌ Sweep failed: {error_message}")
+        return {
+            'success': False,
+            'error': error_message
+        }
+
+
+if __name__ == "__main__":
+    deployer_mnemonic = os.getenv('ALGORAND_DEPLOYER_MNEMONIC')
+    args = sys.argv[1:]
+
+    if not deployer_mnemonic or args[:1] == ['--warm-pool'] and len(args) < 2:
+        print(
+            "Usage: ALGORAND_DEPLOYER_MNEMONIC=... python -m contracts.sweeper "
+            "[--warm-pool <state_file>] [<app_id> ...]"
+        )
+        print("Without app ids, every app the deployer created is checked")
+        sys.exit(1)
+
+    warm_pool = None
+    if args[:1] == ['--warm-pool']:
+        warm_pool = WarmPool(args[1], deployer_mnemonic)
+        args = args[2:]
+
+    result = sweep_settled_escrows(
+        deployer_mnemonic,
+        app_ids=[int(arg) for arg in args] or None,
+        warm_pool=warm_pool
+    )
+
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result['success'] else 1)
@@ -0,0 +1,334 @@
+"""
+Optimization layer for our PyTeal contracts
+StateCache tests 0/1 state flags directly instead of comparing them,
+compile_optimized pools constants into shared intcblock/bytecblock entries,
+and method_report gives before/after opcode cost and program size for every
+handler
+"""
+
+import re
+import sys
+import base64
+from collections import Counter
+
+from pyteal import (
+    App,
+    Bytes,
+    Int,
+    Mode,
+    Not,
+    OptimizeOptions,
+    compileTeal
+)
+
+
+TEAL_VERSION = 10
+
+# The assembler stores these many constants per block in 1-byte
+# intc_N/bytec_N references; later ones take intc/bytec with an immediate
+SHORT_CONSTANT_REFS = 4
+
+# Encoded size of opcodes with immediates (every other opcode is one byte)
+OPCODE_SIZES = {
+    'txn': 2, 'global': 2, 'load': 2, 'store': 2, 'intc': 2, 'bytec': 2,
+    'itxn_field': 2, 'gtxns': 2, 'txnas': 2, 'dig': 2, 'bury': 2, 'cover': 2,
+    'uncover': 2, 'frame_dig': 2, 'frame_bury': 2, 'popn': 2, 'dupn': 2,
+    'gtxn': 3, 'txna': 3, 'gtxnsa': 3, 'proto': 3, 'extract': 3, 'substring': 3,
+    'gtxna': 4,
+    'b': 3, 'bz': 3, 'bnz': 3, 'callsub': 3,
+}
+
+# Opcodes that end a path through the program
+TERMINAL_OPCODES = ('return', 'err', 'retsub')
+
+# Opcode followed by a quoted string immediate, which may itself contain "//"
+STRING_IMMEDIATE = re.compile(r'^(\S+)\s+("(?:[^"\\]|\\.)*")')
+
+
+class StateCache:
+    """
+    Global-state access for the escrow handlers
+
+    Flags hold 0 or 1, so is_set/is_clear test the value itself (or its
+    negation) rather than comparing it with 1 or 0, two opcodes less per
+    test. With `enabled=False` every access compiles exactly as the
+    unoptimized App.globalGet/globalPut form.
+
+    State reads are not cached in scratch space: with pooled constants a
+    read is `bytec_N; app_global_get`, and a scratch copy costs three
+    opcodes plus a `load` per read, so it only pays from the fourth read
+    of a key on one path, which no escrow handler makes.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+
+    def get(self, key):
+        """Read global state `key` (a str)"""
+        return App.globalGet(Bytes(key))
+
+    def put(self, key, value):
+        """Write global state `key`"""
+        return App.globalPut(Bytes(key), value)
+
+    def is_set(self, key):
+        """True if 0/1 flag `key` is set"""
+        if not self.enabled:
+            return self.get(key) == Int(1)
+        return self.get(key)
+
+    def is_clear(self, key):
+        """True if 0/1 flag `key` is clear"""
+        if not self.enabled:
+            return self.get(key) == Int(0)
+        return Not(self.get(key))
+
+
+def compile_plain(program):
+    """Compile an application program without constant pooling"""
+    return compileTeal(program, mode=Mode.Application, version=TEAL_VERSION)
+
+
+def compile_optimized(program):
+    """
+    Compile an application program with shared constant blocks
+
+    Repeated ints and byte strings (state keys above all) are assembled
+    into one intcblock/bytecblock and referenced by index, and unused
+    scratch stores are dropped.
+    """
+    return compileTeal(
+        program,
+        mode=Mode.Application,
+        version=TEAL_VERSION,
+        assembleConstants=True,
+        optimize=OptimizeOptions(scratch_slots=True)
+    )
+
+
+def _instructions(teal):
+    """Yield (opcode, args) for each instruction, and (label, None) for labels"""
+    for line in teal.splitlines():
+        line = line.strip()
+        match = STRING_IMMEDIATE.match(line)
+        if match:
+            yield match.group(1), match.group(2)
+            continue
+        line = line.split("//", 1)[0].strip()
+        if not line or line.startswith("#pragma"):
+            continue
+        if line.endswith(":") and " " not in line:
+            yield line[:-1], None
+        else:
+            opcode, _, args = line.partition(" ")
+            yield opcode, args.strip()
+
+
+def _varuint_size(value):
+    size = 1
+    while value >= 0x80:
+        value >>= 7
+        size += 1
+    return size
+
+
+def _bytes_length(literal):
+    if literal.startswith("0x"):
+        return (len(literal) - 2) // 2
+    if literal.startswith('"'):
+        return len(literal[1:-1].encode('latin-1', 'backslashreplace').decode('unicode_escape').encode('latin-1'))
+    return 32  # addr / base32 / base64 forms used by PyTeal are 32-byte keys
+
+
+def _pooled_size(refs, entry_size):
+    """
+    Bytes the assembler spends on constants written as `int`/`byte`
+
+    Constants used more than once go into one block, most used first,
+    and are referenced by index; a constant used once is pushed inline.
+    """
+    pooled = sorted((count for count in refs.values() if count > 1), reverse=True)
+    entries = [key for key, count in refs.items() if count > 1]
+    size = sum(1 + entry_size(key) for key, count in refs.items() if count == 1)
+    if pooled:
+        size += 1 + _varuint_size(len(entries)) + sum(entry_size(key) for key in entries)
+        size += sum(
+            count * (1 if index < SHORT_CONSTANT_REFS else 2)
+            for index, count in enumerate(pooled)
+        )
+    return size
+
+
+def _int_entry_size(literal):
+    return _varuint_size(int(literal)) if literal.isdigit() else 1  # named ints are small
+
+
+def _bytes_entry_size(key):
+    opcode, literal = key
+    length = 32 if opcode == 'addr' else _bytes_length(literal)
+    return _varuint_size(length) + length
+
+
+def program_size(teal):
+    """
+    Estimate the assembled size of a TEAL program in bytes
+
+    `int`/`byte`/`addr` pseudo-ops are sized the way the assembler
+    encodes them, pooling repeated constants into its own
+    intcblock/bytecblock, so plain and pre-pooled programs compare fairly.
+    Use algod's compile endpoint for the exact figure.
+    """
+    size = 1  # version byte
+    int_refs, byte_refs = Counter(), Counter()
+    for opcode, args in _instructions(teal):
+        if args is None:
+            continue
+        if opcode == 'int':
+            int_refs[args] += 1
+        elif opcode in ('byte', 'addr'):
+            byte_refs[(opcode, args)] += 1
+        elif opcode == 'pushint':
+            size += 1 + _varuint_size(int(args))
+        elif opcode == 'pushbytes':
+            size += 1 + _bytes_entry_size((opcode, args))
+        elif opcode == 'intcblock':
+            values = [int(v) for v in args.split()]
+            size += 1 + _varuint_size(len(values)) + sum(_varuint_size(v) for v in values)
+        elif opcode == 'bytecblock':
+            lengths = [_bytes_length(v) for v in args.split()]
+            size += 1 + _varuint_size(len(lengths)) + sum(_varuint_size(n) + n for n in lengths)
+        else:
+            size += OPCODE_SIZES.get(opcode, 1)
+    return size + _pooled_size(int_refs, _int_entry_size) + _pooled_size(byte_refs, _bytes_entry_size)
+
+
+def program_cost(teal):
+    """
+    Worst-case opcode cost of any path through a TEAL program
+
+    Every opcode in the contracts costs 1, including the intcblock and
+    bytecblock the assembler prepends when it pools `int`/`byte`
+    constants. PyTeal only branches forward, so the longest path is found
+    with one memoized walk.
+    """
+    code = []
+    labels = {}
+    int_refs, byte_refs = Counter(), Counter()
+    for opcode, args in _instructions(teal):
+        if args is None:
+            labels[opcode] = len(code)
+        else:
+            code.append((opcode, args))
+            if opcode == 'int':
+                int_refs[args] += 1
+            elif opcode in ('byte', 'addr'):
+                byte_refs[(opcode, args)] += 1
+    assembler_blocks = sum(
+        1 for refs in (int_refs, byte_refs) if any(count > 1 for count in refs.values())
+    )
+
+    costs = {}
+
+    def cost_from(pc, depth=0):
+        if pc >= len(code):
+            return 0
+        if pc in costs:
+            return costs[pc]
+        if depth > len(code):
+            raise ValueError("TEAL program contains a loop")
+
+        opcode, args = code[pc]
+        if opcode in TERMINAL_OPCODES:
+            cost = 1
+        elif opcode == 'b':
+            cost = 1 + cost_from(labels[args], depth + 1)
+        elif opcode in ('bz', 'bnz'):
+            cost = 1 + max(cost_from(pc + 1, depth + 1), cost_from(labels[args], depth + 1))
+        elif opcode == 'callsub':
+            cost = 1 + cost_from(labels[args], depth + 1) + cost_from(pc + 1, depth + 1)
+        else:
+            cost = 1 + cost_from(pc + 1, depth + 1)
+
+        costs[pc] = cost
+        return cost
+
+    return assembler_blocks + cost_from(0)
+
+
+def _compiled_size(client, teal):
+    return len(base64.b64decode(client.compile(teal)['result']))
+
+
+def method_report(build_handlers, build_program, client=None):
+    """
+    Before/after opcode cost and size of every handler and the program
+
+    The baseline is the plain program as the assembler encodes it, i.e.
+    with the assembler's own constant pooling (see program_size).
+
+    Args:
+        build_handlers: Callable(optimize: bool) -> {method: Expr}
+        build_program: Callable(optimize: bool) -> Expr
+        client: Optional Algod client; if given, every size is also
+            measured exactly with algod's compile endpoint
+
+    Handler costs are for the handler alone, without the router.
+
+    Returns:
+        dict: {
+            'methods': {method: {'cost_before', 'cost_after', 'size_before', 'size_after',
+                                 'compiled_size_before', 'compiled_size_after' (with client)}},
+            'program': same fields,
+            'cost_rose': [name] (handlers, or '(program)', whose worst-case cost went up)
+        }
+    """
+    def row(plain, optimized):
+        entry = {
+            'cost_before': program_cost(plain),
+            'cost_after': program_cost(optimized),
+            'size_before': program_size(plain),
+            'size_after': program_size(optimized)
+        }
+        if client is not None:
+            entry['compiled_size_before'] = _compiled_size(client, plain)
+            entry['compiled_size_after'] = _compiled_size(client, optimized)
+        return entry
+
+    before = build_handlers(False)
+    after = build_handlers(True)
+    methods = {
+        name: row(compile_plain(before[name]), compile_optimized(after[name]))
+        for name in before
+    }
+    program = row(compile_plain(build_program(False)), compile_optimized(build_program(True)))
+
+    cost_rose = [
+        name for name, entry in list(methods.items()) + [('(program)', program)]
+        if entry['cost_after'] > entry['cost_before']
+    ]
+    return {'methods': methods, 'program': program, 'cost_rose': cost_rose}
+
+
+if __name__ == "__main__":
+    from contracts.deploy import get_algod_client
+    from contracts.rental_escrow import approval_handlers, approval_program
+
+    client = get_algod_client() if "--compile" in sys.argv else None
+    report = method_report(approval_handlers, approval_program, client)
+    size_field = 'compiled_size' if client is not None else 'size'
+
+    print(f"{'method':<14}{'cost':>14}{'size (bytes)':>18}")
+    for name, row in list(report['methods'].items()) + [('(program)', report['program'])]:
+        print(
+            f"{name:<14}"
+            f"{row['cost_before']:>6} -> {row['cost_after']:<5}"
+            f"{row[size_field + '_before']:>8} -> {row[size_field + '_after']:<5}"
+        )
+    print(
+        "sizes: compiled by algod" if client is not None
+        else "sizes: estimated with the assembler's constant pooling (--compile for exact)"
+    )
+    if report['cost_rose']:
+        print(f"worst-case cost rose for: {', '.join(report['cost_rose'])}")
+    else:
+        print("worst-case cost rose for no handler")
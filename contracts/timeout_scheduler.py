@@ -0,0 +1,360 @@
+"""
+Scheduler for rental escrow timeout claims
+Keeps tracked escrows in a priority queue keyed by the time they become
+claimable (lease_end + 30 days, compared against the latest block timestamp)
+and submits the due claims in batches
+"""
+
+import os
+import sys
+import json
+import time
+import heapq
+from algosdk import account, mnemonic
+from algosdk.error import AlgodHTTPError
+from algosdk.transaction import ApplicationCallTxn, OnComplete, wait_for_confirmation
+
+from contracts.escrow_model import TIMEOUT_GRACE_PERIOD, validate_action
+from contracts.escrow_registry import SETTLED
+from contracts.fees import FeePolicy
+from contracts.interact import decode_global_state
+from contracts.rate_limit import is_transient, shared_client
+
+
+# Algorand TestNet configuration (AlgoNode public API)
+TESTNET_ALGOD_ADDRESS = "https://testnet-api.algonode.cloud"
+TESTNET_ALGOD_TOKEN = ""
+
+# Claims submitted before waiting for confirmations
+CLAIM_BATCH_SIZE = 64
+
+# Seconds before a claim that failed transiently (network, rate limit,
+# confirmation timeout) is attempted again
+RETRY_DELAY = 600
+
+# Longest single sleep, so newly tracked escrows and clock drift are noticed
+MAX_SLEEP = 300
+
+# Seconds between re-discovering escrows from the deployer or registry
+DISCOVER_INTERVAL = 3600
+
+
+def get_algod_client():
+    """Return the shared rate-limited Algod client for TestNet"""
+    return shared_client(TESTNET_ALGOD_TOKEN, TESTNET_ALGOD_ADDRESS)
+
+
+def get_chain_time(client):
+    """
+    Return the timestamp of the latest block
+
+    This is what Global.latest_timestamp reports to the contract, and any
+    later block has a timestamp at least as large.
+    """
+    last_round = client.status()['last-round']
+    return client.block_info(last_round)['block']['ts']
+
+
+class TimeoutScheduler:
+    """
+    Priority queue of escrows ordered by timeout eligibility time
+
+    Heap entries are (eligible_at, app_id). Untracking or rescheduling an
+    escrow leaves its old heap entry in place; stale entries are skipped
+    when popped by comparing against `self.escrows`.
+    """
+
+    def __init__(self, state_path, signer_mnemonics=(), client=None):
+        """
+        Args:
+            state_path: JSON file holding tracked escrows between restarts
+            signer_mnemonics: 25-word mnemonics of the vendors to claim for
+            client: Optional Algod client (defaults to TestNet)
+        """
+        self.state_path = state_path
+        self.client = client or get_algod_client()
+        self.fee_policy = FeePolicy(self.client)
+        self.signers = {}
+        for vendor_mnemonic in signer_mnemonics:
+            private_key = mnemonic.to_private_key(vendor_mnemonic)
+            self.signers[account.address_from_private_key(private_key)] = private_key
+
+        # app_id -> {'vendor': str, 'lease_end': int, 'eligible_at': int}
+        self.escrows = {}
+        self.heap = []
+        self.load()
+
+    def load(self):
+        """Load tracked escrows and rebuild the heap in O(n)"""
+        if not os.path.exists(self.state_path):
+            return
+
+        with open(self.state_path, "r") as f:
+            saved = json.load(f)
+
+        self.escrows = {int(app_id): entry for app_id, entry in saved['escrows'].items()}
+        self.heap = [(entry['eligible_at'], app_id) for app_id, entry in self.escrows.items()]
+        heapq.heapify(self.heap)
+
+    def save(self):
+        """Atomically persist tracked escrows"""
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({'escrows': self.escrows}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def track(self, app_id, vendor_addr, lease_end):
+        """Start tracking an escrow (re-tracking updates its deadline)"""
+        eligible_at = lease_end + TIMEOUT_GRACE_PERIOD
+        self.escrows[app_id] = {
+            'vendor': vendor_addr,
+            'lease_end': lease_end,
+            'eligible_at': eligible_at
+        }
+        heapq.heappush(self.heap, (eligible_at, app_id))
+
+    def discover(self, creator_address=None, registry=None):
+        """
+        Track every bound, unsettled escrow the deployer created or a
+        registry holds
+
+        Escrows already tracked keep their schedule (including a pending
+        retry) unless their vendor or lease_end changed.
+
+        Args:
+            creator_address: Escrow deployer; its created apps are read
+                from algod in one account_info call
+            registry: Optional EscrowRegistry to read escrows from
+
+        Returns:
+            int: Number of escrows newly tracked
+        """
+        found = {}
+        if registry is not None:
+            organizers = registry.labels('organizer')
+            vendors = registry.labels('vendor')
+            for app_id in registry.app_ids(registry.select(flags_clear=SETTLED)):
+                row = registry.rows[app_id]
+                organizer = registry.columns['organizer'][row]
+                if organizer < 0 or organizers[organizer] == '':
+                    continue
+                found[app_id] = (vendors[registry.columns['vendor'][row]], registry.columns['lease_end'][row])
+
+        if creator_address is not None:
+            for app in self.client.account_info(creator_address).get('created-apps', []):
+                state = decode_global_state(app['params'].get('global-state', []))
+                if state.get('organizer', '') != '' and state.get('settled', 0) == 0:
+                    found[app['id']] = (state['vendor'], state['lease_end'])
+
+        added = 0
+        for app_id, (vendor, lease_end) in found.items():
+            entry = self.escrows.get(app_id)
+            if entry is None:
+                added += 1
+            elif entry['vendor'] == vendor and entry['lease_end'] == lease_end:
+                continue
+            self.track(app_id, vendor, lease_end)
+        return added
+
+    def untrack(self, app_id):
+        """Stop tracking an escrow, e.g. once it settled normally"""
+        self.escrows.pop(app_id, None)
+
+    def next_deadline(self):
+        """Return the earliest pending eligibility time, or None"""
+        while self.heap:
+            eligible_at, app_id = self.heap[0]
+            entry = self.escrows.get(app_id)
+            if entry is not None and entry['eligible_at'] == eligible_at:
+                return eligible_at
+            heapq.heappop(self.heap)
+        return None
+
+    def pop_due(self, now):
+        """Remove and return app ids eligible at chain time `now`"""
+        due = []
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                return due
+            due.append(heapq.heappop(self.heap)[1])
+
+    def _reschedule(self, app_id, eligible_at):
+        self.escrows[app_id]['eligible_at'] = eligible_at
+        heapq.heappush(self.heap, (eligible_at, app_id))
+
+    def _precheck(self, app_id, vendor, now):
+        """
+        Read the escrow's state and check the claim would be accepted
+
+        Returns:
+            None if the claim should be sent, else (outcome, detail) with
+            outcome 'untrack' (will never succeed), 'retry' (transient read
+            failure) or 'rescheduled' (lease_end moved)
+        """
+        try:
+            info = self.client.application_info(app_id)
+        except Exception as e:
+            if isinstance(e, AlgodHTTPError) and e.code == 404:
+                return 'untrack', 'deleted'
+            return ('retry', str(e)) if is_transient(e) else ('untrack', str(e))
+
+        state = decode_global_state(info['params'].get('global-state', []))
+        verdict = validate_action(state, 'timeout', sender=vendor, now=now)
+        if verdict['allowed']:
+            return None
+        if verdict['reason'] == 'timeout_not_reached':
+            self.track(app_id, vendor, state['lease_end'])
+            return 'rescheduled', verdict['reason']
+        return 'untrack', verdict['reason']
+
+    def _failed(self, app_id, error, now, failed, untracked):
+        """Retry a failed claim later only if the failure was transient"""
+        if is_transient(error):
+            failed.append({'app_id': app_id, 'error': str(error)})
+            self._reschedule(app_id, now + RETRY_DELAY)
+        else:
+            untracked.append({'app_id': app_id, 'reason': 'rejected', 'error': str(error)})
+            self.untrack(app_id)
+
+    def submit_claims(self, app_ids, now):
+        """
+        Submit timeout claims for due escrows in pipelined batches
+
+        Each escrow's current state is checked with escrow_model first:
+        escrows that settled normally (or were deleted, or changed vendor)
+        are untracked instead of claimed. Only transient failures are
+        retried; a rejected claim is untracked. Escrows whose vendor has no
+        signer here stay tracked and are reported again every RETRY_DELAY.
+
+        Returns:
+            dict: {
+                'claimed': [{'app_id': int, 'tx_id': str}],
+                'failed': [{'app_id': int, 'error': str}] (retried later),
+                'untracked': [{'app_id': int, 'reason': str, 'error': str}],
+                'no_signer': [{'app_id': int, 'vendor': str}] (retried later)
+            }
+        """
+        claimed, failed, untracked, no_signer = [], [], [], []
+
+        for start in range(0, len(app_ids), CLAIM_BATCH_SIZE):
+            batch = app_ids[start:start + CLAIM_BATCH_SIZE]
+            params = self.client.suggested_params()
+
+            submitted = []
+            for app_id in batch:
+                vendor = self.escrows[app_id]['vendor']
+                private_key = self.signers.get(vendor)
+                if private_key is None:
+                    no_signer.append({'app_id': app_id, 'vendor': vendor})
+                    self._reschedule(app_id, now + RETRY_DELAY)
+                    continue
+
+                rejected = self._precheck(app_id, vendor, now)
+                if rejected is not None:
+                    outcome, detail = rejected
+                    if outcome == 'untrack':
+                        untracked.append({'app_id': app_id, 'reason': detail})
+                        self.untrack(app_id)
+                    elif outcome == 'retry':
+                        failed.append({'app_id': app_id, 'error': detail})
+                        self._reschedule(app_id, now + RETRY_DELAY)
+                    continue
+
+                txn = ApplicationCallTxn(
+                    sender=vendor,
+                    sp=params,
+                    index=app_id,
+                    on_complete=OnComplete.NoOpOC,
+                    app_args=[b"timeout"]
+                )
+                # Also covers the inner close-out payment
+                self.fee_policy.apply(
+                    [txn], priority='background', inner_txns=1, params=params,
+                    operation='timeout_claim'
+                )
+                try:
+                    tx_id = self.client.send_transaction(txn.sign(private_key))
+                    submitted.append((app_id, tx_id))
+                except Exception as e:
+                    self._failed(app_id, e, now, failed, untracked)
+
+            for app_id, tx_id in submitted:
+                try:
+                    wait_for_confirmation(self.client, tx_id, 4)
+                    claimed.append({'app_id': app_id, 'tx_id': tx_id})
+                    self.untrack(app_id)
+                except Exception as e:
+                    self._failed(app_id, e, now, failed, untracked)
+
+        return {'claimed': claimed, 'failed': failed, 'untracked': untracked, 'no_signer': no_signer}
+
+    def run_once(self):
+        """
+        Claim every escrow that is due at the current chain time
+
+        Returns:
+            dict: submit_claims result plus 'chain_time' and 'fees'
+        """
+        now = get_chain_time(self.client)
+        result = self.submit_claims(self.pop_due(now), now)
+        self.save()
+        result['chain_time'] = now
+        result['fees'] = self.fee_policy.report()
+        return result
+
+    def run_forever(self, creator_address=None, registry=None, discover_interval=DISCOVER_INTERVAL):
+        """
+        Sleep until the next deadline passes, then claim what is due
+
+        With a creator address or registry, escrows are (re-)discovered
+        from it every `discover_interval` seconds.
+        """
+        discovered_at = None
+        while True:
+            if (creator_address is not None or registry is not None) and (
+                discovered_at is None or time.monotonic() - discovered_at >= discover_interval
+            ):
+                try:
+                    added = self.discover(creator_address, registry)
+                    self.save()
+                    print(json.dumps({'discovered': added, 'tracked': len(self.escrows)}))
+                except Exception as e:
+                    print(f"❌ Escrow discovery failed: {e}")
+                discovered_at = time.monotonic()
+
+            deadline = self.next_deadline()
+            if deadline is not None:
+                now = get_chain_time(self.client)
+                if deadline <= now:
+                    result = self.run_once()
+                    print(json.dumps(result))
+                    continue
+                wait = min(deadline - now, MAX_SLEEP)
+            else:
+                wait = MAX_SLEEP
+            if discovered_at is not None:
+                wait = min(wait, max(0, discovered_at + discover_interval - time.monotonic()))
+            time.sleep(wait)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python -m contracts.timeout_scheduler <state_file>")
+        sys.exit(1)
+
+    vendor_mnemonic = os.getenv('ALGORAND_VENDOR_MNEMONIC')
+    if not vendor_mnemonic:
+        print("Error: ALGORAND_VENDOR_MNEMONIC environment variable not set")
+        sys.exit(1)
+
+    # Escrows are discovered from the apps the deployer created
+    deployer_mnemonic = os.getenv('ALGORAND_DEPLOYER_MNEMONIC')
+    if not deployer_mnemonic:
+        print("Error: ALGORAND_DEPLOYER_MNEMONIC environment variable not set")
+        sys.exit(1)
+    creator_address = account.address_from_private_key(mnemonic.to_private_key(deployer_mnemonic))
+
+    scheduler = TimeoutScheduler(sys.argv[1], signer_mnemonics=[vendor_mnemonic])
+    print(f"Tracking {len(scheduler.escrows)} escrows before discovery")
+    scheduler.run_forever(creator_address=creator_address)
@@ -0,0 +1,226 @@
+"""
+Batch builder for unsigned transactions handed to wallets for signing
+Builds opt-ins, deposit groups and delivery/return calls from shared params
+and submits the signed results back in bulk
+"""
+
+import sys
+import json
+import time
+import base64
+from algosdk import encoding
+from algosdk.transaction import (
+    ApplicationCallTxn,
+    AssetTransferTxn,
+    PaymentTxn,
+    OnComplete,
+    assign_group_id,
+    wait_for_confirmation
+)
+from algosdk.logic import get_application_address
+
+from contracts.deploy import MAX_GROUP_SIZE, chunked
+from contracts.rate_limit import shared_client
+
+
+# Algorand TestNet configuration
+TESTNET_ALGOD_ADDRESS = "https://testnet-api.algonode.cloud"
+TESTNET_ALGOD_TOKEN = ""
+
+# Suggested params change once per round (~3s); reuse them briefly
+PARAMS_CACHE_TTL = 10
+
+# id(client) -> (client, params, fetched_at); the client is kept so its id
+# cannot be reused by another client while the entry exists
+_params_cache = {}
+
+
+def get_algod_client():
+    """Return the shared rate-limited Algod client for TestNet"""
+    return shared_client(TESTNET_ALGOD_TOKEN, TESTNET_ALGOD_ADDRESS)
+
+
+def get_cached_params(client, max_age=PARAMS_CACHE_TTL):
+    """
+    Return suggested params, refetching only when the cached copy is stale
+
+    Params are cached per client, so clients for different nodes or
+    networks never see each other's params.
+
+    Args:
+        client: Algod client
+        max_age: Maximum age of cached params in seconds
+
+    Returns:
+        SuggestedParams
+    """
+    now = time.monotonic()
+    entry = _params_cache.get(id(client))
+    if entry is None or entry[0] is not client or now - entry[2] > max_age:
+        entry = _params_cache[id(client)] = (client, client.suggested_params(), now)
+    return entry[1]
+
+
+def _app_call(sender, params, app_id, method):
+    return ApplicationCallTxn(
+        sender=sender,
+        sp=params,
+        index=app_id,
+        on_complete=OnComplete.NoOpOC,
+        app_args=[method]
+    )
+
+
+def _build_request(request, params):
+    """
+    Build the transactions for a single request
+
+    Returns:
+        list: One list of transactions per group (a single txn is a group of one)
+    """
+    request_type = request['type']
+    sender = request['address']
+
+    if request_type == 'opt_in':
+        # Opt-ins for several ASAs share one group so the wallet signs once
+        txns = [
+            AssetTransferTxn(
+                sender=sender,
+                sp=params,
+                receiver=sender,
+                amt=0,
+                index=int(asa_id)
+            )
+            for asa_id in request['asa_ids']
+        ]
+        return chunked(txns, MAX_GROUP_SIZE)
+
+    if request_type == 'deposit':
+        # Same [App call, Payment] layout as interact.pay_deposit
+        app_id = int(request['app_id'])
+        return [[
+            _app_call(sender, params, app_id, b"deposit"),
+            PaymentTxn(
+                sender=sender,
+                sp=params,
+                receiver=get_application_address(app_id),
+                amt=int(request['deposit_amount']) + int(request['rental_fee'])
+            )
+        ]]
+
+    if request_type in ('delivery', 'return'):
+        return [[_app_call(sender, params, int(request['app_id']), request_type.encode())]]
+
+    raise ValueError(f"Unknown request type: {request_type}")
+
+
+def build_unsigned_transactions(requests, client=None):
+    """
+    Build unsigned transactions for many requests from one set of params
+
+    Args:
+        requests: List of dicts, each with 'type' and 'address':
+            - {'type': 'opt_in', 'address', 'asa_ids': [int]}
+            - {'type': 'deposit', 'address', 'app_id', 'deposit_amount', 'rental_fee'}
+            - {'type': 'delivery' | 'return', 'address', 'app_id'}
+        client: Optional Algod client (defaults to TestNet)
+
+    Returns:
+        dict: {
+            'success': bool,
+            'groups': [{'request': int, 'txns': [str (base64 msgpack)]}],
+            'txn_count': int,
+            'error': str (if failed)
+        }
+    """
+    try:
+        client = client or get_algod_client()
+        params = get_cached_params(client)
+
+        groups = []
+        txn_count = 0
+        for index, request in enumerate(requests):
+            for txns in _build_request(request, params):
+                if len(txns) > 1:
+                    assign_group_id(txns)
+                groups.append({
+                    'request': index,
+                    'txns': [encoding.msgpack_encode(txn) for txn in txns]
+                })
+                txn_count += len(txns)
+
+        return {
+            'success': True,
+            'groups': groups,
+            'txn_count': txn_count
+        }
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f'Failed to build transactions: {str(e)}'
+        }
+
+
+def submit_signed_transactions(signed_groups, client=None, wait=True):
+    """
+    Submit wallet-signed groups in bulk
+
+    Every group is sent before any confirmation wait, so N groups cost one
+    round of waiting rather than N. A failing group does not stop the others.
+
+    Args:
+        signed_groups: List of groups, each a list of base64 msgpack signed txns
+        client: Optional Algod client (defaults to TestNet)
+        wait: Wait for confirmation of every submitted group
+
+    Returns:
+        dict: {
+            'success': bool (True if every group succeeded),
+            'results': [{'success': bool, 'tx_id': str, 'error': str}]
+        }
+    """
+    client = client or get_algod_client()
+
+    results = []
+    for signed_txns in signed_groups:
+        try:
+            raw_group = b"".join(base64.b64decode(stxn) for stxn in signed_txns)
+            tx_id = encoding.msgpack_decode(signed_txns[0]).get_txid()
+            client.send_raw_transaction(base64.b64encode(raw_group).decode())
+            results.append({'success': True, 'tx_id': tx_id})
+        except Exception as e:
+            results.append({'success': False, 'error': str(e)})
+
+    if wait:
+        for result in results:
+            if not result['success']:
+                continue
+            try:
+                wait_for_confirmation(client, result['tx_id'], 4)
+            except Exception as e:
+                result['success'] = False
+                result['error'] = str(e)
+
+    return {
+        'success': all(result['success'] for result in results),
+        'results': results
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ('build', 'submit'):
+        print(json.dumps({
+            'success': False,
+            'error': 'Usage: python -m contracts.txn_builder <build|submit> < input.json'
+        }))
+        sys.exit(1)
+
+    payload = json.load(sys.stdin)
+
+    if sys.argv[1] == 'build':
+        result = build_unsigned_transactions(payload['requests'])
+    else:
+        result = submit_signed_transactions(payload['groups'])
+
+    print(json.dumps(result))
+    sys.exit(0 if result['success'] else 1)
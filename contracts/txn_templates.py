@@ -0,0 +1,378 @@
+"""
+Pre-encoded transaction templates for high-volume calls
+Each operation's constant fields (type, genesis, app args, ...) are msgpack
+encoded once; only sender, validity window, fee, app or asset id, amount,
+receiver and group are encoded per call, and the result is hashed and
+signed directly without building algosdk transaction objects.
+`python -m contracts.txn_templates` benchmarks both paths in tx/s per core
+"""
+
+import sys
+import time
+import base64
+import struct
+from functools import lru_cache
+import msgpack
+from nacl.signing import SigningKey
+from algosdk import account, constants, encoding
+from algosdk.logic import get_application_address
+from algosdk.transaction import (
+    ApplicationCallTxn,
+    AssetTransferTxn,
+    PaymentTxn,
+    OnComplete,
+    SuggestedParams,
+    assign_group_id
+)
+
+
+# Fields holding raw bytes (addresses, group id); every other variable field
+# is an unsigned integer
+BYTES_FIELDS = ('snd', 'rcv', 'arcv', 'grp')
+
+# Fields patched per call, per transaction type
+PAYMENT_FIELDS = ('snd', 'fee', 'fv', 'lv', 'rcv', 'amt', 'grp')
+ASSET_TRANSFER_FIELDS = ('snd', 'fee', 'fv', 'lv', 'arcv', 'aamt', 'xaid', 'grp')
+APP_CALL_FIELDS = ('snd', 'fee', 'fv', 'lv', 'apid', 'grp')
+
+# Encoded size a signature adds around a transaction ({"sig": .., "txn": ..}),
+# as used by algosdk's per-byte fee estimate
+SIGNATURE_OVERHEAD = 75
+
+ZERO_ADDRESS = encoding.encode_address(bytes(32))
+
+_SIG_KEY = msgpack.packb("sig") + b"\xc4\x40"
+_SGNR_KEY = msgpack.packb("sgnr")
+_TXN_KEY = msgpack.packb("txn")
+
+_templates = {}
+
+
+def _pack_uint(value):
+    """Minimal msgpack encoding of a non-negative int, as msgpack.packb does"""
+    if value < 0x80:
+        return bytes((value,))
+    if value <= 0xFF:
+        return b"\xcc" + bytes((value,))
+    if value <= 0xFFFF:
+        return b"\xcd" + struct.pack(">H", value)
+    if value <= 0xFFFFFFFF:
+        return b"\xce" + struct.pack(">I", value)
+    return b"\xcf" + struct.pack(">Q", value)
+
+
+def _pack_bytes(value):
+    return b"\xc4" + bytes((len(value),)) + value
+
+
+@lru_cache(maxsize=4096)
+def _public_key(address):
+    return encoding.decode_address(address)
+
+
+@lru_cache(maxsize=256)
+def _signing_key(private_key):
+    raw = base64.b64decode(private_key)
+    return SigningKey(raw[:constants.key_len_bytes]), raw[constants.key_len_bytes:]
+
+
+def _txid(txn_bytes):
+    return encoding.checksum(constants.txid_prefix + txn_bytes)
+
+
+class TxnTemplate:
+    """
+    Canonical msgpack encoding of one transaction shape
+
+    The constant fields of `prototype` are encoded once, in the sorted key
+    order algod expects. Variable fields cannot be patched in place: ints
+    are encoded at their minimal width and zero values are left out of the
+    map entirely, so encode() joins the pre-encoded runs with freshly
+    encoded variable fields instead.
+    """
+
+    def __init__(self, prototype, variable):
+        """
+        Args:
+            prototype: algosdk transaction supplying the constant fields
+            variable: Field names (msgpack keys) supplied per call
+        """
+        # Zero values are omitted from the canonical encoding (e.g. apan 0 for NoOp)
+        fields = {
+            key: value for key, value in prototype.dictify().items()
+            if value and key not in variable
+        }
+
+        self.constant_count = len(fields)
+        if self.constant_count + len(variable) > 15:
+            raise ValueError("Template has too many fields for a fixmap")
+
+        self._segments = []
+        run = b""
+        for key in sorted(set(fields) | set(variable)):
+            if key in fields:
+                run += msgpack.packb(key) + msgpack.packb(fields[key], use_bin_type=True)
+                continue
+            if run:
+                self._segments.append((None, run))
+                run = b""
+            self._segments.append((key, msgpack.packb(key)))
+        if run:
+            self._segments.append((None, run))
+
+    def encode(self, values):
+        """Return the msgpack bytes of the transaction with `values` filled in"""
+        parts = [b""]
+        count = self.constant_count
+        for key, packed in self._segments:
+            if key is None:
+                parts.append(packed)
+                continue
+            value = values.get(key)
+            if not value:
+                continue
+            count += 1
+            parts.append(packed)
+            parts.append(_pack_bytes(value) if key in BYTES_FIELDS else _pack_uint(value))
+        parts[0] = bytes((0x80 | count,))
+        return b"".join(parts)
+
+
+class TemplateTxn:
+    """
+    Unsigned transaction built from a TxnTemplate
+
+    Exposes `fee` and `group` like an algosdk transaction, so
+    FeePolicy.apply can price it; group it with assign_group and submit
+    the signed result with send_signed.
+    """
+
+    __slots__ = ('template', 'sender', 'values')
+
+    def __init__(self, template, sender, values):
+        self.template = template
+        self.sender = sender
+        self.values = values
+
+    @property
+    def fee(self):
+        return self.values.get('fee', 0)
+
+    @fee.setter
+    def fee(self, fee):
+        self.values['fee'] = fee
+
+    @property
+    def group(self):
+        return self.values.get('grp')
+
+    @group.setter
+    def group(self, group):
+        self.values['grp'] = group
+
+    def encode(self):
+        return self.template.encode(self.values)
+
+    def get_txid(self):
+        """Transaction id, as algosdk's Transaction.get_txid"""
+        return encoding._undo_padding(base64.b32encode(_txid(self.encode())).decode())
+
+    def sign(self, private_key):
+        """
+        Sign with a private key (sets the authorizing address when it is
+        not the sender's, e.g. for a rekeyed hot wallet)
+
+        Returns:
+            str: Base64 msgpack signed transaction, as encoding.msgpack_encode
+        """
+        signing_key, public_key = _signing_key(private_key)
+        txn_bytes = self.encode()
+        signature = signing_key.sign(constants.txid_prefix + txn_bytes).signature
+
+        if public_key == self.values['snd']:
+            signed = b"\x82" + _SIG_KEY + signature + _TXN_KEY + txn_bytes
+        else:
+            signed = (
+                b"\x83" + _SGNR_KEY + _pack_bytes(public_key)
+                + _SIG_KEY + signature + _TXN_KEY + txn_bytes
+            )
+        return base64.b64encode(signed).decode()
+
+
+class TxnTemplates:
+    """Templates of every operation for one network (genesis hash)"""
+
+    def __init__(self, params):
+        self.genesis_hash = params.gh
+        self._sp = SuggestedParams(0, 1, 2, params.gh, params.gen, flat_fee=True)
+        self._app_calls = {}
+        self._payment = TxnTemplate(
+            PaymentTxn(ZERO_ADDRESS, self._sp, ZERO_ADDRESS, 0),
+            PAYMENT_FIELDS
+        )
+        self._asset_transfer = TxnTemplate(
+            AssetTransferTxn(ZERO_ADDRESS, self._sp, ZERO_ADDRESS, 0, 1),
+            ASSET_TRANSFER_FIELDS
+        )
+
+    def _app_call_template(self, method):
+        template = self._app_calls.get(method)
+        if template is None:
+            template = TxnTemplate(
+                ApplicationCallTxn(ZERO_ADDRESS, self._sp, 1, OnComplete.NoOpOC, app_args=[method]),
+                APP_CALL_FIELDS
+            )
+            self._app_calls[method] = template
+        return template
+
+    @staticmethod
+    def _build(template, sender, params, values):
+        """Fill the common fields and price the fee as algosdk would from `params`"""
+        values['snd'] = _public_key(sender)
+        values['fv'] = params.first
+        values['lv'] = params.last
+
+        if params.flat_fee:
+            values['fee'] = params.fee
+        else:
+            min_fee = constants.min_txn_fee if params.min_fee is None else params.min_fee
+            values['fee'] = params.fee
+            if params.fee:
+                size = len(template.encode(values)) + SIGNATURE_OVERHEAD
+                values['fee'] = max(size * params.fee, min_fee)
+            else:
+                values['fee'] = min_fee
+        return TemplateTxn(template, sender, values)
+
+    def app_call(self, method, sender, app_id, params):
+        """NoOp application call with a single method argument (e.g. b"delivery")"""
+        return self._build(self._app_call_template(method), sender, params, {'apid': app_id})
+
+    def payment(self, sender, receiver, amount, params):
+        return self._build(self._payment, sender, params, {'rcv': _public_key(receiver), 'amt': amount})
+
+    def asset_transfer(self, sender, receiver, asa_id, amount, params):
+        return self._build(
+            self._asset_transfer, sender, params,
+            {'arcv': _public_key(receiver), 'aamt': amount, 'xaid': int(asa_id)}
+        )
+
+
+def templates_for(params):
+    """Return the (cached) templates for the network `params` belong to"""
+    templates = _templates.get(params.gh)
+    if templates is None:
+        templates = _templates[params.gh] = TxnTemplates(params)
+    return templates
+
+
+def assign_group(txns):
+    """
+    Set the group id of template transactions, as algosdk's assign_group_id
+
+    Returns:
+        bytes: Group id
+    """
+    if len(txns) > constants.tx_group_limit:
+        raise ValueError(f"Group of {len(txns)} exceeds {constants.tx_group_limit} transactions")
+    for txn in txns:
+        txn.group = None
+    txids = [_txid(txn.encode()) for txn in txns]
+    group_id = encoding.checksum(constants.tgid_prefix + msgpack.packb({'txlist': txids}, use_bin_type=True))
+    for txn in txns:
+        txn.group = group_id
+    return group_id
+
+
+def send_signed(client, signed_txns):
+    """
+    Submit signed template transactions (one group) in a single request
+
+    Returns:
+        str: Transaction id of the first transaction
+    """
+    raw_group = b"".join(base64.b64decode(stxn) for stxn in signed_txns)
+    return client.send_raw_transaction(base64.b64encode(raw_group).decode())
+
+
+def _construct_operation(operation, key, sender, receiver, params, app_id, asa_id):
+    """One call of `operation` the way interact.py built it before templates"""
+    if operation == 'deposit':
+        app_call = ApplicationCallTxn(sender, params, app_id, OnComplete.NoOpOC, app_args=[b"deposit"])
+        payment = PaymentTxn(sender, params, get_application_address(app_id), 1_500_000)
+        app_call.fee, payment.fee = 0, 2_000
+        assign_group_id([app_call, payment])
+        return [encoding.msgpack_encode(app_call.sign(key)), encoding.msgpack_encode(payment.sign(key))]
+    if operation == 'reward_transfer':
+        txn = AssetTransferTxn(sender, params, receiver, 10, asa_id)
+        txn.fee = 4_000
+        return [encoding.msgpack_encode(txn.sign(key))]
+    txn = ApplicationCallTxn(sender, params, app_id, OnComplete.NoOpOC, app_args=[operation.encode()])
+    return [encoding.msgpack_encode(txn.sign(key))]
+
+
+def _template_operation(operation, key, sender, receiver, params, app_id, asa_id):
+    """The same call built from templates"""
+    templates = templates_for(params)
+    if operation == 'deposit':
+        app_call = templates.app_call(b"deposit", sender, app_id, params)
+        payment = templates.payment(sender, get_application_address(app_id), 1_500_000, params)
+        app_call.fee, payment.fee = 0, 2_000
+        assign_group([app_call, payment])
+        return [app_call.sign(key), payment.sign(key)]
+    if operation == 'reward_transfer':
+        txn = templates.asset_transfer(sender, receiver, asa_id, 10, params)
+        txn.fee = 4_000
+        return [txn.sign(key)]
+    return [templates.app_call(operation.encode(), sender, app_id, params).sign(key)]
+
+
+BENCHMARK_OPERATIONS = ('delivery', 'return', 'deposit', 'reward_transfer')
+
+
+def benchmark(calls=2000, params=None):
+    """
+    Build, sign and encode `calls` transactions per operation both ways
+
+    Uses offline suggested params unless given, and checks first that both
+    paths produce byte-identical signed transactions.
+
+    Returns:
+        dict: {operation: {'construct_tps', 'template_tps', 'speedup'}}
+            in transactions per second of single-core CPU time
+    """
+    if params is None:
+        params = SuggestedParams(
+            0, 40_000_000, 40_001_000,
+            base64.b64encode(bytes(range(32))).decode(), "testnet-v1.0",
+            min_fee=constants.min_txn_fee
+        )
+    key, sender = account.generate_account()
+    _, receiver = account.generate_account()
+    args = (key, sender, receiver, params, 123_456_789, 987_654_321)
+
+    results = {}
+    for operation in BENCHMARK_OPERATIONS:
+        if _construct_operation(operation, *args) != _template_operation(operation, *args):
+            raise AssertionError(f"Template output differs from algosdk for {operation}")
+
+        rates = {}
+        for path, build in (('construct_tps', _construct_operation), ('template_tps', _template_operation)):
+            txns = 0
+            started = time.process_time()
+            for _ in range(calls):
+                txns += len(build(operation, *args))
+            rates[path] = txns / (time.process_time() - started)
+        rates['speedup'] = rates['template_tps'] / rates['construct_tps']
+        results[operation] = rates
+    return results
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{'operation':<18}{'construct tx/s':>16}{'template tx/s':>16}{'speedup':>10}")
+    for operation, row in benchmark(calls).items():
+        print(
+            f"{operation:<18}{row['construct_tps']:>16,.0f}"
+            f"{row['template_tps']:>16,.0f}{row['speedup']:>9.1f}x"
+        )
@@ -0,0 +1,405 @@
+"""
+Warm pool of pre-deployed rental escrow contracts
+Keeps unassigned escrow apps ready so a booking only needs one "bind" app
+call instead of a full ApplicationCreateTxn in the checkout flow
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import threading
+import contextlib
+from algosdk import account, mnemonic
+from algosdk.error import AlgodHTTPError
+from algosdk.transaction import ApplicationCallTxn, OnComplete, wait_for_confirmation
+
+from contracts.deploy import (
+    build_escrow_app_args,
+    deploy_rental_escrow,
+    deploy_rental_escrows_batch,
+    get_algod_client
+)
+from contracts.fees import FeePolicy
+from contracts.interact import decode_global_state
+
+
+# Unassigned escrows to keep ready
+DEFAULT_POOL_DEPTH = 16
+
+# Seconds between refiller checks
+REFILL_INTERVAL = 30
+
+# A refill marked as running for longer than this is assumed to have died
+REFILL_STALE_AFTER = 600
+
+
+class WarmPool:
+    """
+    Pool of unassigned escrow apps persisted to a JSON file
+
+    acquire_and_bind() takes an escrow from the pool and binds it to a
+    booking; on an empty pool it falls back to a cold deploy. A background
+    refiller keeps the pool at `depth`.
+
+    Every process serving bookings shares the state file: each change
+    takes a file lock and reloads the pool first, so two bookings never
+    pop the same escrow. An escrow moves from `available` to `binding`
+    under the lock before its bind is sent, and stays there until the
+    bind confirms or its outcome is known on-chain.
+    """
+
+    def __init__(self, state_path, deployer_mnemonic, depth=DEFAULT_POOL_DEPTH, client=None):
+        """
+        Args:
+            state_path: JSON file holding pooled escrows and hit/miss counters
+            deployer_mnemonic: 25-word mnemonic of the creator of pooled escrows
+            depth: Number of unassigned escrows to keep ready
+            client: Optional Algod client (defaults to TestNet)
+        """
+        self.state_path = state_path
+        self.deployer_mnemonic = deployer_mnemonic
+        self.depth = depth
+        self.client = client or get_algod_client()
+        self.fee_policy = FeePolicy(self.client)
+
+        self._private_key = mnemonic.to_private_key(deployer_mnemonic)
+        self._address = account.address_from_private_key(self._private_key)
+        self._stop = threading.Event()
+        self._refiller = None
+
+        self.available = []
+        # Bind in progress or unconfirmed: [{'app_id', 'address', 'tx_id', 'last_valid'}];
+        # tx_id is None until the bind has been signed
+        self.binding = []
+        # Bound on-chain by a bind whose caller was told it failed; the
+        # booking never learned the app id, so these need an operator
+        self.stranded = []
+        self.counters = {'hits': 0, 'misses': 0, 'deployed': 0}
+        # Wall-clock start of a refill in progress (any process), else None
+        self.refilling_since = None
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Hold the pool's file lock with freshly loaded state, then save it"""
+        with open(self.state_path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(self.state_path):
+                    with open(self.state_path, "r") as f:
+                        saved = json.load(f)
+                    self.available = saved['available']
+                    self.binding = saved.get('binding', [])
+                    self.stranded = saved.get('stranded', [])
+                    self.counters.update(saved['counters'])
+                    self.refilling_since = saved.get('refilling_since')
+                yield
+                tmp_path = self.state_path + ".tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump({
+                        'available': self.available,
+                        'binding': self.binding,
+                        'stranded': self.stranded,
+                        'counters': self.counters,
+                        'refilling_since': self.refilling_since
+                    }, f)
+                os.replace(tmp_path, self.state_path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _app_deleted(self, app_id):
+        """True if algod no longer knows the app (e.g. the sweeper deleted it)"""
+        try:
+            self.client.application_info(app_id)
+        except AlgodHTTPError as e:
+            if e.code == 404:
+                return True
+            raise
+        return False
+
+    def _bind_outcome(self, escrow, organizer_addr=None):
+        """
+        Check on-chain whether an unconfirmed bind landed
+
+        Returns:
+            'bound' if the escrow is bound (to `organizer_addr`, if given),
+            'stranded' if it is bound to someone else, 'unbound' if it is
+            unassigned and the bind can no longer confirm, 'deleted' if the
+            app no longer exists, or 'pending'
+        """
+        try:
+            info = self.client.application_info(escrow['app_id'])
+        except AlgodHTTPError as e:
+            if e.code == 404:
+                return 'deleted'
+            raise
+        organizer = decode_global_state(info['params'].get('global-state', [])).get('organizer', '')
+        if organizer != '':
+            return 'bound' if organizer_addr in (None, organizer) else 'stranded'
+        if self.client.status()['last-round'] > escrow['last_valid']:
+            return 'unbound'
+        return 'pending'
+
+    def resolve_binding(self):
+        """
+        Settle escrows whose bind was sent but never confirmed
+
+        Unassigned escrows go back to the pool once their bind has
+        expired; escrows the bind did reach are moved to `stranded`, and
+        escrows deleted on-chain are dropped.
+
+        Returns:
+            dict: {'requeued': int, 'stranded': int, 'pending': int, 'deleted': int}
+        """
+        with self._locked():
+            binding = list(self.binding)
+
+        outcomes = {}
+        for escrow in binding:
+            try:
+                outcomes[escrow['app_id']] = self._bind_outcome(escrow)
+            except Exception as e:
+                print(f"❌ Could not check bind of escrow {escrow['app_id']}: {e}")
+
+        counts = {'requeued': 0, 'stranded': 0, 'pending': 0, 'deleted': 0}
+        with self._locked():
+            still_binding = []
+            for escrow in self.binding:
+                outcome = outcomes.get(escrow['app_id'], 'pending')
+                if outcome == 'unbound':
+                    self.available.append({'app_id': escrow['app_id'], 'address': escrow['address']})
+                    counts['requeued'] += 1
+                elif outcome in ('bound', 'stranded'):
+                    self.stranded.append(escrow)
+                    counts['stranded'] += 1
+                elif outcome == 'deleted':
+                    counts['deleted'] += 1
+                else:
+                    still_binding.append(escrow)
+                    counts['pending'] += 1
+            self.binding = still_binding
+        return counts
+
+    def refill(self):
+        """
+        Deploy enough unassigned escrows to bring the pool back to depth
+
+        Escrows with an unconfirmed bind are resolved first, since an
+        expired bind returns its escrow to the pool.
+
+        Returns:
+            int: Number of escrows added
+        """
+        self.resolve_binding()
+
+        with self._locked():
+            deficit = self.depth - len(self.available) - len(self.binding)
+            start = self.counters['deployed']
+            if deficit > 0:
+                self.refilling_since = time.time()
+        if deficit <= 0:
+            return 0
+
+        result = deploy_rental_escrows_batch(
+            self.deployer_mnemonic,
+            [{'booking_id': f"pool-{start + i}"} for i in range(deficit)],
+            client=self.client
+        )
+        if not result['success']:
+            print(f"❌ Pool refill partly failed: {result['error']}")
+
+        # Keep whatever was created; unfunded escrows cannot pay out, so
+        # they are left unbound for the sweeper to delete
+        funded = [escrow for escrow in result['escrows'].values() if escrow['funded']]
+        with self._locked():
+            for escrow in funded:
+                self.available.append({'app_id': escrow['app_id'], 'address': escrow['address']})
+            self.counters['deployed'] += len(result['escrows'])
+            self.refilling_since = None
+
+        return len(funded)
+
+    def acquire_and_bind(
+        self,
+        organizer_addr,
+        vendor_addr,
+        deposit_amount,
+        rental_fee,
+        lease_start,
+        lease_end
+    ):
+        """
+        Bind a pooled escrow to a booking, or deploy one if the pool is empty
+
+        Args match deploy.deploy_rental_escrow.
+
+        Returns:
+            dict: {
+                'success': bool,
+                'app_id': int,
+                'tx_id': str,
+                'address': str,
+                'pool_hit': bool,
+                'error': str (if failed)
+            }
+        """
+        try:
+            # Fetched first so the escrow enters `binding` with the last
+            # round any bind for it could confirm in
+            params = self.client.suggested_params()
+        except Exception as e:
+            return {'success': False, 'pool_hit': False, 'error': str(e)}
+
+        with self._locked():
+            escrow = self.available.pop(0) if self.available else None
+            self.counters['hits' if escrow else 'misses'] += 1
+            if escrow is not None:
+                # Never outside both lists, so the sweeper always excludes it
+                self.binding.append(dict(escrow, tx_id=None, last_valid=params.last))
+
+        if escrow is None:
+            result = deploy_rental_escrow(
+                self.deployer_mnemonic,
+                organizer_addr,
+                vendor_addr,
+                deposit_amount,
+                rental_fee,
+                lease_start,
+                lease_end
+            )
+            result['pool_hit'] = False
+            return result
+
+        tx_id = None
+        sending = False
+        try:
+            txn = ApplicationCallTxn(
+                sender=self._address,
+                sp=params,
+                index=escrow['app_id'],
+                on_complete=OnComplete.NoOpOC,
+                app_args=[b"bind"] + build_escrow_app_args(
+                    organizer_addr,
+                    vendor_addr,
+                    deposit_amount,
+                    rental_fee,
+                    lease_start,
+                    lease_end
+                )
+            )
+            self.fee_policy.apply([txn], priority='normal', params=params, operation='bind')
+            signed = txn.sign(self._private_key)
+            tx_id = signed.get_txid()
+
+            sending = True
+            self.client.send_transaction(signed)
+            wait_for_confirmation(self.client, tx_id, 4)
+            outcome = 'bound'
+            error = None
+        except Exception as e:
+            error = str(e)
+            pending = dict(escrow, tx_id=tx_id, last_valid=params.last)
+            try:
+                if sending:
+                    # The bind may have landed (e.g. only the confirmation
+                    # timed out); otherwise hold the escrow until it expires
+                    outcome = self._bind_outcome(pending, organizer_addr)
+                else:
+                    # Nothing reached the network; requeue only if the app
+                    # still exists on-chain
+                    outcome = 'deleted' if self._app_deleted(escrow['app_id']) else 'unbound'
+            except Exception:
+                outcome = 'pending'
+
+        with self._locked():
+            self.binding = [entry for entry in self.binding if entry['app_id'] != escrow['app_id']]
+            if outcome == 'unbound':
+                self.available.append(escrow)
+            elif outcome == 'stranded':
+                self.stranded.append(pending)
+            elif outcome == 'pending':
+                self.binding.append(pending)
+
+        if outcome == 'bound':
+            return {
+                'success': True,
+                'app_id': escrow['app_id'],
+                'tx_id': tx_id,
+                'address': escrow['address'],
+                'pool_hit': True
+            }
+        return {
+            'success': False,
+            'app_id': escrow['app_id'],
+            'tx_id': tx_id,
+            'pool_hit': True,
+            'error': error
+        }
+
+    def sweep_exclusions(self):
+        """
+        Escrows the sweeper must leave alone
+
+        Pooled and binding escrows are unbound, which the contract lets
+        its creator delete. While a refill is running its new escrows are
+        not in the pool yet, so no unbound escrow is safe to delete.
+
+        Returns:
+            (set of app ids, bool refill in progress)
+        """
+        with self._locked():
+            app_ids = {escrow['app_id'] for escrow in self.available + self.binding}
+            refilling = (
+                self.refilling_since is not None
+                and time.time() - self.refilling_since < REFILL_STALE_AFTER
+            )
+            return app_ids, refilling
+
+    def stats(self):
+        """
+        Returns:
+            dict: {'available': int, 'binding': int, 'stranded': int, 'depth': int,
+                   'hits': int, 'misses': int, 'deployed': int, 'hit_rate': float}
+        """
+        with self._locked():
+            requests = self.counters['hits'] + self.counters['misses']
+            return dict(
+                self.counters,
+                available=len(self.available),
+                binding=len(self.binding),
+                stranded=len(self.stranded),
+                depth=self.depth,
+                hit_rate=self.counters['hits'] / requests if requests else 0.0
+            )
+
+    def start_refiller(self, interval=REFILL_INTERVAL):
+        """Start a daemon thread that keeps the pool at depth"""
+        def run():
+            while not self._stop.is_set():
+                self.refill()
+                self._stop.wait(interval)
+
+        self._stop.clear()
+        self._refiller = threading.Thread(target=run, name="escrow-pool-refiller", daemon=True)
+        self._refiller.start()
+
+    def stop_refiller(self):
+        self._stop.set()
+        if self._refiller is not None:
+            self._refiller.join()
+
+
+if __name__ == "__main__":
+    # One-shot refill, e.g. from a cron job
+    deployer_mnemonic = os.getenv('ALGORAND_DEPLOYER_MNEMONIC')
+
+    if not deployer_mnemonic or len(sys.argv) < 2:
+        print("Usage: ALGORAND_DEPLOYER_MNEMONIC=... python -m contracts.warm_pool <state_file> [depth]")
+        sys.exit(1)
+
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_POOL_DEPTH
+    pool = WarmPool(sys.argv[1], deployer_mnemonic, depth=depth)
+    added = pool.refill()
+
+    print(json.dumps(dict(pool.stats(), added=added)))
@@ -0,0 +1,82 @@
+"""
+Default workload for the cassette harness
+Runs the booking and reward paths the server drives: deploy an escrow, pay
+its deposit, then claim a reward ASA, as named flows for cassette.py
+"""
+
+import os
+import time
+from algosdk import account, mnemonic
+
+from contracts.create_claim_transaction import check_asset_opted_in, transfer_asa
+from contracts.deploy import deploy_rental_escrow, get_algod_client
+from contracts.interact import pay_deposit
+
+
+# Small amounts so a recording costs little TestNet ALGO (microALGOs)
+DEPOSIT_AMOUNT = 1_000_000
+RENTAL_FEE = 500_000
+REWARD_AMOUNT = 1
+
+LEASE_SECONDS = 86_400
+
+# Values passed from one flow to the next within a run
+_run = {}
+
+
+def _env(name):
+    value = os.getenv(name)
+    if not value:
+        raise RuntimeError(f"{name} environment variable not set")
+    return value
+
+
+def _address(mnemonic_words):
+    return account.address_from_private_key(mnemonic.to_private_key(mnemonic_words))
+
+
+def deploy_flow():
+    """Deploy a funded escrow between the organizer and the vendor"""
+    deployer_mnemonic = _env('ALGORAND_DEPLOYER_MNEMONIC')
+    vendor_mnemonic = os.getenv('ALGORAND_VENDOR_MNEMONIC') or deployer_mnemonic
+    lease_start = int(time.time())
+
+    result = deploy_rental_escrow(
+        deployer_mnemonic,
+        _address(_env('ALGORAND_ORGANIZER_MNEMONIC')),
+        _address(vendor_mnemonic),
+        DEPOSIT_AMOUNT,
+        RENTAL_FEE,
+        lease_start,
+        lease_start + LEASE_SECONDS
+    )
+    if result['success']:
+        _run['app_id'] = result['app_id']
+    return result
+
+
+def deposit_flow():
+    """Organizer pays deposit and rental fee into the escrow just deployed"""
+    if 'app_id' not in _run:
+        raise RuntimeError("deploy_rental_escrow flow did not deploy an escrow")
+    return pay_deposit(_env('ALGORAND_ORGANIZER_MNEMONIC'), _run['app_id'], DEPOSIT_AMOUNT, RENTAL_FEE)
+
+
+def claim_flow():
+    """Reward claim as the server runs it: opt-in check, then transfer"""
+    receiver = _address(_env('ALGORAND_ORGANIZER_MNEMONIC'))
+    asa_id = int(_env('ALGORAND_REWARD_ASA_ID'))
+
+    if not check_asset_opted_in(get_algod_client(), receiver, asa_id):
+        return {'success': False, 'error': f"{receiver} has not opted in to ASA {asa_id}"}
+    return transfer_asa(receiver, asa_id, REWARD_AMOUNT)
+
+
+# Needs ALGORAND_DEPLOYER_MNEMONIC, ALGORAND_ORGANIZER_MNEMONIC (opted in to
+# the reward ASA) and ALGORAND_REWARD_ASA_ID; ALGORAND_VENDOR_MNEMONIC is
+# optional. Replay needs the same variables but no funds or network.
+FLOWS = [
+    ('deploy_rental_escrow', deploy_flow),
+    ('pay_deposit', deposit_flow),
+    ('claim_reward', claim_flow),
+]
@@ -0,0 +1,255 @@
+"""
+Minimal TEAL evaluator for the rental escrow approval program
+Runs the compiled TEAL of one application call against in-memory global
+state and app balance, covering the opcodes PyTeal emits for our contract
+(plain and constant-pooled forms). Inner payments enforce the account
+minimum balance like algod does
+"""
+
+from algosdk import encoding
+from algosdk.logic import get_application_address
+
+
+# Named constants PyTeal emits as `int <name>`
+NAMED_INTS = {
+    'NoOp': 0, 'OptIn': 1, 'CloseOut': 2, 'ClearState': 3,
+    'UpdateApplication': 4, 'DeleteApplication': 5,
+    'pay': 1, 'keyreg': 2, 'acfg': 3, 'axfer': 4, 'afrz': 5, 'appl': 6,
+}
+
+MIN_BALANCE = 100_000
+
+# Global state schema of the escrow (deploy.escrow_state_schemas)
+MAX_GLOBAL_UINTS = 11
+MAX_GLOBAL_BYTES = 2
+
+
+class Rejected(Exception):
+    """The program (or an inner transaction) failed"""
+
+
+def _parse_bytes(literal):
+    if literal.startswith("0x"):
+        return bytes.fromhex(literal[2:])
+    if literal.startswith('"'):
+        return literal[1:-1].encode().decode('unicode_escape').encode('latin-1')
+    raise ValueError(f"Unsupported byte literal {literal}")
+
+
+def _parse_int(literal):
+    return NAMED_INTS[literal] if literal in NAMED_INTS else int(literal, 0)
+
+
+def parse(teal):
+    """Return (instructions, labels) with comments and the pragma stripped"""
+    code = []
+    labels = {}
+    for line in teal.splitlines():
+        line = line.strip()
+        if not line.startswith(('byte "', 'pushbytes "')):
+            line = line.split("//", 1)[0].strip()
+        if not line or line.startswith("#pragma"):
+            continue
+        if line.endswith(":") and " " not in line:
+            labels[line[:-1]] = len(code)
+            continue
+        opcode, _, args = line.partition(" ")
+        code.append((opcode, args.split() if not args.startswith('"') else [args]))
+    return code, labels
+
+
+class EscrowApp:
+    """One deployed escrow app: global state, balance and its program"""
+
+    def __init__(self, teal, app_id, creator):
+        self.code, self.labels = parse(teal)
+        self.app_id = app_id
+        self.creator = creator
+        self.address = encoding.decode_address(get_application_address(app_id))
+        self.globals = {}
+        self.balance = 0
+        self.deleted = False
+
+    def call(self, sender, args=(), on_completion=0, group=(), timestamp=0, create=False):
+        """
+        Evaluate one application call; state changes only if it approves
+
+        Args:
+            sender: 32-byte public key of the caller
+            args: Application args (bytes)
+            on_completion: OnComplete value
+            group: Other group members after the app call, as dicts with
+                'type', 'sender', 'receiver', 'amount' (payments only)
+            timestamp: Global.latest_timestamp
+            create: Evaluate as the creation call (ApplicationID 0)
+
+        Raises:
+            Rejected: If the call would fail
+        """
+        if self.deleted:
+            raise Rejected("application deleted")
+
+        globals_ = dict(self.globals)
+        balance = self.balance
+        txns = [{'type': NAMED_INTS['appl'], 'sender': sender}] + list(group)
+
+        txn_fields = {
+            'ApplicationID': 0 if create else self.app_id,
+            'OnCompletion': on_completion,
+            'Sender': sender,
+            'NumAppArgs': len(args),
+            'TypeEnum': NAMED_INTS['appl'],
+        }
+        global_fields = {
+            'CreatorAddress': self.creator,
+            'CurrentApplicationAddress': self.address,
+            'GroupSize': len(txns),
+            'LatestTimestamp': timestamp,
+            'ZeroAddress': bytes(32),
+            'MinTxnFee': 1000,
+        }
+        gtxn_fields = {'TypeEnum': 'type', 'Sender': 'sender', 'Receiver': 'receiver', 'Amount': 'amount'}
+
+        intc, bytec = [], []
+        stack, frames = [], []
+        inner = None
+        pc = 0
+
+        def pop_int():
+            value = stack.pop()
+            if not isinstance(value, int):
+                raise Rejected("expected uint")
+            return value
+
+        while True:
+            if pc >= len(self.code):
+                raise Rejected("fell off the end of the program")
+            opcode, operands = self.code[pc]
+            pc += 1
+
+            if opcode == 'intcblock':
+                intc = [int(v) for v in operands]
+            elif opcode == 'bytecblock':
+                bytec = [_parse_bytes(v) for v in operands]
+            elif opcode.startswith('intc'):
+                stack.append(intc[int(opcode[5:] if '_' in opcode else operands[0])])
+            elif opcode.startswith('bytec'):
+                stack.append(bytec[int(opcode[6:] if '_' in opcode else operands[0])])
+            elif opcode in ('int', 'pushint'):
+                stack.append(_parse_int(operands[0]))
+            elif opcode in ('byte', 'pushbytes'):
+                stack.append(_parse_bytes(operands[0]))
+            elif opcode == 'txn':
+                stack.append(txn_fields[operands[0]])
+            elif opcode == 'txna':
+                index = int(operands[1])
+                if index >= len(args):
+                    raise Rejected("application arg out of range")
+                stack.append(args[index])
+            elif opcode == 'gtxn':
+                index = int(operands[0])
+                if index >= len(txns):
+                    raise Rejected("group index out of range")
+                stack.append(txns[index].get(gtxn_fields[operands[1]], 0))
+            elif opcode == 'global':
+                stack.append(global_fields[operands[0]])
+            elif opcode == 'app_global_get':
+                key = stack.pop()
+                stack.append(globals_.get(key, 0))
+            elif opcode == 'app_global_put':
+                value = stack.pop()
+                globals_[stack.pop()] = value
+            elif opcode in ('==', '!='):
+                b, a = stack.pop(), stack.pop()
+                if type(a) is not type(b):
+                    raise Rejected("type mismatch")
+                stack.append(int((a == b) == (opcode == '==')))
+            elif opcode in ('+', '-', '<', '>', '<=', '>=', '&&', '||'):
+                b, a = pop_int(), pop_int()
+                if opcode == '+':
+                    result = a + b
+                    if result >= 2 ** 64:
+                        raise Rejected("+ overflowed")
+                elif opcode == '-':
+                    if b > a:
+                        raise Rejected("- would result negative")
+                    result = a - b
+                else:
+                    result = int({
+                        '<': a < b, '>': a > b, '<=': a <= b, '>=': a >= b,
+                        '&&': bool(a and b), '||': bool(a or b)
+                    }[opcode])
+                stack.append(result)
+            elif opcode == '!':
+                stack.append(int(pop_int() == 0))
+            elif opcode == 'btoi':
+                value = stack.pop()
+                if len(value) > 8:
+                    raise Rejected("btoi arg too long")
+                stack.append(int.from_bytes(value, 'big'))
+            elif opcode == 'assert':
+                if not pop_int():
+                    raise Rejected(f"assert failed at pc {pc - 1}")
+            elif opcode == 'err':
+                raise Rejected("err")
+            elif opcode == 'bnz':
+                if pop_int():
+                    pc = self.labels[operands[0]]
+            elif opcode == 'bz':
+                if not pop_int():
+                    pc = self.labels[operands[0]]
+            elif opcode == 'b':
+                pc = self.labels[operands[0]]
+            elif opcode == 'callsub':
+                frames.append(pc)
+                pc = self.labels[operands[0]]
+            elif opcode == 'retsub':
+                pc = frames.pop()
+            elif opcode == 'pop':
+                stack.pop()
+            elif opcode == 'dup':
+                stack.append(stack[-1])
+            elif opcode == 'itxn_begin':
+                inner = {}
+            elif opcode == 'itxn_field':
+                inner[operands[0]] = stack.pop()
+            elif opcode == 'itxn_submit':
+                balance = self._pay(inner, balance)
+                inner = None
+            elif opcode == 'return':
+                if not pop_int():
+                    raise Rejected("returned 0")
+                break
+            else:
+                raise NotImplementedError(f"Opcode {opcode} not supported")
+
+        self._check_schema(globals_)
+
+        # The call approved: commit state, then the grouped payments
+        self.globals = globals_
+        self.balance = balance
+        for txn in group:
+            if txn['type'] == NAMED_INTS['pay'] and txn.get('receiver') == self.address:
+                self.balance += txn['amount']
+        if on_completion == NAMED_INTS['DeleteApplication']:
+            self.deleted = True
+
+    def _pay(self, inner, balance):
+        """Apply an inner payment from the app account"""
+        if inner.get('TypeEnum') != NAMED_INTS['pay']:
+            raise NotImplementedError("Only inner payments are supported")
+        amount = inner.get('Amount', 0)
+        if amount > balance:
+            raise Rejected("inner payment overspends")
+        balance -= amount
+        if 'CloseRemainderTo' in inner:
+            return 0
+        if balance < MIN_BALANCE:
+            raise Rejected("inner payment leaves app account below min balance")
+        return balance
+
+    @staticmethod
+    def _check_schema(globals_):
+        uints = sum(1 for value in globals_.values() if isinstance(value, int))
+        if uints > MAX_GLOBAL_UINTS or len(globals_) - uints > MAX_GLOBAL_BYTES:
+            raise Rejected("global state schema exceeded")
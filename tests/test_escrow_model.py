@@ -0,0 +1,179 @@
+"""
+Property tests keeping escrow_model in lockstep with the compiled contract
+Random action sequences are run through both the model and the compiled
+approval program (see teal_vm.py); every verdict and every resulting
+global state must agree
+"""
+
+import base64
+
+import pytest
+from algosdk import account, encoding
+from hypothesis import given, settings, strategies as st
+
+from contracts.deploy import APP_ACCOUNT_MIN_BALANCE, build_escrow_app_args
+from contracts.escrow_model import ACTIONS, TIMEOUT_GRACE_PERIOD, apply_action, validate_action
+from contracts.interact import decode_global_state
+from contracts.rental_escrow import approval_program
+from contracts.teal_optimizer import compile_optimized, compile_plain
+from teal_vm import NAMED_INTS, EscrowApp, Rejected
+
+
+APP_ID = 1234
+LEASE_START = 1_700_000_000
+LEASE_END = LEASE_START + 86_400
+
+PARTIES = {name: account.generate_account()[1] for name in ('creator', 'organizer', 'vendor', 'stranger')}
+
+# Actions the contract restricts to its creator, which the model cannot
+# check (the creator is not part of global state)
+CREATOR_ONLY = ('bind', 'settle_fee', 'delete')
+
+PROGRAMS = {
+    'optimized': compile_optimized(approval_program(True)),
+    'plain': compile_plain(approval_program(False)),
+}
+
+# Party each action is normally sent by; steps mostly use it so sequences
+# get deep into the lifecycle, and sometimes any other party
+EXPECTED_SENDER = {
+    'bind': 'creator', 'settle_fee': 'creator', 'delete': 'creator',
+    'deposit': 'organizer', 'return': 'organizer',
+    'delivery': 'vendor', 'damage': 'vendor', 'timeout': 'vendor',
+}
+
+
+@st.composite
+def step(draw):
+    action = draw(st.sampled_from(ACTIONS + ('unknown',)))
+    party = draw(st.one_of(
+        st.just(EXPECTED_SENDER.get(action, 'stranger')),
+        st.just(EXPECTED_SENDER.get(action, 'stranger')),
+        st.sampled_from(sorted(PARTIES))
+    ))
+    payment = draw(st.one_of(
+        st.just(2_000_000),                                 # covers any terms
+        st.integers(min_value=0, max_value=2_000_000)
+    ))
+    advance = draw(st.one_of(
+        st.just(0),
+        st.integers(min_value=0, max_value=2 * TIMEOUT_GRACE_PERIOD)
+    ))
+    return action, party, payment, advance
+
+
+steps = st.lists(step(), max_size=30)
+
+terms = st.fixed_dictionaries({
+    'deposit_amount': st.integers(min_value=0, max_value=1_000_000),
+    'rental_fee': st.integers(min_value=0, max_value=1_000_000),
+})
+
+
+def contract_state(app):
+    """Global state of the VM app, decoded like interact.get_contract_state"""
+    return decode_global_state([
+        {
+            'key': base64.b64encode(key).decode(),
+            'value': {'type': 1, 'bytes': base64.b64encode(value).decode()}
+            if isinstance(value, bytes) else {'type': 2, 'uint': value}
+        }
+        for key, value in app.globals.items()
+    ])
+
+
+def booking_args(amounts):
+    return build_escrow_app_args(
+        PARTIES['organizer'], PARTIES['vendor'],
+        amounts['deposit_amount'], amounts['rental_fee'], LEASE_START, LEASE_END
+    )
+
+
+def deploy(teal, amounts, pooled):
+    """Create and fund an escrow, bound at creation or unassigned (warm pool)"""
+    app = EscrowApp(teal, APP_ID, encoding.decode_address(PARTIES['creator']))
+    app.call(app.creator, [] if pooled else booking_args(amounts), create=True)
+    app.balance = APP_ACCOUNT_MIN_BALANCE
+    return app
+
+
+def call_contract(app, action, sender, payment, now, amounts):
+    """Submit `action` to the VM the way interact/deploy build the call"""
+    if action == 'delete':
+        app.call(sender, on_completion=NAMED_INTS['DeleteApplication'], timestamp=now)
+        return
+
+    args = [action.encode()]
+    if action == 'bind':
+        args += booking_args(amounts)
+
+    group = []
+    if action == 'deposit':
+        group = [{'type': NAMED_INTS['pay'], 'sender': sender, 'receiver': app.address, 'amount': payment}]
+    app.call(sender, args, group=group, timestamp=now)
+
+
+@pytest.mark.parametrize('variant', sorted(PROGRAMS))
+@settings(max_examples=300, deadline=None)
+@given(amounts=terms, pooled=st.booleans(), steps=steps)
+def test_model_matches_contract(variant, amounts, pooled, steps):
+    app = deploy(PROGRAMS[variant], amounts, pooled)
+    state = contract_state(app)
+    now = LEASE_START
+
+    for action, party, payment, advance in steps:
+        now += advance
+        sender = PARTIES[party]
+
+        try:
+            call_contract(app, action, encoding.decode_address(sender), payment, now, amounts)
+            approved = True
+        except Rejected:
+            approved = False
+
+        if action in CREATOR_ONLY and party != 'creator':
+            assert not approved, f"{action} accepted from {party}"
+            continue
+
+        verdict = validate_action(state, action, sender=sender, payment_amount=payment, now=now)
+        assert verdict['allowed'] == approved, (action, party, verdict, state)
+
+        if approved:
+            if action == 'delete':
+                break
+            bind_terms = contract_state(app) if action == 'bind' else None
+            state = apply_action(state, action, terms=bind_terms)
+            assert state == contract_state(app), action
+
+
+@settings(max_examples=100, deadline=None)
+@given(amounts=terms, steps=steps)
+def test_settled_escrows_can_be_deleted(amounts, steps):
+    """
+    Every lifecycle the model allows pays out within the app balance
+    and ends in a deletable escrow
+    """
+    app = deploy(PROGRAMS['optimized'], amounts, pooled=False)
+    state = contract_state(app)
+    now = LEASE_START
+    creator = encoding.decode_address(PARTIES['creator'])
+
+    for action, party, payment, advance in steps:
+        now += advance
+        if action in CREATOR_ONLY + ('unknown',):
+            continue
+        sender = PARTIES[party]
+        if not validate_action(state, action, sender=sender, payment_amount=payment, now=now)['allowed']:
+            continue
+        call_contract(app, action, encoding.decode_address(sender), payment, now, amounts)
+        state = apply_action(state, action)
+
+    # Finish the lifecycle the way settlement and the timeout scheduler do
+    late = max(now, LEASE_END + TIMEOUT_GRACE_PERIOD)
+    for action, sender in (('settle_fee', creator), ('timeout', encoding.decode_address(PARTIES['vendor']))):
+        if validate_action(state, action, now=late)['allowed']:
+            call_contract(app, action, sender, 0, late, amounts)
+            state = apply_action(state, action)
+
+    assert validate_action(state, 'delete')['allowed']
+    app.call(creator, on_completion=NAMED_INTS['DeleteApplication'])